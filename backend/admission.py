@@ -0,0 +1,185 @@
+"""
+Admission control and load shedding for the API
+
+A concurrency limiter admits up to MAX_CONCURRENT_REQUESTS at once and
+parks the rest in a bounded priority queue where reads (GET) are served
+before writes. Requests that find the queue full, or wait longer than
+QUEUE_TIMEOUT_SECONDS, are shed with a fast 503 and Retry-After. A
+per-client token bucket (in memory, no external services) rejects clients
+over their rate with 429.
+
+Limits are per worker process.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "32"))
+MAX_QUEUED_REQUESTS = int(os.getenv("MAX_QUEUED_REQUESTS", "64"))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("QUEUE_TIMEOUT_SECONDS", "2"))
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "10"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "20"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+# Proxies in front of the app that append to X-Forwarded-For (Cloud Run's
+# front end is one); 0 ignores the header and uses the peer address
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+
+READ_PRIORITY = 0
+WRITE_PRIORITY = 1
+
+# Cheap endpoints that must keep answering under load, and the long-lived
+# event stream, which has its own subscriber cap instead of holding a slot
+UNLIMITED_PATHS = {
+    "/api/health",
+    "/api/health/live",
+    "/api/health/ready",
+    "/api/metrics",
+    "/api/searches/events",
+}
+
+
+def is_limited(path: str) -> bool:
+    return path.startswith("/api/") and path not in UNLIMITED_PATHS
+
+
+def client_key(forwarded_for: str, peer: Optional[str]) -> str:
+    """
+    The client address for rate limiting. Clients can put anything at the
+    left of X-Forwarded-For, so only the entry appended by the outermost
+    trusted proxy is used.
+    """
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    if TRUSTED_PROXY_HOPS > 0 and len(hops) >= TRUSTED_PROXY_HOPS:
+        return hops[-TRUSTED_PROXY_HOPS]
+    return peer or "unknown"
+
+
+class ConcurrencyLimiter:
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+        max_queued: int = MAX_QUEUED_REQUESTS,
+        queue_timeout: float = QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.queued_writes = 0
+        self.admitted = 0
+        self.shed: Dict[str, int] = {"queue_full": 0, "queue_timeout": 0}
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    async def acquire(self, priority: int = WRITE_PRIORITY) -> Optional[str]:
+        """Take a slot; returns None when admitted or the reason it was shed"""
+        if self.in_flight < self.max_concurrent and not self.queue_depth:
+            self.in_flight += 1
+            self.admitted += 1
+            return None
+
+        if self.queue_depth >= self.max_queued:
+            self.shed["queue_full"] += 1
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        self.queue_depth += 1
+        if priority == WRITE_PRIORITY:
+            self.queued_writes += 1
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # Client went away; pass on a slot that was already handed over
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            waiter.cancel()
+            raise
+        finally:
+            self.queue_depth -= 1
+            if priority == WRITE_PRIORITY:
+                self.queued_writes -= 1
+
+        if waiter.done() and not waiter.cancelled():
+            # release() handed its slot straight to this waiter
+            self.admitted += 1
+            return None
+
+        waiter.cancel()
+        self.shed["queue_timeout"] += 1
+        return "queue_timeout"
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.in_flight -= 1
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets; the least recently seen clients are evicted"""
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_PER_SECOND,
+        burst: float = RATE_LIMIT_BURST,
+        max_clients: int = RATE_LIMIT_MAX_CLIENTS,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.limited = 0
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def check(self, client: str) -> Optional[float]:
+        """Spend a token; returns None if allowed, else seconds until one is free"""
+        if self.rate <= 0:
+            return None
+
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+        retry_after = None
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            self.limited += 1
+            retry_after = (1 - tokens) / self.rate
+
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
+        return retry_after
+
+
+def retry_after_header(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+limiter = ConcurrencyLimiter()
+rate_limiter = TokenBucketLimiter()
+
+
+def metrics() -> dict:
+    return {
+        "in_flight": limiter.in_flight,
+        "queue_depth": limiter.queue_depth,
+        "queued_writes": limiter.queued_writes,
+        "max_concurrent": limiter.max_concurrent,
+        "max_queued": limiter.max_queued,
+        "admitted": limiter.admitted,
+        "shed": dict(limiter.shed),
+        "rate_limited": rate_limiter.limited,
+        "tracked_clients": len(rate_limiter._buckets),
+    }
@@ -0,0 +1,239 @@
+"""
+Population analytics rollups
+
+Every persisted search increments three rollup tables in the same
+transaction: GMAT/GPA histograms of submitted profiles, per-school
+admission-chance histograms, and daily Safety/Target/Reach counts.
+/api/analytics reads only these tables, never `searches` or
+`search_results`.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import (
+    ProfileHistogram,
+    SchoolChanceHistogram,
+    Search,
+    SearchResult,
+    TierDaily,
+)
+from matcher import CollegeMatcher
+
+GMAT_BUCKET = 10
+GPA_BUCKET = 0.1
+CHANCE_BUCKETS = 10
+BACKFILL_BATCH_SIZE = 50_000
+
+
+def gmat_bucket(gmat_score: float) -> float:
+    return float(int(gmat_score // GMAT_BUCKET) * GMAT_BUCKET)
+
+
+def gpa_bucket(gpa: float) -> float:
+    return round(int(round(gpa / GPA_BUCKET, 6)) * GPA_BUCKET, 1)
+
+
+def chance_bucket(admission_chance: float) -> int:
+    return min(int(admission_chance // CHANCE_BUCKETS), CHANCE_BUCKETS - 1)
+
+
+def _increment(db: Session, model, rows: List[dict]) -> None:
+    """Add the counters in rows to the rollup, inserting missing keys"""
+    if not rows:
+        return
+
+    insert = (
+        postgresql_insert
+        if db.get_bind().dialect.name == "postgresql"
+        else sqlite_insert
+    )
+    statement = insert(model)
+    keys = [column.name for column in model.__table__.primary_key]
+    counters = [name for name in rows[0] if name not in keys]
+    statement = statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={
+            name: model.__table__.c[name] + statement.excluded[name]
+            for name in counters
+        },
+    )
+    db.execute(statement, rows)
+
+
+class _Rollup:
+    """Accumulates rollup deltas in memory before a single upsert per table"""
+
+    def __init__(self):
+        self.profiles: Dict[Tuple[str, float], int] = {}
+        self.schools: Dict[Tuple[int, int], List[float]] = {}
+        self.tiers: Dict[Tuple[date, str], int] = {}
+
+    def add_search(self, gmat_score: float, gpa: float) -> None:
+        for key in (("gmat", gmat_bucket(gmat_score)), ("gpa", gpa_bucket(gpa))):
+            self.profiles[key] = self.profiles.get(key, 0) + 1
+
+    def add_result(
+        self, university_id: int, admission_chance: float, day: date, count: int = 1
+    ) -> None:
+        """Count a result; a count of -1 takes back one counted earlier"""
+        school = self.schools.setdefault(
+            (university_id, chance_bucket(admission_chance)), [0, 0.0]
+        )
+        school[0] += count
+        school[1] += count * admission_chance
+        tier = (day, CollegeMatcher.tier(admission_chance))
+        self.tiers[tier] = self.tiers.get(tier, 0) + count
+
+    def flush(self, db: Session) -> None:
+        _increment(
+            db,
+            ProfileHistogram,
+            [
+                {"metric": metric, "bucket": bucket, "count": count}
+                for (metric, bucket), count in self.profiles.items()
+            ],
+        )
+        _increment(
+            db,
+            SchoolChanceHistogram,
+            [
+                {
+                    "university_id": university_id,
+                    "bucket": bucket,
+                    "count": count,
+                    "chance_sum": chance_sum,
+                }
+                for (university_id, bucket), (count, chance_sum) in self.schools.items()
+            ],
+        )
+        _increment(
+            db,
+            TierDaily,
+            [
+                {"day": day, "tier": tier, "count": count}
+                for (day, tier), count in self.tiers.items()
+            ],
+        )
+        self.__init__()
+
+
+def record_search(
+    db: Session, search: Search, results: Iterable[Tuple[int, float]]
+) -> None:
+    """
+    Add one search and its (university_id, admission_chance) results to the
+    rollups. Does not commit, so the caller persists it with the search.
+    """
+    rollup = _Rollup()
+    rollup.add_search(search.gmat_score, search.gpa)
+    day = (search.created_at or datetime.utcnow()).date()
+    for university_id, admission_chance in results:
+        rollup.add_result(university_id, admission_chance, day)
+    rollup.flush(db)
+
+
+def record_rescored(
+    db: Session, changes: Iterable[Tuple[int, float, float, date]]
+) -> None:
+    """
+    Move recomputed results, given as (university_id, old_chance, new_chance,
+    search day), between buckets. Does not commit.
+    """
+    rollup = _Rollup()
+    for university_id, old_chance, new_chance, day in changes:
+        rollup.add_result(university_id, old_chance, day, count=-1)
+        rollup.add_result(university_id, new_chance, day)
+    rollup.flush(db)
+
+
+def backfill_if_empty(db: Session) -> bool:
+    """
+    Build the rollups from existing history once, when the tables are new.
+    Streams searches and results in id order so memory stays bounded.
+    """
+    if db.query(ProfileHistogram.metric).first() is not None:
+        return False
+    if db.query(Search.id).first() is None:
+        return False
+
+    rollup = _Rollup()
+    after_id = 0
+    while True:
+        searches = (
+            db.query(Search.id, Search.gmat_score, Search.gpa, Search.created_at)
+            .filter(Search.id > after_id)
+            .order_by(Search.id)
+            .limit(BACKFILL_BATCH_SIZE)
+            .all()
+        )
+        if not searches:
+            break
+
+        days = {}
+        for search_id, gmat_score, gpa, created_at in searches:
+            rollup.add_search(gmat_score, gpa)
+            days[search_id] = (created_at or datetime.utcnow()).date()
+
+        results = db.query(
+            SearchResult.search_id,
+            SearchResult.university_id,
+            SearchResult.admission_chance,
+        ).filter(
+            SearchResult.search_id > after_id,
+            SearchResult.search_id <= searches[-1][0],
+        )
+        for search_id, university_id, admission_chance in results:
+            if search_id in days:
+                rollup.add_result(university_id, admission_chance, days[search_id])
+
+        rollup.flush(db)
+        db.commit()
+        after_id = searches[-1][0]
+
+    return True
+
+
+def summary(db: Session, days: Optional[int] = 30) -> dict:
+    """Read the rollups into histogram, per-school and tier-mix series"""
+    histograms = {"gmat": [], "gpa": []}
+    for row in db.query(ProfileHistogram).order_by(
+        ProfileHistogram.metric, ProfileHistogram.bucket
+    ):
+        histograms.setdefault(row.metric, []).append(
+            {"bucket": row.bucket, "count": row.count}
+        )
+
+    schools: Dict[int, dict] = {}
+    for row in db.query(SchoolChanceHistogram):
+        school = schools.setdefault(
+            row.university_id,
+            {"histogram": [0] * CHANCE_BUCKETS, "count": 0, "chance_sum": 0.0},
+        )
+        school["histogram"][row.bucket] += row.count
+        school["count"] += row.count
+        school["chance_sum"] += row.chance_sum
+
+    tier_query = db.query(TierDaily)
+    if days:
+        tier_query = tier_query.filter(
+            TierDaily.day >= datetime.utcnow().date() - timedelta(days=days - 1)
+        )
+    tier_mix: Dict[date, dict] = {}
+    for row in tier_query.order_by(TierDaily.day):
+        day = tier_mix.setdefault(
+            row.day, {"day": row.day, "safety": 0, "target": 0, "reach": 0}
+        )
+        day[row.tier] = row.count
+
+    return {
+        "searches_count": sum(bucket["count"] for bucket in histograms["gmat"]),
+        "gmat_histogram": histograms["gmat"],
+        "gpa_histogram": histograms["gpa"],
+        "schools": schools,
+        "tier_mix": list(tier_mix.values()),
+    }
@@ -0,0 +1,251 @@
+"""
+"Applicants like you" index over historical searches
+
+Each stored search is a point (gmat_score, gpa, work_experience) scaled by
+the matcher's standard deviations, bucketed per target_program into a
+uniform grid. A query scans grid shells outward from the applicant's cell
+and stops once k neighbors are known to be closer than any unvisited cell,
+or once MAX_RADIUS shells have been scanned (the approximate cut-off).
+
+Cells hold compact array.array columns, so tens of millions of searches cost
+about 20 bytes each. The index is loaded in the background at startup and
+extended as /api/match persists new searches. Every
+APPLICANT_INDEX_SYNC_SECONDS it also catches up from the searches table by
+id, picking up searches persisted by other workers, and evicts searches that
+retention has deleted.
+"""
+
+import os
+import threading
+import time
+from array import array
+from itertools import product
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+from database import SessionLocal, Search
+from matcher import CollegeMatcher
+
+# Grid cell width in standard deviations
+CELL_WIDTH = 0.2
+MAX_RADIUS = 10
+LOAD_BATCH_SIZE = 50_000
+APPLICANT_INDEX_SYNC_SECONDS = float(os.getenv("APPLICANT_INDEX_SYNC_SECONDS", "30"))
+
+SCALES = (
+    CollegeMatcher.GMAT_STD_DEV,
+    CollegeMatcher.GPA_STD_DEV,
+    CollegeMatcher.WORK_EXP_STD_DEV,
+)
+
+
+class _Cell:
+    __slots__ = ("ids", "gmat", "gpa", "work_exp")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.gmat = array("f")
+        self.gpa = array("f")
+        self.work_exp = array("f")
+
+
+def _scaled(gmat: float, gpa: float, work_exp: float) -> Tuple[float, float, float]:
+    return gmat / SCALES[0], gpa / SCALES[1], (work_exp or 0.0) / SCALES[2]
+
+
+def _cell_of(point: Tuple[float, float, float]) -> Tuple[int, int, int]:
+    return tuple(int(np.floor(value / CELL_WIDTH)) for value in point)
+
+
+class ApplicantIndex:
+    def __init__(self):
+        self.size = 0
+        self.ready = False
+        # Searches up to last_id have been read from the table; those below
+        # min_id have been evicted
+        self.last_id = 0
+        self.min_id = 0
+        self._cells: Dict[Tuple[str, int, int, int], _Cell] = {}
+        # Ids above last_id that add() indexed before the table caught up
+        self._pending: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def _insert(
+        self,
+        search_id: int,
+        gmat: float,
+        gpa: float,
+        work_exp: float,
+        target_program: str,
+    ) -> None:
+        point = _scaled(gmat, gpa, work_exp)
+        key = ((target_program or "").upper(), *_cell_of(point))
+        cell = self._cells.get(key)
+        if cell is None:
+            cell = self._cells[key] = _Cell()
+        cell.ids.append(search_id)
+        cell.gmat.append(point[0])
+        cell.gpa.append(point[1])
+        cell.work_exp.append(point[2])
+        self.size += 1
+
+    def add(
+        self,
+        search_id: int,
+        gmat: float,
+        gpa: float,
+        work_exp: float,
+        target_program: str,
+    ) -> None:
+        """Index a search this worker just persisted"""
+        with self._lock:
+            if search_id <= self.last_id or search_id in self._pending:
+                return
+            self._insert(search_id, gmat, gpa, work_exp, target_program)
+            self._pending.add(search_id)
+
+    def catch_up(self) -> int:
+        """Index searches persisted since last_id, in id-ordered batches"""
+        added = 0
+        db = SessionLocal()
+        try:
+            while True:
+                rows = (
+                    db.query(
+                        Search.id,
+                        Search.gmat_score,
+                        Search.gpa,
+                        Search.work_experience,
+                        Search.target_program,
+                    )
+                    .filter(Search.id > self.last_id)
+                    .order_by(Search.id)
+                    .limit(LOAD_BATCH_SIZE)
+                    .all()
+                )
+                if not rows:
+                    break
+                with self._lock:
+                    for row in rows:
+                        if row[0] not in self._pending:
+                            self._insert(*row)
+                            added += 1
+                    self.last_id = rows[-1][0]
+                    self._pending = {i for i in self._pending if i > self.last_id}
+                if len(rows) < LOAD_BATCH_SIZE:
+                    break
+        finally:
+            db.close()
+        return added
+
+    def evict_deleted(self) -> int:
+        """
+        Drop searches below the oldest one still stored. Retention deletes by
+        created_at, which follows id order, so deleted ids form a prefix.
+        """
+        db = SessionLocal()
+        try:
+            oldest = db.query(func.min(Search.id)).scalar()
+        finally:
+            db.close()
+        min_id = self.last_id + 1 if oldest is None else oldest
+        if min_id <= self.min_id:
+            return 0
+
+        evicted = 0
+        with self._lock:
+            for key, cell in list(self._cells.items()):
+                ids = np.frombuffer(cell.ids, dtype=np.int64)
+                keep = ids >= min_id
+                if keep.all():
+                    continue
+                evicted += int((~keep).sum())
+                if not keep.any():
+                    del self._cells[key]
+                    continue
+                kept = _Cell()
+                kept.ids.frombytes(ids[keep].tobytes())
+                for column in ("gmat", "gpa", "work_exp"):
+                    values = np.frombuffer(getattr(cell, column), dtype=np.float32)
+                    getattr(kept, column).frombytes(values[keep].tobytes())
+                self._cells[key] = kept
+            self.size -= evicted
+            self.min_id = min_id
+        return evicted
+
+    def load(self) -> None:
+        """Index every search stored so far"""
+        self.catch_up()
+        self.ready = True
+
+    def sync(self) -> None:
+        self.evict_deleted()
+        self.catch_up()
+
+    def start_loading(self) -> threading.Thread:
+        """Load in a thread, then sync every APPLICANT_INDEX_SYNC_SECONDS"""
+
+        def loop():
+            self.load()
+            while APPLICANT_INDEX_SYNC_SECONDS > 0:
+                time.sleep(APPLICANT_INDEX_SYNC_SECONDS)
+                try:
+                    self.sync()
+                except Exception as e:
+                    print(f"Applicant index sync error: {e}")
+
+        thread = threading.Thread(target=loop, name="applicant-index", daemon=True)
+        thread.start()
+        return thread
+
+    def nearest(
+        self, gmat: float, gpa: float, work_exp: float, target_program: str, k: int
+    ) -> List[Tuple[int, float]]:
+        """Up to k (search_id, distance) pairs, distance in standard deviations"""
+        program = (target_program or "").upper()
+        point = np.array(_scaled(gmat, gpa, work_exp))
+        center = _cell_of(tuple(point))
+
+        distances: List[np.ndarray] = []
+        ids: List[np.ndarray] = []
+        found = 0
+
+        with self._lock:
+            for radius in range(MAX_RADIUS + 1):
+                for offset in product(range(-radius, radius + 1), repeat=3):
+                    if max(abs(step) for step in offset) != radius:
+                        continue
+                    cell = self._cells.get(
+                        (program, *(c + step for c, step in zip(center, offset)))
+                    )
+                    if cell is None:
+                        continue
+                    columns = np.column_stack(
+                        (
+                            np.frombuffer(cell.gmat, dtype=np.float32),
+                            np.frombuffer(cell.gpa, dtype=np.float32),
+                            np.frombuffer(cell.work_exp, dtype=np.float32),
+                        )
+                    )
+                    distances.append(np.sqrt(((columns - point) ** 2).sum(axis=1)))
+                    ids.append(np.array(cell.ids, dtype=np.int64))
+                    found += len(cell.ids)
+
+                # Everything outside the scanned shells is at least this far away
+                if found >= k:
+                    reach = radius * CELL_WIDTH
+                    if sum(int((d <= reach).sum()) for d in distances) >= k:
+                        break
+
+        if not distances:
+            return []
+
+        all_distances = np.concatenate(distances)
+        all_ids = np.concatenate(ids)
+        nearest = np.argsort(all_distances)[:k]
+        return [(int(all_ids[i]), round(float(all_distances[i]), 4)) for i in nearest]
+
+
+applicant_index = ApplicantIndex()
@@ -0,0 +1,279 @@
+"""
+Offline batch scoring for applicant files
+
+Streams a CSV or JSON-lines file of applicant profiles (gmat_score, gpa and
+optionally work_experience, target_program and id) in chunks, scores each
+chunk against the catalog with CollegeMatcher.match_profiles on a thread
+pool, and streams each applicant's top matches out in input order. At most
+2 x workers chunks are in flight, so memory stays flat however large the
+file is. Files ending in .gz are read and written compressed.
+
+Usage:
+    python batch_score.py applicants.csv -o matches.csv --top 10
+    python batch_score.py applicants.jsonl -o matches.jsonl.gz --workers 4
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Optional, TextIO, Tuple, Union
+
+import numpy as np
+from pydantic import ValidationError
+
+from catalog import catalog
+from matcher import CollegeMatcher
+from models import UserProfileRequest
+from scoring import CompiledModel, model_registry
+
+OUTPUT_FIELDS = (
+    "applicant_id",
+    "rank",
+    "university_id",
+    "university",
+    "admission_chance",
+)
+
+
+def _open(path: str, mode: str):
+    if path == "-":
+        return nullcontext(sys.stdin if mode == "r" else sys.stdout)
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def _format_of(path: str, explicit: Optional[str]) -> str:
+    if explicit:
+        return explicit
+    name = path[:-3] if path.endswith(".gz") else path
+    return "jsonl" if name.endswith((".jsonl", ".json", ".ndjson")) else "csv"
+
+
+class InvalidRow:
+    """An unreadable input line, kept in place so later row numbers stay right"""
+
+    __slots__ = ("reason",)
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+
+def read_profiles(
+    stream: TextIO, input_format: str
+) -> Iterator[Union[dict, InvalidRow]]:
+    if input_format == "jsonl":
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield InvalidRow(f"invalid JSON ({e.msg})")
+                continue
+            yield value if isinstance(value, dict) else InvalidRow("not a JSON object")
+    else:
+        yield from csv.DictReader(stream)
+
+
+def _chunks(rows: Iterator, size: int) -> Iterator[list]:
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_chunk(
+    model: CompiledModel, rows: List[Union[dict, InvalidRow]], first_line: int, top: int
+) -> Tuple[List[Tuple[str, list]], List[str]]:
+    """
+    ([(applicant_id, [(row, probability), ...]), ...], errors) for one chunk,
+    in input order. Invalid rows, and applicants whose program has no
+    universities in the catalog, are reported and skipped.
+    """
+    profiles = []
+    errors = []
+    for line, row in enumerate(rows, start=first_line):
+        if isinstance(row, InvalidRow):
+            errors.append(f"row {line}: {row.reason}")
+            continue
+        try:
+            profile = UserProfileRequest(
+                **{
+                    field: value
+                    for field, value in row.items()
+                    if field in UserProfileRequest.model_fields and value != ""
+                }
+            )
+        except ValidationError as e:
+            errors.append(f"row {line}: {e.errors()[0]['msg']}")
+            continue
+        if not len(model.rows_for_program(profile.target_program)):
+            errors.append(
+                f"row {line}: no universities found for program type "
+                f"{profile.target_program}"
+            )
+            continue
+        profiles.append((str(row.get("id") or line), profile))
+
+    ranked = [None] * len(profiles)
+    by_program = {}
+    for index, (_, profile) in enumerate(profiles):
+        by_program.setdefault(profile.target_program.upper(), []).append(index)
+
+    for program, indexes in by_program.items():
+        candidates = model.rows_for_program(program)
+        matches = CollegeMatcher.match_profiles(
+            np.array([profiles[i][1].gmat_score for i in indexes]),
+            np.array([profiles[i][1].gpa for i in indexes]),
+            np.array([profiles[i][1].work_experience for i in indexes]),
+            model,
+            candidates,
+            limit=top,
+        )
+        for index, profile_matches in zip(indexes, matches):
+            ranked[index] = profile_matches
+
+    return [
+        (applicant_id, matches) for (applicant_id, _), matches in zip(profiles, ranked)
+    ], errors
+
+
+class _Writer:
+    def __init__(self, stream: TextIO, output_format: str, model: CompiledModel):
+        self.stream = stream
+        self.output_format = output_format
+        self.model = model
+        self.csv = None
+        if output_format == "csv":
+            self.csv = csv.writer(stream)
+            self.csv.writerow(OUTPUT_FIELDS)
+
+    def write(self, applicant_id: str, matches: list) -> None:
+        rows = [
+            (
+                applicant_id,
+                rank,
+                self.model.universities[row].id,
+                self.model.universities[row].name,
+                chance,
+            )
+            for rank, (row, chance) in enumerate(matches, start=1)
+        ]
+        if self.csv is not None:
+            self.csv.writerows(rows)
+        else:
+            self.stream.write(
+                json.dumps(
+                    {
+                        "applicant_id": applicant_id,
+                        "matches": [
+                            dict(zip(OUTPUT_FIELDS[1:], row[1:])) for row in rows
+                        ],
+                    }
+                )
+                + "\n"
+            )
+
+
+def run(
+    input_path: str,
+    output_path: str,
+    input_format: Optional[str] = None,
+    output_format: Optional[str] = None,
+    top: int = 10,
+    chunk_size: int = 1000,
+    workers: int = os.cpu_count() or 1,
+) -> dict:
+    """Score input_path into output_path; returns the run's counters"""
+    catalog.subscribe(model_registry.update)
+    model_registry.refresh(force=True)
+    catalog.refresh(force=True)
+    model = model_registry.active()
+
+    stats = {"rows": 0, "scored": 0, "invalid": 0, "errors": []}
+    started = time.perf_counter()
+
+    with _open(input_path, "r") as source, _open(output_path, "w") as target:
+        writer = _Writer(target, _format_of(output_path, output_format), model)
+        chunks = _chunks(
+            read_profiles(source, _format_of(input_path, input_format)), chunk_size
+        )
+
+        def drain(future) -> None:
+            results, errors = future.result()
+            for applicant_id, matches in results:
+                writer.write(applicant_id, matches)
+            stats["scored"] += len(results)
+            stats["invalid"] += len(errors)
+            stats["errors"].extend(errors[: 20 - len(stats["errors"])])
+
+        # Bounded in-flight window: results are written in input order and
+        # no more than 2 x workers chunks are held in memory
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(
+                    pool.submit(score_chunk, model, chunk, stats["rows"] + 1, top)
+                )
+                stats["rows"] += len(chunk)
+                if len(pending) >= 2 * workers:
+                    drain(pending.popleft())
+            while pending:
+                drain(pending.popleft())
+
+    stats["seconds"] = time.perf_counter() - started
+    stats["model_version"] = model.version
+    stats["catalog_version"] = model.catalog_version
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a file of applicant profiles")
+    parser.add_argument("input", help="CSV or JSON-lines file, or - for stdin")
+    parser.add_argument(
+        "-o", "--output", default="-", help="Output file (default stdout)"
+    )
+    parser.add_argument("--input-format", choices=("csv", "jsonl"))
+    parser.add_argument("--output-format", choices=("csv", "jsonl"))
+    parser.add_argument("--top", type=int, default=10, help="Matches per applicant")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    if args.top < 1:
+        parser.error("--top must be at least 1")
+
+    stats = run(
+        args.input,
+        args.output,
+        input_format=args.input_format,
+        output_format=args.output_format,
+        top=args.top,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+    )
+
+    report = sys.stderr
+    for error in stats["errors"]:
+        print(f"Skipped {error}", file=report)
+    rate = stats["scored"] / stats["seconds"] if stats["seconds"] else 0.0
+    print(
+        f"✓ Scored {stats['scored']} of {stats['rows']} applicants "
+        f"({stats['invalid']} invalid) in {stats['seconds']:.1f}s, "
+        f"{rate:,.0f} applicants/s "
+        f"[model {stats['model_version']}, catalog {stats['catalog_version']}]",
+        file=report,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+In-memory University catalog
+
+The catalog is loaded once from the database and kept as a snapshot of
+immutable UniversityRecord objects, which are not bound to any session. A
+cheap fingerprint query detects when the table has changed; listeners (such
+as the similar-schools index) are then told which rows were added, changed or
+removed so they can update incrementally.
+
+Under serve.py the snapshot comes from a shared memory segment published by
+the launcher instead, and version checks read its control file rather than
+the database.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import shared_catalog
+from database import SessionLocal, University
+
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "30"))
+
+# Numeric columns kept as arrays for vectorized scoring
+SCORING_COLUMNS = ("avg_gmat", "avg_gpa", "avg_work_experience", "acceptance_rate")
+
+# Columns that make up a catalog row for change detection
+CATALOG_COLUMNS = (
+    "name",
+    "program_type",
+    "avg_gmat",
+    "avg_gpa",
+    "acceptance_rate",
+    "location",
+    "ranking",
+    "avg_work_experience",
+    "tuition_cost",
+)
+
+
+def catalog_version(db: Session) -> str:
+    """Fingerprint of the universities table computed with a single aggregate query"""
+    row = db.query(
+        func.count(University.id),
+        func.max(University.id),
+        func.sum(University.id * University.avg_gmat),
+        func.sum(University.id * University.avg_gpa),
+        func.sum(University.id * University.acceptance_rate),
+        func.sum(University.id * func.coalesce(University.avg_work_experience, 0)),
+        func.sum(University.id * func.coalesce(University.tuition_cost, 0)),
+        func.sum(University.id * func.coalesce(University.ranking, 0)),
+        func.sum(University.id * func.length(University.name)),
+        func.sum(University.id * func.length(func.coalesce(University.location, ""))),
+        func.sum(University.id * func.length(University.program_type)),
+    ).one()
+    return hashlib.sha1(repr(tuple(row)).encode()).hexdigest()[:12]
+
+
+class UniversityRecord:
+    """
+    Read-only snapshot of a University row. Slots keep it small and make
+    attribute reads plain lookups, unlike instrumented ORM attributes.
+    """
+
+    __slots__ = ("id",) + CATALOG_COLUMNS
+
+    def __init__(self, id: int, **columns):
+        object.__setattr__(self, "id", id)
+        for column in CATALOG_COLUMNS:
+            object.__setattr__(self, column, columns.get(column))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UniversityRecord is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("UniversityRecord is immutable")
+
+    def __repr__(self) -> str:
+        return f"UniversityRecord(id={self.id!r}, name={self.name!r})"
+
+    @classmethod
+    def from_row(cls, university) -> "UniversityRecord":
+        """Copy any object with University's attributes, such as an ORM row"""
+        return cls(
+            university.id,
+            **{column: getattr(university, column) for column in CATALOG_COLUMNS},
+        )
+
+
+def _row_key(university: UniversityRecord) -> tuple:
+    return tuple(getattr(university, column) for column in CATALOG_COLUMNS)
+
+
+CatalogListener = Callable[["Catalog", Set[int], Set[int]], None]
+
+
+class Catalog:
+    def __init__(self):
+        self.version: Optional[str] = None
+        self.universities: List[UniversityRecord] = []
+        self.by_id: Dict[int, UniversityRecord] = {}
+        self.segment: Optional[shared_catalog.Segment] = None
+        self.columns: Dict[str, np.ndarray] = {}
+        self._program_rows: Dict[str, np.ndarray] = {}
+        self.checked_at = 0.0
+        self._keys: Dict[int, tuple] = {}
+        self._listeners: List[CatalogListener] = []
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.version is not None
+
+    def subscribe(self, listener: CatalogListener) -> None:
+        """
+        Register listener(catalog, changed_ids, removed_ids), called after
+        every reload. changed_ids includes newly added rows.
+        """
+        self._listeners.append(listener)
+        if self.loaded:
+            listener(self, set(self.by_id), set())
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload the catalog if its version changed. Version checks are
+        throttled to one per CATALOG_REFRESH_SECONDS unless force is set.
+        Uses its own session so request sessions never share catalog rows.
+        Returns True when a new version was loaded.
+        """
+        now = time.monotonic()
+        if (
+            not force
+            and self.loaded
+            and now - self.checked_at < CATALOG_REFRESH_SECONDS
+        ):
+            return False
+
+        with self._lock:
+            if (
+                not force
+                and self.loaded
+                and now - self.checked_at < CATALOG_REFRESH_SECONDS
+            ):
+                return False
+
+            if shared_catalog.CONTROL_PATH:
+                loaded = self._load_shared()
+            else:
+                loaded = self._load_database()
+            self.checked_at = time.monotonic()
+            if loaded is None:
+                return False
+            version, universities = loaded
+
+            keys = {university.id: _row_key(university) for university in universities}
+            changed = {
+                university_id
+                for university_id, key in keys.items()
+                if self._keys.get(university_id) != key
+            }
+            removed = set(self._keys) - set(keys)
+
+            self.universities = universities
+            self.by_id = {university.id: university for university in universities}
+            self._keys = keys
+            self.version = version
+            self._build_columns(shared_catalog.CONTROL_PATH is not None)
+
+            for listener in self._listeners:
+                listener(self, changed, removed)
+
+        return True
+
+    def _build_columns(self, shared: bool) -> None:
+        if shared:
+            # Zero-copy views into the mapped segment
+            self.columns = {
+                column: self.segment.columns[column] for column in SCORING_COLUMNS
+            }
+        else:
+            self.columns = {
+                column: np.array(
+                    [getattr(university, column) for university in self.universities],
+                    dtype=float,
+                )
+                for column in SCORING_COLUMNS
+            }
+
+        program_types = np.array(
+            [
+                (university.program_type or "").upper()
+                for university in self.universities
+            ]
+        )
+        self._program_rows = {
+            program: np.flatnonzero(program_types == program)
+            for program in np.unique(program_types)
+        }
+
+    def rows_for_program(self, program_type: str) -> np.ndarray:
+        """Row indexes into universities/columns for a program type (any case)"""
+        return self._program_rows.get(
+            (program_type or "").upper(), np.empty(0, dtype=np.int64)
+        )
+
+    def _load_database(self) -> Optional[Tuple[str, List[UniversityRecord]]]:
+        db = SessionLocal()
+        try:
+            version = catalog_version(db)
+            if version == self.version:
+                return None
+
+            # Plain column tuples: no ORM instances or identity map involved
+            rows = db.query(
+                University.id,
+                *(getattr(University, column) for column in CATALOG_COLUMNS),
+            ).order_by(University.id)
+            universities = [
+                UniversityRecord(row[0], **dict(zip(CATALOG_COLUMNS, row[1:])))
+                for row in rows
+            ]
+        finally:
+            db.close()
+
+        return version, universities
+
+    def _load_shared(self) -> Optional[Tuple[str, List[UniversityRecord]]]:
+        control = shared_catalog.read_control(shared_catalog.CONTROL_PATH)
+        if control is None or control[0] == self.version:
+            return None
+
+        self.segment = shared_catalog.Segment(control[1])
+        universities = [UniversityRecord(**row) for row in self.segment.rows()]
+        return self.segment.version, universities
+
+
+catalog = Catalog()
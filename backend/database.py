@@ -1,5 +1,6 @@
 from sqlalchemy import (
     create_engine,
+    event,
     Column,
     Integer,
     String,
@@ -7,9 +8,15 @@ from sqlalchemy import (
     DateTime,
     ForeignKey,
     Text,
+    Date,
+    Index,
+    func,
+    inspect,
+    text,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.schema import CreateIndex
 from datetime import datetime
 import os
 
@@ -19,6 +26,28 @@ engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
 )
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Sort key for universities without a ranking, so they sort and page last
+UNRANKED = 10**9
+
+
+if engine.dialect.name == "sqlite":
+
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        # WAL lets readers run alongside the single writer, and busy_timeout
+        # makes writers from other worker processes wait instead of failing
+        cursor = dbapi_connection.cursor()
+        # Only takes effect when the file is created, before the first table;
+        # existing databases are converted offline with retention.py convert
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -55,6 +84,15 @@ class University(Base):
 
     search_results = relationship("SearchResult", back_populates="university")
 
+    # Keyset pagination in (ranking, id) order; see University.rank_key()
+    __table_args__ = (
+        Index("ix_universities_rank_key_id", func.coalesce(ranking, UNRANKED), id),
+    )
+
+    @classmethod
+    def rank_key(cls):
+        return func.coalesce(cls.ranking, UNRANKED)
+
 
 class Search(Base):
     __tablename__ = "searches"
@@ -66,6 +104,8 @@ class Search(Base):
     gpa = Column(Float, nullable=False)
     work_experience = Column(Float, default=0.0)
     target_program = Column(String, default="MBA")
+    # Scoring model that produced the results (NULL for searches predating it)
+    model_version = Column(String, nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -74,12 +114,20 @@ class Search(Base):
         "SearchResult", back_populates="search", cascade="all, delete-orphan"
     )
 
+    # Keyset pagination of search history, newest first, overall and per user
+    __table_args__ = (
+        Index("ix_searches_created_at_id", created_at, id),
+        Index("ix_searches_user_created_at_id", user_id, created_at, id),
+    )
+
 
 class SearchResult(Base):
     __tablename__ = "search_results"
 
     id = Column(Integer, primary_key=True, index=True)
-    search_id = Column(Integer, ForeignKey("searches.id"), nullable=False)
+    search_id = Column(
+        Integer, ForeignKey("searches.id"), nullable=False, index=True
+    )
     university_id = Column(Integer, ForeignKey("universities.id"), nullable=False)
 
     admission_chance = Column(Float, nullable=False)
@@ -88,10 +136,116 @@ class SearchResult(Base):
     search = relationship("Search", back_populates="results")
     university = relationship("University", back_populates="search_results")
 
+    __table_args__ = (
+        # Finds every stored result for a school, e.g. when recomputing it
+        Index("ix_search_results_university_search", "university_id", "search_id"),
+        # A search's results in ranked order, for keyset pagination
+        Index(
+            "ix_search_results_search_chance_id",
+            search_id,
+            admission_chance.desc(),
+            id,
+        ),
+    )
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)
+    search_id = Column(Integer, ForeignKey("searches.id"), nullable=False, index=True)
+    # The full first response as JSON, so replays include the fields that are
+    # not stored with the search (components, chance bands, distances)
+    response = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ProfileHistogram(Base):
+    """Rollup: submitted profiles per GMAT/GPA bucket"""
+
+    __tablename__ = "analytics_profile_histogram"
+
+    metric = Column(String, primary_key=True)
+    bucket = Column(Float, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class SchoolChanceHistogram(Base):
+    """Rollup: stored admission chances per university, in 10-point buckets"""
+
+    __tablename__ = "analytics_school_chances"
+
+    university_id = Column(Integer, ForeignKey("universities.id"), primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    chance_sum = Column(Float, nullable=False, default=0.0)
+
+
+class TierDaily(Base):
+    """Rollup: Safety/Target/Reach results per day"""
+
+    __tablename__ = "analytics_tier_daily"
+
+    day = Column(Date, primary_key=True)
+    tier = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class ScoredUniversityStats(Base):
+    """Catalog stats that the stored search results currently reflect"""
+
+    __tablename__ = "scored_university_stats"
+
+    university_id = Column(Integer, ForeignKey("universities.id"), primary_key=True)
+    avg_gmat = Column(Float, nullable=False)
+    avg_gpa = Column(Float, nullable=False)
+    avg_work_experience = Column(Float)
+    acceptance_rate = Column(Float, nullable=False)
+
+
+class RecomputeJob(Base):
+    """Progress of recomputing stored results after catalog stats changed"""
+
+    __tablename__ = "recompute_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    catalog_version = Column(String, nullable=False)
+    # JSON list of the universities whose stats changed
+    university_ids = Column(Text, nullable=False)
+    stats_hash = Column(String, nullable=False)
+    # Searches up to this id have been recomputed
+    last_search_id = Column(Integer, nullable=False, default=0)
+    updated_results = Column(Integer, nullable=False, default=0)
+    status = Column(String, nullable=False, default="running", index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
 
 def init_db():
     Base.metadata.create_all(bind=engine)
 
+    # create_all skips existing tables, so add nullable columns and indexes
+    # introduced since then
+    existing = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        columns = {column["name"] for column in existing.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns and column.nullable:
+                column_type = column.type.compile(dialect=engine.dialect)
+                with engine.begin() as connection:
+                    connection.execute(
+                        text(
+                            f"ALTER TABLE {table.name} "
+                            f"ADD COLUMN {column.name} {column_type}"
+                        )
+                    )
+        # IF NOT EXISTS rather than checkfirst, which cannot reflect the
+        # expression index on universities
+        with engine.begin() as connection:
+            for index in table.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+
 
 def get_db():
     db = SessionLocal()
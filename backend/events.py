@@ -0,0 +1,145 @@
+"""
+Live search events for dashboards
+
+/api/match publishes each persisted search to an in-process SearchEventBus;
+/api/searches/events relays them as Server-Sent Events. Publishing happens
+on request threads, so events are handed to each subscriber's event loop
+with call_soon_threadsafe. Every subscriber has a bounded queue of
+SSE_BUFFER_SIZE events: one that falls that far behind is dropped with a
+final "dropped" event instead of buffering without limit, and its
+EventSource reconnects with Last-Event-ID to replay what it missed from the
+searches table.
+
+Events are per worker process: under serve.py a stream carries the searches
+its own worker handled live, and the rest when it resumes from the table.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from typing import AsyncIterator, Callable, List, Optional, Set
+
+SSE_BUFFER_SIZE = int(os.getenv("SSE_BUFFER_SIZE", "100"))
+SSE_MAX_SUBSCRIBERS = int(os.getenv("SSE_MAX_SUBSCRIBERS", "100"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+# Missed searches read from the table per query when a client resumes
+SSE_REPLAY_BATCH_SIZE = int(os.getenv("SSE_REPLAY_BATCH_SIZE", "1000"))
+
+
+def format_event(event_id: Optional[int], event: str, data: dict) -> str:
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines += [f"event: {event}", f"data: {json.dumps(data, default=str)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, buffer_size: int):
+        self.loop = loop
+        self.queue: "asyncio.Queue[Optional[dict]]" = asyncio.Queue(buffer_size)
+        self.dropped = False
+
+    def offer(self, event: dict) -> None:
+        """Queue an event on the subscriber's loop; overflow drops the subscriber"""
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped = True
+            # Make room for the sentinel that ends the stream
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class SearchEventBus:
+    def __init__(
+        self,
+        buffer_size: int = SSE_BUFFER_SIZE,
+        max_subscribers: int = SSE_MAX_SUBSCRIBERS,
+    ):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.published = 0
+        self.dropped = 0
+        self._subscribers: Set[Subscriber] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Optional[Subscriber]:
+        """A new subscriber on the running loop, or None when at capacity"""
+        subscriber = Subscriber(asyncio.get_running_loop(), self.buffer_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+        if subscriber.dropped:
+            self.dropped += 1
+
+    def publish(self, event: dict) -> None:
+        """Hand an event (with an "id") to every subscriber; callable from any thread"""
+        self.published += 1
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+            except RuntimeError:
+                # The subscriber's loop has closed
+                self.unsubscribe(subscriber)
+
+
+search_events = SearchEventBus()
+
+
+async def stream_searches(
+    subscriber: Subscriber,
+    replay: Callable[[int], List[dict]],
+    last_event_id: Optional[int],
+    keepalive_seconds: float = SSE_KEEPALIVE_SECONDS,
+) -> AsyncIterator[str]:
+    """
+    SSE text for a subscriber: every search after last_event_id, read from
+    the table with replay(after_id) in pages of SSE_REPLAY_BATCH_SIZE, then
+    live events. The subscriber is registered before the first replay query,
+    so nothing committed in between is missed; ids already sent are skipped.
+    """
+    try:
+        last_sent = last_event_id or 0
+        if last_event_id is not None:
+            while True:
+                events = await asyncio.to_thread(replay, last_sent)
+                for event in events:
+                    yield format_event(event["id"], "search", event)
+                    last_sent = event["id"]
+                if len(events) < SSE_REPLAY_BATCH_SIZE:
+                    break
+
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscriber.queue.get(), timeout=keepalive_seconds
+                )
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+
+            if event is None:
+                yield format_event(None, "dropped", {"reason": "slow consumer"})
+                return
+            if event["id"] <= last_sent:
+                continue
+            yield format_event(event["id"], "search", event)
+            last_sent = event["id"]
+    finally:
+        search_events.unsubscribe(subscriber)
@@ -0,0 +1,102 @@
+"""
+Streaming export of stored search results
+
+Rows are read with a server-side cursor over search_results joined with the
+universities table, EXPORT_BATCH_SIZE at a time, encoded as CSV or JSON
+lines and optionally gzip-compressed as they go, so memory use does not
+depend on the size of the export.
+"""
+
+import csv
+import io
+import json
+import os
+import zlib
+from typing import Iterator, List
+
+from sqlalchemy import select
+
+from database import SessionLocal, SearchResult, University
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+EXPORT_FIELDS = (
+    "rank",
+    "university_id",
+    "university",
+    "admission_chance",
+    "match_score",
+    "program_type",
+    "location",
+    "ranking",
+    "avg_gmat",
+    "avg_gpa",
+    "avg_work_experience",
+    "acceptance_rate",
+    "tuition_cost",
+)
+
+
+def _encode(rows: List[tuple], export_format: str) -> str:
+    if export_format == "jsonl":
+        return "".join(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in rows)
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def iter_export(
+    search_id: int, export_format: str, compress: bool = False
+) -> Iterator[bytes]:
+    """Encoded (and, with compress, gzip) chunks of a search's results, best first"""
+    # Its own session: the stream outlives the request's session
+    db = SessionLocal()
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+    try:
+        query = (
+            select(
+                SearchResult.university_id,
+                University.name,
+                SearchResult.admission_chance,
+                SearchResult.match_score,
+                University.program_type,
+                University.location,
+                University.ranking,
+                University.avg_gmat,
+                University.avg_gpa,
+                University.avg_work_experience,
+                University.acceptance_rate,
+                University.tuition_cost,
+            )
+            .join(University, University.id == SearchResult.university_id)
+            .where(SearchResult.search_id == search_id)
+            .order_by(SearchResult.admission_chance.desc(), SearchResult.id)
+            .execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+        )
+
+        def texts() -> Iterator[str]:
+            if export_format == "csv":
+                yield _encode([EXPORT_FIELDS], export_format)
+            rank = 0
+            for rows in db.execute(query).partitions():
+                yield _encode(
+                    [(rank + i, *row) for i, row in enumerate(rows, start=1)],
+                    export_format,
+                )
+                rank += len(rows)
+
+        for text in texts():
+            chunk = text.encode()
+            if compressor is not None:
+                # The compressor holds small chunks back until it has more
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+        if compressor is not None:
+            yield compressor.flush()
+    finally:
+        db.close()
@@ -0,0 +1,234 @@
+"""
+Location normalization and spatial filtering
+
+University.location is free text ("City, ST"). At catalog load each location
+is resolved against a bundled offline gazetteer (data/us_cities.csv, with
+data/us_states.csv as the state-centroid fallback) into state, Census region
+and coordinates. A uniform latitude/longitude grid then answers radius
+queries by scanning only the cells that overlap the query's bounding box
+before the exact great-circle check; region and state filters are lookups.
+"""
+
+import csv
+import math
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from catalog import Catalog
+
+DATA_DIR = Path(__file__).parent / "data"
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE = math.pi * EARTH_RADIUS_MILES / 180
+GRID_DEGREES = 1.0
+
+REGIONS = ("Northeast", "Midwest", "South", "West")
+
+_COORDINATES = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+class Place(NamedTuple):
+    city: Optional[str]
+    state: str
+    region: str
+    latitude: float
+    longitude: float
+
+
+def _key(text: str) -> str:
+    return " ".join(text.lower().replace(".", "").split())
+
+
+class Gazetteer:
+    def __init__(self, data_dir: Path = DATA_DIR):
+        self.states: Dict[str, Place] = {}
+        self._state_names: Dict[str, str] = {}
+        with open(data_dir / "us_states.csv", newline="") as states:
+            for row in csv.DictReader(states):
+                self.states[row["state"]] = Place(
+                    None,
+                    row["state"],
+                    row["region"],
+                    float(row["latitude"]),
+                    float(row["longitude"]),
+                )
+                self._state_names[_key(row["name"])] = row["state"]
+
+        # Cities are listed largest first, so a bare "Portland" is Oregon's
+        self.cities: Dict[Tuple[str, str], Place] = {}
+        self._by_city: Dict[str, Place] = {}
+        with open(data_dir / "us_cities.csv", newline="") as cities:
+            for row in csv.DictReader(cities):
+                place = Place(
+                    row["city"],
+                    row["state"],
+                    self.states[row["state"]].region,
+                    float(row["latitude"]),
+                    float(row["longitude"]),
+                )
+                self.cities[(_key(row["city"]), row["state"])] = place
+                self._by_city.setdefault(_key(row["city"]), place)
+
+    def state_code(self, text: str) -> Optional[str]:
+        """Two-letter code for a state code or name, any case"""
+        code = text.strip().upper()
+        if code in self.states:
+            return code
+        return self._state_names.get(_key(text))
+
+    def resolve(
+        self, text: Optional[str], state_fallback: bool = False
+    ) -> Optional[Place]:
+        """
+        Place for "City, ST", a bare city or state, or "lat,lon". With
+        state_fallback, a known state with an unknown city resolves to the
+        state's centroid; that is for placing catalog locations, not user
+        input, where it would silently search around the wrong point.
+        """
+        if not text or not text.strip():
+            return None
+
+        coordinates = _COORDINATES.match(text)
+        if coordinates:
+            latitude, longitude = map(float, coordinates.groups())
+            if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+                return Place(None, "", "", latitude, longitude)
+            return None
+
+        city, _, state = text.rpartition(",")
+        if city:
+            code = self.state_code(state)
+            if code is None:
+                return None
+            place = self.cities.get((_key(city), code))
+            if place is None and state_fallback:
+                return self.states[code]
+            return place
+
+        place = self._by_city.get(_key(text))
+        if place is not None:
+            return place
+        code = self.state_code(text)
+        return self.states[code] if code else None
+
+
+gazetteer = Gazetteer()
+
+
+def region_name(text: str) -> Optional[str]:
+    for region in REGIONS:
+        if region.lower() == text.strip().lower():
+            return region
+    return None
+
+
+def haversine_miles(
+    latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray
+) -> np.ndarray:
+    """Great-circle distances from one point to arrays of points"""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+
+
+def _cell(latitude: float, longitude: float) -> Tuple[int, int]:
+    return int(math.floor(latitude / GRID_DEGREES)), int(
+        math.floor(longitude / GRID_DEGREES)
+    )
+
+
+class GeoIndex:
+    def __init__(self):
+        self.places: Dict[int, Place] = {}
+        self._cells: Dict[Tuple[int, int], np.ndarray] = {}
+        self._latitudes = np.empty(0)
+        self._longitudes = np.empty(0)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._by_area: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+
+    def update(self, catalog: Catalog, changed: Set[int], removed: Set[int]) -> None:
+        """Catalog listener: normalize changed locations and rebuild the grid"""
+        with self._lock:
+            for university_id in removed:
+                self.places.pop(university_id, None)
+            for university_id in changed:
+                place = gazetteer.resolve(
+                    catalog.by_id[university_id].location, state_fallback=True
+                )
+                if place is None or not place.state:
+                    self.places.pop(university_id, None)
+                else:
+                    self.places[university_id] = place
+
+            ids = sorted(self.places)
+            self._ids = np.array(ids, dtype=np.int64)
+            self._latitudes = np.array([self.places[i].latitude for i in ids])
+            self._longitudes = np.array([self.places[i].longitude for i in ids])
+
+            cells: Dict[Tuple[int, int], List[int]] = {}
+            areas: Dict[str, Set[int]] = {}
+            for position, university_id in enumerate(ids):
+                place = self.places[university_id]
+                cells.setdefault(_cell(place.latitude, place.longitude), []).append(
+                    position
+                )
+                areas.setdefault(place.state, set()).add(university_id)
+                areas.setdefault(place.region, set()).add(university_id)
+            self._cells = {
+                cell: np.array(positions) for cell, positions in cells.items()
+            }
+            self._by_area = areas
+
+    def within(
+        self, latitude: float, longitude: float, radius_miles: float
+    ) -> Dict[int, float]:
+        """{university_id: distance in miles} for universities within the radius"""
+        lat_span = radius_miles / MILES_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(89.0, abs(latitude) + lat_span)))
+        lon_span = min(180.0, radius_miles / (MILES_PER_DEGREE * max(cos_lat, 1e-6)))
+
+        low_lat, low_lon = _cell(latitude - lat_span, longitude - lon_span)
+        high_lat, high_lon = _cell(latitude + lat_span, longitude + lon_span)
+
+        with self._lock:
+            positions = [
+                self._cells[(cell_lat, cell_lon)]
+                for cell_lat in range(low_lat, high_lat + 1)
+                for cell_lon in range(low_lon, high_lon + 1)
+                if (cell_lat, cell_lon) in self._cells
+            ]
+            if not positions:
+                return {}
+            positions = np.concatenate(positions)
+            distances = haversine_miles(
+                latitude,
+                longitude,
+                self._latitudes[positions],
+                self._longitudes[positions],
+            )
+            inside = distances <= radius_miles
+            return dict(
+                zip(
+                    self._ids[positions[inside]].tolist(),
+                    np.round(distances[inside], 1).tolist(),
+                )
+            )
+
+    def in_area(self, area: str) -> Optional[Set[int]]:
+        """University ids in a Census region or state; None if area is unknown"""
+        name = region_name(area) or gazetteer.state_code(area)
+        if name is None:
+            return None
+        with self._lock:
+            return set(self._by_area.get(name, ()))
+
+
+geo_index = GeoIndex()
@@ -0,0 +1,135 @@
+"""
+Cached health state for liveness and readiness probes
+
+Probes poll constantly, so they never touch the database themselves. A
+HealthMonitor thread checks every HEALTH_CHECK_SECONDS: it keeps the catalog
+current, pings the database and looks at the warm caches, and stores the
+result for /api/health/ready to return as is (/api/health reduces it to its
+original healthy/degraded shape). A worker reports ready once
+the catalog, the compiled scoring model and the applicant index are loaded
+and the database answers.
+
+State is per worker process.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+
+import admission
+from applicants import applicant_index
+from catalog import catalog
+from database import SessionLocal
+from scoring import model_registry
+from tiles import tile_store
+
+HEALTH_CHECK_SECONDS = float(os.getenv("HEALTH_CHECK_SECONDS", "10"))
+
+
+def _database_error() -> Optional[str]:
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+        return None
+    except Exception as e:
+        return str(e)
+    finally:
+        db.close()
+
+
+class HealthMonitor:
+    def __init__(self):
+        self.state = {"status": "starting", "ready": False}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state["ready"]
+
+    def legacy_state(self) -> dict:
+        """The cached state in /api/health's original healthy/degraded shape"""
+        state = self.state
+        if state.get("database") != "connected":
+            return {
+                "status": "degraded",
+                "database": "error",
+                "error": state.get("error", "health check has not run"),
+            }
+        return {
+            "status": "healthy",
+            "database": "connected",
+            "universities_count": state["universities_count"],
+        }
+
+    def check(self) -> dict:
+        """Run every check and replace the cached state"""
+        try:
+            catalog.refresh()
+        except Exception as e:
+            print(f"Health check catalog refresh failed: {e}")
+        database_error = _database_error()
+
+        model = None
+        try:
+            model = model_registry.active()
+        except RuntimeError:
+            pass
+
+        caches = {
+            "catalog": catalog.loaded,
+            "scoring_model": model is not None,
+            "applicant_index": applicant_index.ready,
+            # Tiles are optional; looking them up also maps them in
+            "tiles": model is not None and tile_store.get(model) is not None,
+        }
+        ready = database_error is None and all(
+            caches[name] for name in ("catalog", "scoring_model", "applicant_index")
+        )
+
+        state = {
+            "status": "ready" if ready else "starting",
+            "ready": ready,
+            "checked_at": datetime.utcnow().isoformat(),
+            "catalog_version": catalog.version,
+            "universities_count": len(catalog.universities),
+            "database": "connected" if database_error is None else "error",
+            "writer_queue_depth": admission.limiter.queued_writes,
+            "caches": caches,
+        }
+        if database_error is not None:
+            state["status"] = "degraded" if self.ready else "starting"
+            state["error"] = database_error
+        self.state = state
+        return state
+
+    def start(self) -> threading.Thread:
+        """Check now, then every HEALTH_CHECK_SECONDS in a thread"""
+        if self._thread is not None:
+            return self._thread
+
+        def check():
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Health check error: {e}")
+
+        def loop():
+            while True:
+                # Poll quickly until warm so readiness flips soon after
+                time.sleep(HEALTH_CHECK_SECONDS if self.ready else 1)
+                check()
+
+        # The first check runs before startup finishes, so there is always a
+        # database status to report
+        check()
+
+        self._thread = threading.Thread(target=loop, name="health-check", daemon=True)
+        self._thread.start()
+        return self._thread
+
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,94 @@
+"""
+Request coalescing and idempotency keys for /api/match
+
+Identical concurrent match requests share one in-flight computation
+(single-flight), so only one of them scores the catalog and writes a Search.
+Clients may also send an Idempotency-Key header; repeats of the same key
+return the first request's response, stored with the key, instead of
+inserting a new Search.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import IdempotencyKey
+
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self):
+        self.coalesced = 0
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, work: Callable[[], Awaitable[T]]) -> T:
+        """Await work() once per key; concurrent callers with the key share it"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(work())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        # Shielded so one caller disconnecting does not cancel the others
+        return await asyncio.shield(flight)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+
+def request_hash(payload: dict) -> str:
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def lookup(db: Session, key: str, payload_hash: str) -> Optional[IdempotencyKey]:
+    """The stored key, or None if the key is new or expired"""
+    stored = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+    if stored is None:
+        return None
+
+    expires_at = stored.created_at + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+    if expires_at < datetime.utcnow():
+        db.delete(stored)
+        db.commit()
+        return None
+
+    if stored.request_hash != payload_hash:
+        raise HTTPException(
+            status_code=409,
+            detail="Idempotency-Key was already used with a different request",
+        )
+
+    return stored
+
+
+def remember(
+    db: Session, key: str, payload_hash: str, search_id: int, response: str
+) -> IdempotencyKey:
+    """
+    Store key -> search_id and the JSON response. If a concurrent request
+    stored the key first, returns that request's key instead.
+    """
+    stored = IdempotencyKey(
+        key=key, request_hash=payload_hash, search_id=search_id, response=response
+    )
+    db.add(stored)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return lookup(db, key, payload_hash) or stored
+    return stored
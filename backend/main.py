@@ -1,14 +1,30 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 import uvicorn
 import os
+from datetime import datetime
 from pathlib import Path
+import numpy as np
 
-from database import init_db, get_db, User, University, Search, SearchResult
+from database import (
+    init_db,
+    get_db,
+    SessionLocal,
+    User,
+    University,
+    Search,
+    SearchResult,
+    IdempotencyKey,
+    UNRANKED,
+)
 from models import (
     UserProfileRequest,
     UserCreateRequest,
@@ -18,10 +34,62 @@ from models import (
     SearchResponse,
     MatchResponse,
     ProgramStats,
+    ScoreRequirementRequest,
+    ScoreRequirement,
+    ScoreRequirementResponse,
+    SimilarUniversity,
+    UniversitySearchResponse,
+    SimilarApplicantsRequest,
+    ApplicantTopMatch,
+    SimilarApplicantsResponse,
+    AnalyticsResponse,
+    SchoolChanceDistribution,
+    ScoringModelsResponse,
+    MatchComponents,
+    ReweightRequest,
+    LocationFilter,
+    ChanceBand,
+    ProfileUncertainty,
+    PortfolioRequest,
+    PortfolioSchool,
+    PortfolioResponse,
+    MatchView,
+    ColumnarMatchResponse,
+    UniversityMetadataResponse,
 )
 from matcher import CollegeMatcher
+from catalog import CATALOG_COLUMNS, UniversityRecord, catalog
+from scoring import MONTE_CARLO_SAMPLES, model_registry, component_cache
+import shared_catalog
+from similar import similarity_index
+from university_search import university_search_index
+from geo import geo_index, gazetteer
+from pagination import encode_cursor, decode_keyset
+from applicants import applicant_index
+import analytics
+from retention import start_retention_job
+from recompute import start_recompute_job
+from tiles import start_tile_job, tile_store
+import admission
+import idempotency
+from export import EXPORT_FORMATS, iter_export
+from events import SSE_REPLAY_BATCH_SIZE, search_events, stream_searches
+from health import health_monitor
+
+# Only an authenticating proxy that sets X-User-Id itself (and strips it from
+# client requests) makes the header trustworthy; otherwise it is ignored
+TRUST_USER_ID_HEADER = os.getenv("TRUST_USER_ID_HEADER", "0").lower() in (
+    "1",
+    "true",
+    "yes",
+)
 
 init_db()
+match_flights = idempotency.SingleFlight()
+catalog.subscribe(model_registry.update)
+catalog.subscribe(similarity_index.update)
+catalog.subscribe(university_search_index.update)
+catalog.subscribe(geo_index.update)
 
 app = FastAPI(
     title="OrbitAI - Right Fit Matcher API",
@@ -29,15 +97,58 @@ app = FastAPI(
     version="1.0.0",
 )
 
+
+@app.middleware("http")
+async def admission_control(request, call_next):
+    """Rate-limit clients and shed load on API endpoints before they queue up"""
+    if not admission.is_limited(request.url.path):
+        return await call_next(request)
+
+    client = admission.client_key(
+        request.headers.get("X-Forwarded-For", ""),
+        request.client.host if request.client else None,
+    )
+    retry_after = admission.rate_limiter.check(client)
+    if retry_after is not None:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Rate limit exceeded"},
+            headers=admission.retry_after_header(retry_after),
+        )
+
+    priority = (
+        admission.READ_PRIORITY
+        if request.method == "GET"
+        else admission.WRITE_PRIORITY
+    )
+    shed_reason = await admission.limiter.acquire(priority)
+    if shed_reason is not None:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Server is busy, please retry", "reason": shed_reason},
+            headers=admission.retry_after_header(admission.limiter.queue_timeout),
+        )
+
+    try:
+        return await call_next(request)
+    finally:
+        admission.limiter.release()
+
+
 # Configure CORS - allow all origins in production (since frontend is served from same domain)
+# Added after admission control so it is the outer layer: 429 and 503
+# responses still carry CORS headers, and preflights are answered before
+# they reach the rate limiter
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+
 # Mount static files - serve the built React frontend
 static_dir = Path(__file__).parent / "static"
 if static_dir.exists():
@@ -45,27 +156,213 @@ if static_dir.exists():
     print(f"✓ Serving frontend static files from {static_dir}")
 
 
+@app.on_event("startup")
+async def load_catalog():
+    model_registry.refresh(force=True)
+    catalog.refresh(force=True)
+    applicant_index.start_loading()
+    health_monitor.start()
+
+    # Under serve.py the launcher runs these once for all workers
+    if shared_catalog.CONTROL_PATH:
+        return
+
+    db = SessionLocal()
+    try:
+        if analytics.backfill_if_empty(db):
+            print("✓ Built analytics rollups from search history")
+    finally:
+        db.close()
+    start_retention_job()
+    start_recompute_job()
+    start_tile_job()
+    print(
+        f"✓ Loaded catalog version {catalog.version} "
+        f"({len(catalog.universities)} universities)"
+    )
+
+
 @app.get("/api/health")
 @app.get("/health")  # Keep old endpoint for backward compatibility
-async def health_check(db: Session = Depends(get_db)):
-    try:
-        university_count = db.query(University).count()
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "universities_count": university_count,
-        }
-    except Exception as e:
-        return {
-            "status": "degraded",
-            "database": "error",
-            "error": str(e),
-        }
+async def health_check():
+    """Last background health check, in the original response shape"""
+    return health_monitor.legacy_state()
+
+
+@app.get("/api/health/live")
+async def liveness():
+    """Liveness probe: answers whenever the worker's event loop is running"""
+    return {"status": "alive"}
+
+
+@app.get("/api/health/ready")
+async def readiness():
+    """
+    Readiness probe: the cached state from the background health check,
+    503 until the catalog and caches are warm and the database answers
+    """
+    state = health_monitor.state
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Admission control counters for this worker: queue depth, in-flight, shed"""
+    return {
+        **admission.metrics(),
+        "coalesced_requests": match_flights.coalesced,
+        "event_subscribers": search_events.subscribers,
+        "events_published": search_events.published,
+        "event_subscribers_dropped": search_events.dropped,
+    }
+
+
+def location_filter(
+    near: Optional[str] = Query(
+        None, description='Center of a radius filter: "City, ST", a state or "lat,lon"'
+    ),
+    radius_miles: float = Query(100, gt=0, le=3000, description="Radius around near"),
+    region: Optional[str] = Query(
+        None, description="Census region (Northeast, Midwest, South, West) or state"
+    ),
+) -> LocationFilter:
+    return LocationFilter(near=near, radius_miles=radius_miles, region=region)
+
+
+def profile_uncertainty(
+    gmat_uncertainty: float = Query(
+        0, ge=0, le=200, description="Standard deviation of a projected GMAT score"
+    ),
+    gpa_uncertainty: float = Query(
+        0, ge=0, le=1, description="Standard deviation of a projected GPA"
+    ),
+    work_exp_uncertainty: float = Query(
+        0, ge=0, le=10, description="Standard deviation of work experience (years)"
+    ),
+    band_samples: int = Query(
+        MONTE_CARLO_SAMPLES,
+        ge=100,
+        le=20000,
+        description="Perturbed profiles scored per chance band",
+    ),
+) -> ProfileUncertainty:
+    return ProfileUncertainty(
+        gmat_score=gmat_uncertainty,
+        gpa=gpa_uncertainty,
+        work_experience=work_exp_uncertainty,
+        samples=band_samples,
+    )
+
+
+def match_view(
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated match fields to return, e.g. "
+        "university_id,admission_chance",
+    ),
+    format: str = Query(
+        "rows",
+        pattern="^(rows|columnar)$",
+        description="rows, or columnar for parallel arrays per field",
+    ),
+) -> MatchView:
+    names = None
+    if fields is not None:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in UniversityMatch.model_fields]
+        if unknown:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown match fields: {', '.join(unknown)}"
+            )
+        if not names:
+            raise HTTPException(
+                status_code=400, detail="fields must name at least one match field"
+            )
+    return MatchView(fields=names, format=format)
+
+
+def current_user_id(
+    x_user_id: Optional[int] = Header(
+        None,
+        alias="X-User-Id",
+        ge=1,
+        description="Signed-in user, set by the authenticating proxy",
+    ),
+    db: Session = Depends(get_db),
+) -> Optional[int]:
+    """
+    The signed-in user's id, or None for anonymous requests. X-User-Id is
+    only honored when TRUST_USER_ID_HEADER says a proxy vouches for it.
+    """
+    if x_user_id is None or not TRUST_USER_ID_HEADER:
+        return None
+    if db.get(User, x_user_id) is None:
+        raise HTTPException(status_code=401, detail="Unknown user")
+    return x_user_id
+
+
+def _apply_location_filter(
+    location: LocationFilter,
+) -> Tuple[Optional[Set[int]], Dict[int, float]]:
+    """
+    University ids allowed by a location filter (None when it is not set) and
+    the distance in miles to each of them when near was given
+    """
+    allowed = None
+    distances = {}
+
+    if location.near:
+        place = gazetteer.resolve(location.near)
+        if place is None:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown location: {location.near}"
+            )
+        distances = geo_index.within(
+            place.latitude, place.longitude, location.radius_miles
+        )
+        allowed = set(distances)
+
+    if location.region:
+        in_region = geo_index.in_area(location.region)
+        if in_region is None:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown region or state: {location.region}"
+            )
+        allowed = in_region if allowed is None else allowed & in_region
+
+    return allowed, distances
+
+
+@app.get("/api/models", response_model=ScoringModelsResponse)
+async def get_scoring_models():
+    """Scoring models available to this worker and the one used for new searches"""
+    model_registry.refresh()
+    return ScoringModelsResponse(
+        active_version=model_registry.active_version,
+        models=list(model_registry.models.values()),
+    )
 
 
 @app.post("/api/match", response_model=MatchResponse)
 async def match_universities(
-    profile: UserProfileRequest, db: Session = Depends(get_db)
+    profile: UserProfileRequest,
+    limit: Optional[int] = Query(
+        None, ge=1, description="Return only the best N matches"
+    ),
+    include_components: bool = Query(
+        False, description="Include the unweighted factors behind each chance"
+    ),
+    location: LocationFilter = Depends(location_filter),
+    uncertainty: ProfileUncertainty = Depends(profile_uncertainty),
+    user_id: Optional[int] = Depends(current_user_id),
+    view: MatchView = Depends(match_view),
+    idempotency_key: Optional[str] = Header(
+        None,
+        alias="Idempotency-Key",
+        max_length=255,
+        description="Repeats with the same key return the first request's search",
+    ),
+    db: Session = Depends(get_db),
 ):
     """
     Match user profile with universities and return ranked results
@@ -75,40 +372,160 @@ async def match_universities(
     2. Compares against university database
     3. Calculates admission probability for each match
     4. Returns ranked list of best-fit universities
+
+    With gmat_uncertainty, gpa_uncertainty or work_exp_uncertainty set, each
+    match also gets a p10/p50/p90 chance_band from Monte Carlo sampling.
+
+    Identical concurrent requests are coalesced into one computation and
+    share the same search_id. With a trusted X-User-Id the search is saved
+    to that user's history. fields and format=columnar trim the response (see
+    _shape_matches).
     """
-    try:
-        universities = (
-            db.query(University)
-            .filter(University.program_type == profile.target_program)
-            .all()
+    payload_hash = idempotency.request_hash(
+        {
+            **profile.model_dump(),
+            "limit": limit,
+            "include_components": include_components,
+            "location": location.model_dump() if location.active else None,
+            "uncertainty": uncertainty.model_dump() if uncertainty.active else None,
+            "user_id": user_id,
+        }
+    )
+
+    if idempotency_key:
+        stored = idempotency.lookup(db, idempotency_key, payload_hash)
+        if stored is not None:
+            return _shape_matches(_idempotent_response(db, stored), view)
+
+    model_registry.refresh()
+    response = await match_flights.run(
+        (payload_hash, catalog.version, model_registry.active_version),
+        lambda: run_in_threadpool(
+            _run_match,
+            profile,
+            limit,
+            include_components,
+            location,
+            uncertainty,
+            user_id,
+        ),
+    )
+
+    if idempotency_key:
+        stored = idempotency.remember(
+            db,
+            idempotency_key,
+            payload_hash,
+            response.search_id,
+            response.model_dump_json(),
         )
+        if stored.search_id != response.search_id:
+            response = _idempotent_response(db, stored)
+
+    return _shape_matches(response, view)
+
 
-        if not universities:
+def _run_match(
+    profile: UserProfileRequest,
+    limit: Optional[int],
+    include_components: bool,
+    location: LocationFilter,
+    uncertainty: ProfileUncertainty,
+    user_id: Optional[int],
+) -> MatchResponse:
+    """
+    Score the catalog for a profile and persist the search with its results.
+    Runs as shared work for coalesced requests, so it uses its own session
+    rather than one tied to the request that started it.
+    """
+    db = SessionLocal()
+    try:
+        catalog.refresh()
+        # Rows and the universities they index come from one compiled snapshot
+        model = model_registry.active()
+        candidates = model.rows_for_program(profile.target_program)
+
+        if not len(candidates):
             raise HTTPException(
                 status_code=404,
                 detail=f"No universities found for program type: {profile.target_program}. Currently, only MBA programs are available. MS and Executive MBA programs are coming soon!",
             )
 
-        matches = CollegeMatcher.match_universities(
-            user_gmat=profile.gmat_score,
-            user_gpa=profile.gpa,
-            user_work_exp=profile.work_experience,
-            target_program=profile.target_program,
-            universities=universities,
+        allowed, distances = _apply_location_filter(location)
+        if allowed is not None:
+            candidates = np.intersect1d(candidates, model.rows_for_ids(allowed))
+            if not len(candidates):
+                raise HTTPException(
+                    status_code=404,
+                    detail="No universities found matching the location filter",
+                )
+
+        # On-grid profiles are read from the precomputed tiles when built
+        ranked = tile_store.match(
+            model,
+            profile.target_program,
+            candidates,
+            profile.gmat_score,
+            profile.gpa,
+            profile.work_experience,
+            limit,
         )
+        if ranked is None:
+            ranked = CollegeMatcher.match_catalog(
+                user_gmat=profile.gmat_score,
+                user_gpa=profile.gpa,
+                user_work_exp=profile.work_experience,
+                model=model,
+                candidates=candidates,
+                limit=limit,
+            )
+        matches = [
+            (model.universities[row], admission_prob)
+            for row, admission_prob in ranked
+        ]
 
         search = Search(
+            user_id=user_id,
             gmat_score=profile.gmat_score,
             gpa=profile.gpa,
             work_experience=profile.work_experience,
             target_program=profile.target_program,
+            model_version=model.version,
         )
         db.add(search)
         db.commit()
         db.refresh(search)
+        applicant_index.add(
+            search.id,
+            search.gmat_score,
+            search.gpa,
+            search.work_experience,
+            search.target_program,
+        )
+
+        bands = {}
+        if uncertainty.active:
+            rows = np.array([row for row, _ in ranked], dtype=np.int64)
+            matrix = model.chance_bands(
+                profile.gmat_score,
+                profile.gpa,
+                profile.work_experience,
+                rows,
+                (uncertainty.gmat_score, uncertainty.gpa, uncertainty.work_experience),
+                samples=uncertainty.samples,
+            )
+            bands = dict(zip(rows.tolist(), matrix.T.tolist()))
+
+        components = {}
+        if include_components:
+            # Also warms the cache used by /api/searches/{id}/reweight. That
+            # re-ranks the whole program (the location filter is not stored),
+            # so the entry holds every program row, not just the filtered ones
+            _, rows, matrix = component_cache.get(search, model)
+            components = dict(zip(rows.tolist(), matrix.T.tolist()))
 
         university_matches = []
-        for university, admission_prob in matches:
+        for (row, _), (university, admission_prob) in zip(ranked, matches):
             search_result = SearchResult(
                 search_id=search.id,
                 university_id=university.id,
@@ -116,27 +533,29 @@ async def match_universities(
             )
             db.add(search_result)
 
-            match = UniversityMatch(
-                university=university.name,
-                admission_chance=f"{admission_prob:.1f}",
-                program_stats=ProgramStats(
-                    acceptance_rate=university.acceptance_rate,
-                    avg_gmat=university.avg_gmat,
-                    avg_gpa=university.avg_gpa,
-                    avg_work_experience=university.avg_work_experience,
-                ),
-                location=university.location,
-                ranking=university.ranking,
-                tuition_cost=university.tuition_cost,
+            match = _university_match(
+                university,
+                admission_prob,
+                components=_match_components(components.get(row)),
+                distance_miles=distances.get(university.id),
+                chance_band=_chance_band(bands.get(row)),
             )
             university_matches.append(match)
 
+        analytics.record_search(
+            db,
+            search,
+            [(university.id, admission_prob) for university, admission_prob in matches],
+        )
+        event = _search_summary(search, len(matches))
         db.commit()
+        search_events.publish(event)
 
         return MatchResponse(
             matches=university_matches,
             search_id=search.id,
             total_universities=len(university_matches),
+            model_version=search.model_version,
         )
 
     except HTTPException:
@@ -147,12 +566,356 @@ async def match_universities(
             status_code=500,
             detail=f"Matching error: {str(e)}",
         )
+    finally:
+        db.close()
+
+
+def _shape_matches(response: MatchResponse, view: MatchView):
+    """
+    A match response trimmed to view.fields and/or transposed into columns.
+    Shaping happens after scoring, so coalesced requests can differ in view.
+    """
+    if not view.active:
+        return response
+
+    if view.format == "columnar":
+        fields = view.fields or ["university_id", "admission_chance"]
+        columns = {
+            field: [
+                _column_value(field, getattr(match, field))
+                for match in response.matches
+            ]
+            for field in fields
+        }
+        shaped = ColumnarMatchResponse(
+            columns=columns,
+            search_id=response.search_id,
+            total_universities=response.total_universities,
+            model_version=response.model_version,
+            catalog_version=catalog.version,
+            next_cursor=response.next_cursor,
+        )
+        return JSONResponse(content=shaped.model_dump(mode="json"))
+
+    content = response.model_dump(mode="json", exclude={"matches"})
+    content["matches"] = [
+        match.model_dump(mode="json", include=set(view.fields))
+        for match in response.matches
+    ]
+    return JSONResponse(content=content)
+
+
+def _column_value(field: str, value):
+    if field == "admission_chance":
+        # Numbers are smaller than the row format's strings in a column
+        return float(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return value
+
+
+def _search_summary(search: Search, results_count: int) -> dict:
+    return SearchResponse(
+        id=search.id,
+        gmat_score=search.gmat_score,
+        gpa=search.gpa,
+        work_experience=search.work_experience,
+        target_program=search.target_program,
+        created_at=search.created_at,
+        results_count=results_count,
+        model_version=search.model_version,
+    ).model_dump(mode="json")
+
+
+def _university_match(
+    university: UniversityRecord, admission_chance: float, **fields
+) -> UniversityMatch:
+    """A match built from the catalog snapshot, without touching the ORM"""
+    return UniversityMatch(
+        university_id=university.id,
+        university=university.name,
+        admission_chance=f"{admission_chance:.1f}",
+        program_stats=ProgramStats(
+            acceptance_rate=university.acceptance_rate,
+            avg_gmat=university.avg_gmat,
+            avg_gpa=university.avg_gpa,
+            avg_work_experience=university.avg_work_experience,
+        ),
+        location=university.location,
+        ranking=university.ranking,
+        tuition_cost=university.tuition_cost,
+        **fields,
+    )
+
+
+def _match_components(factors: Optional[List[float]]) -> Optional[MatchComponents]:
+    if factors is None:
+        return None
+    gmat_match, gpa_match, work_exp_match, acceptance_factor = factors
+    return MatchComponents(
+        gmat_match=round(gmat_match, 4),
+        gpa_match=round(gpa_match, 4),
+        work_exp_match=round(work_exp_match, 4),
+        acceptance_factor=round(acceptance_factor, 4),
+    )
+
+
+def _chance_band(percentiles: Optional[List[float]]) -> Optional[ChanceBand]:
+    if percentiles is None:
+        return None
+    p10, p50, p90 = percentiles
+    return ChanceBand(p10=p10, p50=p50, p90=p90)
+
+
+# A plain def: FastAPI runs it in the threadpool, off the event loop
+@app.post("/api/match/requirements", response_model=ScoreRequirementResponse)
+def get_score_requirements(request: ScoreRequirementRequest):
+    """
+    Minimum GMAT, GPA or work experience needed at each school for a target chance
+
+    The field named in solve_for is solved for; the other profile fields are
+    held fixed. Schools where the target is above the active scoring model's
+    cap (acceptance_rate + 10 for v1), or beyond the input range, are
+    reported as unreachable.
+    """
+    fixed_fields = {"gmat_score": request.gmat_score, "gpa": request.gpa}
+    missing = [
+        field
+        for field, value in fixed_fields.items()
+        if field != request.solve_for and value is None
+    ]
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Missing required profile fields: {', '.join(missing)}",
+        )
+
+    catalog.refresh()
+    # Solved against the active model, so answers agree with /api/match
+    model = model_registry.active()
+    rows = model.rows_for_program(request.target_program)
+    if not len(rows):
+        raise HTTPException(
+            status_code=404,
+            detail=f"No universities found for program type: {request.target_program}",
+        )
+    requirements = CollegeMatcher.calculate_score_requirements(
+        target_probability=request.target_chance,
+        solve_for=request.solve_for,
+        user_gmat=request.gmat_score,
+        user_gpa=request.gpa,
+        user_work_exp=request.work_experience,
+        model=model,
+        rows=rows,
+    )
+
+    return ScoreRequirementResponse(
+        solve_for=request.solve_for,
+        target_chance=request.target_chance,
+        requirements=[
+            ScoreRequirement(
+                university_id=university.id,
+                university=university.name,
+                required_value=required,
+                reachable=required is not None,
+                unreachable_reason=reason,
+                max_chance=min(
+                    model.model.max_probability,
+                    university.acceptance_rate + model.model.acceptance_rate_margin,
+                ),
+            )
+            for university, required, reason in requirements
+        ],
+    )
+
+
+@app.post("/api/match/portfolio", response_model=PortfolioResponse)
+async def optimize_portfolio(request: PortfolioRequest):
+    """
+    Choose which schools to apply to
+
+    Picks up to max_applications schools (optionally under max_tuition) that
+    maximize the chance of at least one admit, or with objective=ranking the
+    expected utility of the best admit, where rank 1 is worth 1.0 and the
+    lowest-ranked candidate 1/N. Schools are listed in the order picked.
+    """
+    catalog.refresh()
+    model = model_registry.active()
+    candidates = model.rows_for_program(request.target_program)
+    if not len(candidates):
+        raise HTTPException(
+            status_code=404,
+            detail=f"No universities found for program type: {request.target_program}",
+        )
+
+    if request.max_tuition is not None:
+        tuition = np.array(
+            [model.universities[row].tuition_cost for row in candidates], dtype=float
+        )
+        # Unknown tuition cannot be shown to fit the cap
+        candidates = candidates[tuition <= request.max_tuition]
+        if not len(candidates):
+            raise HTTPException(
+                status_code=404,
+                detail="No universities found within the tuition cap",
+            )
+
+    probabilities = model.probabilities(
+        request.gmat_score, request.gpa, request.work_experience, candidates
+    )
+    if request.objective == "ranking":
+        rankings = [model.universities[row].ranking for row in candidates]
+        worst = max((ranking for ranking in rankings if ranking), default=1)
+        # Unranked schools count as the lowest ranked
+        utilities = np.array(
+            [(worst + 1 - (ranking or worst)) / worst for ranking in rankings]
+        )
+    else:
+        utilities = np.ones(len(candidates))
+
+    picks, gains, value = CollegeMatcher.optimize_portfolio(
+        probabilities, utilities, request.max_applications
+    )
+    schools = []
+    for index, gain in zip(picks, gains):
+        university = model.universities[candidates[index]]
+        chance = float(probabilities[index])
+        schools.append(
+            PortfolioSchool(
+                university_id=university.id,
+                university=university.name,
+                admission_chance=chance,
+                tier=CollegeMatcher.tier(chance),
+                ranking=university.ranking,
+                tuition_cost=university.tuition_cost,
+                marginal_gain=round(gain, 4),
+            )
+        )
+
+    admit_none = np.prod(1 - probabilities[picks] / 100.0)
+    return PortfolioResponse(
+        objective=request.objective,
+        schools=schools,
+        at_least_one_admit=round(float(1 - admit_none) * 100, 2),
+        expected_utility=round(value, 4),
+        candidates_considered=len(candidates),
+        model_version=model.version,
+    )
+
+
+@app.post("/api/match/similar-applicants", response_model=SimilarApplicantsResponse)
+async def get_similar_applicants(
+    request: SimilarApplicantsRequest, db: Session = Depends(get_db)
+):
+    """
+    Where applicants like you were matched
+
+    Finds the k past searches closest to this profile (same target program)
+    and counts how often each university appeared in their top_n matches.
+    """
+    neighbors = applicant_index.nearest(
+        request.gmat_score,
+        request.gpa,
+        request.work_experience,
+        request.target_program,
+        request.k,
+    )
+    search_ids = [search_id for search_id, _ in neighbors]
+
+    counts = {}
+    chances = {}
+    # Neighbors archived by retention have no stored results and are skipped
+    per_search = {}
+    if search_ids:
+        results = (
+            db.query(
+                SearchResult.search_id,
+                SearchResult.university_id,
+                SearchResult.admission_chance,
+            )
+            .filter(SearchResult.search_id.in_(search_ids))
+            .all()
+        )
+        for search_id, university_id, chance in results:
+            per_search.setdefault(search_id, []).append((chance, university_id))
+        for rows in per_search.values():
+            rows.sort(reverse=True)
+            for chance, university_id in rows[: request.top_n]:
+                counts[university_id] = counts.get(university_id, 0) + 1
+                chances[university_id] = chances.get(university_id, 0.0) + chance
+
+    catalog.refresh()
+    top_matches = [
+        ApplicantTopMatch(
+            university_id=university_id,
+            university=catalog.by_id[university_id].name,
+            count=count,
+            share=round(count / len(per_search), 4),
+            avg_admission_chance=round(chances[university_id] / count, 1),
+        )
+        for university_id, count in sorted(
+            counts.items(), key=lambda item: item[1], reverse=True
+        )
+        if university_id in catalog.by_id
+    ]
+
+    distances = [
+        distance for search_id, distance in neighbors if search_id in per_search
+    ]
+    return SimilarApplicantsResponse(
+        neighbors_found=len(per_search),
+        mean_distance=(
+            round(sum(distances) / len(distances), 4) if distances else None
+        ),
+        index_ready=applicant_index.ready,
+        top_matches=top_matches,
+    )
+
+
+@app.get("/api/analytics", response_model=AnalyticsResponse)
+async def get_analytics(
+    days: int = Query(30, ge=1, le=3650, description="Days of tier mix history"),
+    db: Session = Depends(get_db),
+):
+    """
+    Population-level analytics over all submitted searches
+
+    Served from rollup tables maintained as searches are persisted.
+    """
+    rollups = analytics.summary(db, days)
+    catalog.refresh()
+
+    school_chances = [
+        SchoolChanceDistribution(
+            university_id=university_id,
+            university=catalog.by_id[university_id].name,
+            results_count=school["count"],
+            avg_admission_chance=round(school["chance_sum"] / school["count"], 1),
+            chance_histogram=school["histogram"],
+        )
+        for university_id, school in rollups["schools"].items()
+        if university_id in catalog.by_id and school["count"]
+    ]
+    school_chances.sort(key=lambda school: school.avg_admission_chance, reverse=True)
+
+    return AnalyticsResponse(
+        searches_count=rollups["searches_count"],
+        gmat_histogram=rollups["gmat_histogram"],
+        gpa_histogram=rollups["gpa_histogram"],
+        school_chances=school_chances,
+        tier_mix=rollups["tier_mix"],
+    )
 
 
 @app.get("/api/universities", response_model=List[UniversityResponse])
 async def get_universities(
+    response: Response,
     program_type: Optional[str] = Query(None, description="Filter by program type"),
-    limit: Optional[int] = Query(100, le=100, description="Maximum results"),
+    limit: int = Query(100, ge=1, le=100, description="Maximum results"),
+    location: LocationFilter = Depends(location_filter),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor header from the previous page"
+    ),
     db: Session = Depends(get_db),
 ):
     """
@@ -160,108 +923,480 @@ async def get_universities(
 
     Optional filters:
     - program_type: Filter by program (MBA, MS, etc.)
+    - near / radius_miles: Within a radius of a city, state or "lat,lon"
+    - region: Census region or state
     - limit: Maximum number of results
+
+    Universities are ordered by ranking (unranked last), then id. When more
+    follow, the X-Next-Cursor response header holds the cursor for the next
+    page.
     """
+    after = decode_keyset(cursor, int, int)
     query = db.query(University)
 
     if program_type:
         query = query.filter(University.program_type == program_type)
 
-    query = query.order_by(University.ranking.asc())
-    universities = query.limit(limit).all()
+    distances = {}
+    if location.active:
+        catalog.refresh()
+        allowed, distances = _apply_location_filter(location)
+        query = query.filter(University.id.in_(allowed))
+
+    rank_key = University.rank_key()
+    if after:
+        # The first condition bounds the index range scan
+        query = query.filter(
+            rank_key >= after[0],
+            or_(rank_key > after[0], University.id > after[1]),
+        )
+    query = query.order_by(rank_key, University.id)
+    universities = query.limit(limit + 1).all()
+    if len(universities) > limit:
+        universities = universities[:limit]
+        last = universities[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            last.ranking if last.ranking is not None else UNRANKED, last.id
+        )
+
+    if not distances:
+        return universities
+    return [
+        UniversityResponse.model_validate(university).model_copy(
+            update={"distance_miles": distances.get(university.id)}
+        )
+        for university in universities
+    ]
+
+
+# (catalog version, encoded metadata response)
+_metadata_cache: Tuple[Optional[str], bytes] = (None, b"")
 
-    return universities
+
+@app.get("/api/universities/metadata", response_model=UniversityMetadataResponse)
+async def get_university_metadata(
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+):
+    """
+    Static fields of every school as parallel arrays, for columnar matches
+
+    Encoded once per catalog version and served with that version as its
+    ETag, so clients download it once and revalidate with If-None-Match.
+    """
+    global _metadata_cache
+    catalog.refresh()
+    version, body = _metadata_cache
+    if version != catalog.version:
+        universities = catalog.universities
+        columns = {"university_id": [university.id for university in universities]}
+        for column in CATALOG_COLUMNS:
+            columns[column] = [
+                getattr(university, column) for university in universities
+            ]
+        version = catalog.version
+        body = (
+            UniversityMetadataResponse(catalog_version=version, columns=columns)
+            .model_dump_json()
+            .encode()
+        )
+        _metadata_cache = (version, body)
+
+    headers = {"ETag": f'"{version}"', "Cache-Control": "public, max-age=300"}
+    if if_none_match == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/universities/search", response_model=UniversitySearchResponse)
+async def search_universities(
+    q: Optional[str] = Query(None, description="Text to find in name or location"),
+    program_type: Optional[str] = Query(None, description="Filter by program type"),
+    min_tuition: Optional[float] = Query(None, ge=0),
+    max_tuition: Optional[float] = Query(None, ge=0),
+    min_ranking: Optional[int] = Query(None, ge=1),
+    max_ranking: Optional[int] = Query(None, ge=1),
+    min_acceptance_rate: Optional[float] = Query(None, ge=0, le=100),
+    max_acceptance_rate: Optional[float] = Query(None, ge=0, le=100),
+    min_gmat: Optional[float] = Query(None, ge=200, le=800),
+    max_gmat: Optional[float] = Query(None, ge=200, le=800),
+    location: LocationFilter = Depends(location_filter),
+    limit: int = Query(20, ge=1, le=100, description="Page size"),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor from the previous page"
+    ),
+):
+    """
+    Search universities by name/location text and numeric ranges
+
+    Results are ordered by ranking and paged with an opaque keyset cursor.
+    """
+    catalog.refresh()
+    after = decode_keyset(cursor, int, int)
+    allowed, distances = _apply_location_filter(location)
+
+    ids, total, next_key = university_search_index.search(
+        query=q,
+        program_type=program_type,
+        ranges={
+            "tuition_cost": (min_tuition, max_tuition),
+            "ranking": (min_ranking, max_ranking),
+            "acceptance_rate": (min_acceptance_rate, max_acceptance_rate),
+            "avg_gmat": (min_gmat, max_gmat),
+        },
+        ids=allowed,
+        after=tuple(after) if after else None,
+        limit=limit,
+    )
+
+    return UniversitySearchResponse(
+        universities=[
+            UniversityResponse.model_validate(catalog.by_id[i]).model_copy(
+                update={"distance_miles": distances.get(i)}
+            )
+            for i in ids
+            if i in catalog.by_id
+        ],
+        total_matches=total,
+        next_cursor=encode_cursor(*next_key) if next_key else None,
+    )
 
 
 @app.get("/api/universities/{university_id}", response_model=UniversityResponse)
-async def get_university(university_id: int, db: Session = Depends(get_db)):
+async def get_university(university_id: int):
     """Get details of a specific university"""
-    university = db.query(University).filter(University.id == university_id).first()
+    catalog.refresh()
+    university = catalog.by_id.get(university_id)
 
     if not university:
         raise HTTPException(status_code=404, detail="University not found")
 
-    return university
+    return UniversityResponse.model_validate(university)
+
+
+@app.get(
+    "/api/universities/{university_id}/similar",
+    response_model=List[SimilarUniversity],
+)
+async def get_similar_universities(
+    university_id: int,
+    k: int = Query(5, ge=1, le=50, description="Number of similar programs"),
+):
+    """
+    Programs with the closest profile to a university
+
+    Similarity is Euclidean distance over standardized avg_gmat, avg_gpa,
+    avg_work_experience, acceptance_rate, tuition_cost and ranking.
+    """
+    catalog.refresh()
+    neighbors = similarity_index.similar(university_id, k)
+
+    if neighbors is None:
+        raise HTTPException(status_code=404, detail="University not found")
+
+    similar = []
+    for other_id, distance in neighbors:
+        university = catalog.by_id.get(other_id)
+        if university is None:
+            continue
+        similar.append(
+            SimilarUniversity(
+                **UniversityResponse.model_validate(university).model_dump(),
+                distance=distance,
+            )
+        )
+
+    return similar
 
 
 @app.get("/api/searches", response_model=List[SearchResponse])
 async def get_searches(
-    limit: int = Query(10, le=50, description="Maximum results"),
+    response: Response,
+    limit: int = Query(10, ge=1, le=50, description="Maximum results"),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor header from the previous page"
+    ),
     db: Session = Depends(get_db),
 ):
-    """Get recent search history"""
-    searches = db.query(Search).order_by(Search.created_at.desc()).limit(limit).all()
+    """
+    Get recent search history, newest first
+
+    When older searches follow, the X-Next-Cursor response header holds the
+    cursor for the next page.
+    """
+    return _search_page(db.query(Search), db, response, limit, cursor)
 
-    response = []
-    for search in searches:
-        search_data = SearchResponse(
-            id=search.id,
-            gmat_score=search.gmat_score,
-            gpa=search.gpa,
-            work_experience=search.work_experience,
-            target_program=search.target_program,
-            created_at=search.created_at,
-            results_count=len(search.results),
+
+def _search_page(
+    query, db: Session, response: Response, limit: int, cursor: Optional[str]
+) -> List[dict]:
+    """A newest-first keyset page of searches, setting X-Next-Cursor"""
+    after = decode_keyset(cursor, datetime.fromisoformat, int)
+    if after:
+        # The first condition bounds the index range scan
+        query = query.filter(
+            Search.created_at <= after[0],
+            or_(Search.created_at < after[0], Search.id < after[1]),
+        )
+    searches = (
+        query.order_by(Search.created_at.desc(), Search.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    if len(searches) > limit:
+        searches = searches[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            searches[-1].created_at.isoformat(), searches[-1].id
         )
-        response.append(search_data)
 
-    return response
+    # One grouped count for the page instead of loading every search's results
+    counts = dict(
+        db.query(SearchResult.search_id, func.count(SearchResult.id))
+        .filter(SearchResult.search_id.in_([search.id for search in searches]))
+        .group_by(SearchResult.search_id)
+    )
+
+    return [_search_summary(search, counts.get(search.id, 0)) for search in searches]
+
+
+def _searches_after(last_id: int) -> List[dict]:
+    """Searches persisted after last_id, oldest first, for event stream replay"""
+    db = SessionLocal()
+    try:
+        searches = (
+            db.query(Search)
+            .filter(Search.id > last_id)
+            .order_by(Search.id)
+            .limit(SSE_REPLAY_BATCH_SIZE)
+            .all()
+        )
+        counts = dict(
+            db.query(SearchResult.search_id, func.count(SearchResult.id))
+            .filter(SearchResult.search_id.in_([search.id for search in searches]))
+            .group_by(SearchResult.search_id)
+        )
+        return [
+            _search_summary(search, counts.get(search.id, 0)) for search in searches
+        ]
+    finally:
+        db.close()
+
+
+@app.get("/api/searches/events")
+async def search_event_stream(
+    last_event_id: Optional[int] = Header(None, ge=0),
+    after: Optional[int] = Query(
+        None, ge=0, description="Resume after this search id (like Last-Event-ID)"
+    ),
+):
+    """
+    Server-Sent Events stream of searches as /api/match persists them
+
+    Each "search" event carries the search id as its event id, so an
+    EventSource that reconnects with Last-Event-ID first gets every search it
+    missed, paged from the searches table. A client that falls
+    SSE_BUFFER_SIZE events behind gets a "dropped" event and is
+    disconnected, and should reconnect to resume.
+    """
+    subscriber = search_events.subscribe()
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many event stream subscribers")
+
+    resume = last_event_id if last_event_id is not None else after
+    return StreamingResponse(
+        stream_searches(subscriber, _searches_after, resume),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/api/searches/{search_id}", response_model=MatchResponse)
-async def get_search_results(search_id: int, db: Session = Depends(get_db)):
-    """Get results from a previous search"""
-    search = db.query(Search).filter(Search.id == search_id).first()
+async def get_search_results(
+    search_id: int,
+    limit: Optional[int] = Query(
+        None, ge=1, le=1000, description="Page size (default: all results)"
+    ),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor from the previous page"
+    ),
+    view: MatchView = Depends(match_view),
+    db: Session = Depends(get_db),
+):
+    """
+    Get results from a previous search, best first
 
+    With limit, results are paged and next_cursor is set while more follow.
+    fields and format=columnar trim the response as for /api/match.
+    """
+    after = decode_keyset(cursor, float, int)
+    return _shape_matches(_stored_match_response(db, search_id, limit, after), view)
+
+
+@app.get("/api/searches/{search_id}/export")
+async def export_search_results(
+    search_id: int,
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|jsonl)$", description="csv or jsonl"),
+    db: Session = Depends(get_db),
+):
+    """
+    Download a stored search's results with catalog fields, best first
+
+    Rows are streamed from the database in batches, gzip-encoded when the
+    client accepts it, so exports of any size use the same server memory.
+    """
+    if not db.query(Search.id).filter(Search.id == search_id).first():
+        raise HTTPException(status_code=404, detail="Search not found")
+
+    compress = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {
+        "Content-Disposition": f'attachment; filename="search-{search_id}.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        iter_export(search_id, format, compress),
+        media_type=EXPORT_FORMATS[format],
+        headers=headers,
+    )
+
+
+@app.post("/api/searches/{search_id}/reweight", response_model=MatchResponse)
+async def reweight_search(
+    search_id: int,
+    request: ReweightRequest,
+    view: MatchView = Depends(match_view),
+    db: Session = Depends(get_db),
+):
+    """
+    Re-rank a stored search with custom factor weights
+
+    Weights are normalized to sum to 1. The search's per-school factors are
+    cached, so repeated calls (e.g. from UI sliders) only recombine them and
+    re-apply the probability caps. Nothing is stored.
+    """
+    search = db.query(Search).filter(Search.id == search_id).first()
     if not search:
         raise HTTPException(status_code=404, detail="Search not found")
 
-    # Get all results for this search
-    results = (
-        db.query(SearchResult)
-        .filter(SearchResult.search_id == search_id)
-        .order_by(SearchResult.admission_chance.desc())
-        .all()
+    weights = np.array(
+        [
+            request.gmat_weight,
+            request.gpa_weight,
+            request.work_exp_weight,
+            request.acceptance_rate_weight,
+        ]
     )
+    if weights.sum() <= 0:
+        raise HTTPException(status_code=400, detail="At least one weight must be > 0")
+
+    catalog.refresh()
+    model, rows, matrix = component_cache.get(search)
+    if not len(rows):
+        raise HTTPException(
+            status_code=404,
+            detail=f"No universities found for program type: {search.target_program}",
+        )
+
+    probabilities = model.combine(matrix, rows, weights / weights.sum())
+    # Ties keep catalog order, as in /api/match
+    order = np.lexsort((rows, -probabilities))[: request.limit]
 
     university_matches = []
-    for result in results:
-        university = result.university
-        match = UniversityMatch(
-            university=university.name,
-            admission_chance=f"{result.admission_chance:.1f}",
-            program_stats=ProgramStats(
-                acceptance_rate=university.acceptance_rate,
-                avg_gmat=university.avg_gmat,
-                avg_gpa=university.avg_gpa,
-                avg_work_experience=university.avg_work_experience,
+    for i in order:
+        university = model.universities[rows[i]]
+        university_matches.append(
+            _university_match(
+                university,
+                probabilities[i],
+                components=_match_components(matrix[:, i].tolist()),
+            )
+        )
+
+    response = MatchResponse(
+        matches=university_matches,
+        search_id=search.id,
+        total_universities=len(university_matches),
+        model_version=model.version,
+    )
+    return _shape_matches(response, view)
+
+
+def _idempotent_response(db: Session, stored: IdempotencyKey) -> MatchResponse:
+    """The response first returned for an Idempotency-Key"""
+    if stored.response is None:
+        # Keys stored before responses were kept
+        return _stored_match_response(db, stored.search_id)
+    return MatchResponse.model_validate_json(stored.response)
+
+
+def _stored_match_response(
+    db: Session,
+    search_id: int,
+    limit: Optional[int] = None,
+    after: Optional[List] = None,
+) -> MatchResponse:
+    search = db.query(Search).filter(Search.id == search_id).first()
+
+    if not search:
+        raise HTTPException(status_code=404, detail="Search not found")
+
+    # Results for this search in the order they were ranked, resuming after
+    # the (admission_chance, id) cursor key
+    query = db.query(
+        SearchResult.id, SearchResult.university_id, SearchResult.admission_chance
+    ).filter(SearchResult.search_id == search_id)
+    if after:
+        query = query.filter(
+            SearchResult.admission_chance <= after[0],
+            or_(
+                SearchResult.admission_chance < after[0],
+                and_(
+                    SearchResult.admission_chance == after[0],
+                    SearchResult.id > after[1],
+                ),
             ),
-            location=university.location,
-            ranking=university.ranking,
-            tuition_cost=university.tuition_cost,
         )
-        university_matches.append(match)
+    query = query.order_by(SearchResult.admission_chance.desc(), SearchResult.id)
+    results = query.limit(limit + 1).all() if limit else query.all()
+
+    next_cursor = None
+    if limit and len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_cursor(results[-1].admission_chance, results[-1].id)
+
+    # School details come from the catalog snapshot; results for schools
+    # since removed from the catalog are left out
+    catalog.refresh()
+    university_matches = [
+        _university_match(catalog.by_id[result.university_id], result.admission_chance)
+        for result in results
+        if result.university_id in catalog.by_id
+    ]
 
     return MatchResponse(
         matches=university_matches,
         search_id=search.id,
         total_universities=len(university_matches),
+        model_version=search.model_version,
+        next_cursor=next_cursor,
     )
 
 
 @app.post("/api/users", response_model=UserResponse)
 async def create_user(user: UserCreateRequest, db: Session = Depends(get_db)):
     """Create a new user"""
-    # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user.email).first()
-    if existing_user:
+    new_user = User(email=user.email, name=user.name)
+    db.add(new_user)
+    try:
+        # The unique index on email rejects duplicates; no lookup first
+        db.commit()
+    except IntegrityError:
+        db.rollback()
         raise HTTPException(
             status_code=400, detail="User with this email already exists"
         )
-
-    new_user = User(email=user.email, name=user.name)
-    db.add(new_user)
-    db.commit()
     db.refresh(new_user)
 
     return new_user
@@ -278,6 +1413,35 @@ async def get_user(user_id: int, db: Session = Depends(get_db)):
     return user
 
 
+@app.get("/api/users/{user_id}/searches", response_model=List[SearchResponse])
+async def get_user_searches(
+    user_id: int,
+    response: Response,
+    limit: int = Query(10, ge=1, le=50, description="Maximum results"),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor header from the previous page"
+    ),
+    signed_in_user_id: Optional[int] = Depends(current_user_id),
+    db: Session = Depends(get_db),
+):
+    """
+    A user's search history, newest first, paged like /api/searches. Only
+    that user, signed in through the trusted X-User-Id header, can read it.
+
+    Pages are range scans of the (user_id, created_at, id) index, so they
+    cost the same however many users and searches there are.
+    """
+    if signed_in_user_id is None:
+        raise HTTPException(status_code=401, detail="Sign in to view search history")
+    if signed_in_user_id != user_id:
+        raise HTTPException(
+            status_code=403, detail="Search history belongs to another user"
+        )
+
+    query = db.query(Search).filter(Search.user_id == user_id)
+    return _search_page(query, db, response, limit, cursor)
+
+
 # Catch-all route to serve the React frontend (must be last!)
 @app.get("/{full_path:path}")
 async def serve_frontend(full_path: str):
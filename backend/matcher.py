@@ -8,19 +8,118 @@ This algorithm calculates admission probability based on multiple factors:
 4. Acceptance rate (15% weight)
 """
 
+import heapq
 import math
-from typing import List, Tuple
+import os
+from concurrent.futures import ThreadPoolExecutor
+from statistics import NormalDist
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import numpy as np
+
 from database import University
 
+if TYPE_CHECKING:
+    from catalog import UniversityRecord
+    from scoring import CompiledModel
+
+# Abramowitz & Stegun 7.1.26 coefficients (absolute error < 1.5e-7)
+_ERF_P = 0.3275911
+_ERF_A = (0.254829592, -0.284496736, 1.421413741, -1.453152027, 1.061405429)
+
+# Acklam's inverse normal CDF coefficients (relative error < 1.2e-9)
+_PPF_A = (
+    -3.969683028665376e01,
+    2.209460984245205e02,
+    -2.759285104469687e02,
+    1.383577518672690e02,
+    -3.066479806614716e01,
+    2.506628277459239e00,
+)
+_PPF_B = (
+    -5.447609879822406e01,
+    1.615858368580409e02,
+    -1.556989798598866e02,
+    6.680131188771972e01,
+    -1.328068155288572e01,
+)
+_PPF_C = (
+    -7.784894002430293e-03,
+    -3.223964580411365e-01,
+    -2.400758277161838e00,
+    -2.549671010312372e00,
+    4.374664141464968e00,
+    2.938163982698783e00,
+)
+_PPF_D = (
+    7.784695709041462e-03,
+    3.224671290700398e-01,
+    2.445134137142996e00,
+    3.754408661907416e00,
+)
+_PPF_TAIL = 0.02425
+
+MATCH_THREADS = int(os.getenv("MATCH_THREADS", os.cpu_count() or 1))
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _erf(x: np.ndarray) -> np.ndarray:
+    sign = np.sign(x)
+    x = np.abs(x)
+    t = 1.0 / (1.0 + _ERF_P * x)
+    a1, a2, a3, a4, a5 = _ERF_A
+    poly = ((((a5 * t + a4) * t + a3) * t + a2) * t + a1) * t
+    return sign * (1.0 - poly * np.exp(-x * x))
+
+
+def _polynomial(coefficients, x: np.ndarray) -> np.ndarray:
+    result = np.zeros_like(x)
+    for coefficient in coefficients:
+        result = result * x + coefficient
+    return result
+
+
+def _norm_ppf(p: np.ndarray) -> np.ndarray:
+    """Vectorized NormalDist().inv_cdf for 0 < p < 1"""
+    p = np.asarray(p, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        q = p - 0.5
+        r = q * q
+        central = _polynomial(_PPF_A, r) * q / (_polynomial(_PPF_B, r) * r + 1.0)
+        tail_q = np.sqrt(-2 * np.log(np.minimum(p, 1 - p)))
+        tail = _polynomial(_PPF_C, tail_q) / (_polynomial(_PPF_D, tail_q) * tail_q + 1)
+    return np.where(p < _PPF_TAIL, tail, np.where(p > 1 - _PPF_TAIL, -tail, central))
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=MATCH_THREADS, thread_name_prefix="match-shard"
+        )
+    return _executor
+
+
 class CollegeMatcher:
     GMAT_WEIGHT = 0.40
     GPA_WEIGHT = 0.30
     WORK_EXP_WEIGHT = 0.15
     ACCEPTANCE_RATE_WEIGHT = 0.15
 
+    GMAT_STD_DEV = 100
+    GPA_STD_DEV = 0.3
+    WORK_EXP_STD_DEV = 2.0
+
+    # Valid range and rounding step of each profile input (see UserProfileRequest)
+    INPUT_BOUNDS = {
+        "gmat_score": (200, 800, 1),
+        "gpa": (0.0, 4.0, 0.01),
+        "work_experience": (0.0, 30.0, 0.1),
+    }
+
     @staticmethod
     def calculate_score_match(
-        user_score: float, avg_score: float, std_dev: float
+        user_score: float, avg_score: float, std_dev: float, floor: float = 0.3
     ) -> float:
         if std_dev == 0:
             std_dev = avg_score * 0.15
@@ -29,24 +128,24 @@ class CollegeMatcher:
         probability = 0.5 * (1 + math.erf(z_score / math.sqrt(2)))
 
         if user_score < avg_score:
-            penalty_factor = max(0.3, probability)
+            penalty_factor = max(floor, probability)
             return penalty_factor
         else:
             return min(1.0, 0.5 + probability * 0.5)
 
     @staticmethod
     def calculate_gmat_match(user_gmat: int, avg_gmat: float) -> float:
-        std_dev = 100
+        std_dev = CollegeMatcher.GMAT_STD_DEV
         return CollegeMatcher.calculate_score_match(user_gmat, avg_gmat, std_dev)
 
     @staticmethod
     def calculate_gpa_match(user_gpa: float, avg_gpa: float) -> float:
-        std_dev = 0.3
+        std_dev = CollegeMatcher.GPA_STD_DEV
         return CollegeMatcher.calculate_score_match(user_gpa, avg_gpa, std_dev)
 
     @staticmethod
     def calculate_work_exp_match(user_exp: float, avg_exp: float) -> float:
-        std_dev = 2.0
+        std_dev = CollegeMatcher.WORK_EXP_STD_DEV
         return CollegeMatcher.calculate_score_match(user_exp, avg_exp, std_dev)
 
     @staticmethod
@@ -99,3 +198,488 @@ class CollegeMatcher:
         matches.sort(key=lambda x: x[1], reverse=True)
 
         return matches
+
+    # Catalogs smaller than this are scored inline on the request thread
+    PARALLEL_MIN_CATALOG = 50_000
+    MIN_SHARD_SIZE = 20_000
+
+    @staticmethod
+    def _top_matches(
+        user_gmat: int,
+        user_gpa: float,
+        user_work_exp: float,
+        model: "CompiledModel",
+        candidates: np.ndarray,
+        limit: Optional[int],
+    ) -> List[Tuple[float, int]]:
+        """Best (negated probability, row) pairs among candidate rows, sorted"""
+        probabilities = model.probabilities(
+            user_gmat, user_gpa, user_work_exp, candidates
+        )
+        if limit is not None and limit < len(candidates):
+            # Everything tied with the limit-th best competes for the last places
+            cutoff = -np.partition(-probabilities, limit - 1)[limit - 1]
+            best = np.flatnonzero(probabilities >= cutoff)
+        else:
+            best = np.arange(len(candidates))
+        # Ties keep catalog order, as the stable sort in match_universities does
+        order = np.lexsort((candidates[best], -probabilities[best]))[:limit]
+        return [
+            (-float(probabilities[best[i]]), int(candidates[best[i]])) for i in order
+        ]
+
+    @staticmethod
+    def match_catalog(
+        user_gmat: int,
+        user_gpa: float,
+        user_work_exp: float,
+        model: "CompiledModel",
+        candidates: np.ndarray,
+        limit: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Rank catalog rows by admission probability as (row, probability) pairs,
+        scored with a scoring model compiled against the catalog (scoring.py).
+
+        Large catalogs are split into shards scored on a thread pool (NumPy
+        releases the GIL in the array kernels); each shard keeps its own top
+        `limit` and the sorted shard lists are combined with a k-way heap merge.
+        """
+        count = len(candidates)
+        if count < CollegeMatcher.PARALLEL_MIN_CATALOG or MATCH_THREADS <= 1:
+            ranked = CollegeMatcher._top_matches(
+                user_gmat, user_gpa, user_work_exp, model, candidates, limit
+            )
+        else:
+            shard_size = max(
+                CollegeMatcher.MIN_SHARD_SIZE, math.ceil(count / MATCH_THREADS)
+            )
+            futures = [
+                _pool().submit(
+                    CollegeMatcher._top_matches,
+                    user_gmat,
+                    user_gpa,
+                    user_work_exp,
+                    model,
+                    candidates[start : start + shard_size],
+                    limit,
+                )
+                for start in range(0, count, shard_size)
+            ]
+            ranked = list(heapq.merge(*(future.result() for future in futures)))
+            if limit is not None:
+                ranked = ranked[:limit]
+
+        return [(row, -negated) for negated, row in ranked]
+
+    # Profile x school cells scored per vectorized call in match_profiles
+    BATCH_CELLS = 2_000_000
+
+    @staticmethod
+    def match_profiles(
+        user_gmats: np.ndarray,
+        user_gpas: np.ndarray,
+        user_work_exps: np.ndarray,
+        model: "CompiledModel",
+        candidates: np.ndarray,
+        limit: Optional[int] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        match_catalog for many profiles at once: each profile's ranked
+        (row, probability) pairs, scoring profiles x candidates in blocks of
+        at most BATCH_CELLS with one vectorized call per block.
+        """
+        count = len(candidates)
+        keep = count if limit is None else min(limit, count)
+        step = max(1, CollegeMatcher.BATCH_CELLS // max(count, 1))
+
+        ranked = []
+        for start in range(0, len(user_gmats), step):
+            end = min(start + step, len(user_gmats))
+            probabilities = model.probabilities(
+                np.repeat(user_gmats[start:end], count),
+                np.repeat(user_gpas[start:end], count),
+                np.repeat(user_work_exps[start:end], count),
+                np.tile(candidates, end - start),
+            ).reshape(end - start, count)
+
+            if keep < count:
+                cutoffs = -np.partition(-probabilities, keep - 1, axis=1)[:, keep - 1]
+            else:
+                cutoffs = np.full(end - start, -np.inf)
+            for profile, cutoff in zip(probabilities, cutoffs):
+                # Ties keep catalog order, as in match_catalog
+                columns = np.flatnonzero(profile >= cutoff)
+                order = columns[np.lexsort((candidates[columns], -profile[columns]))]
+                order = order[:keep]
+                ranked.append(
+                    [(int(candidates[i]), float(profile[i])) for i in order]
+                )
+
+        return ranked
+
+    # Chance thresholds of the Safety / Target / Reach tiers shown in the UI,
+    # used by the portfolio optimizer and the analytics tier rollups
+    SAFETY_MIN_CHANCE = 60
+    REACH_MAX_CHANCE = 35
+
+    @staticmethod
+    def tier(admission_chance: float) -> str:
+        if admission_chance >= CollegeMatcher.SAFETY_MIN_CHANCE:
+            return "safety"
+        if admission_chance < CollegeMatcher.REACH_MAX_CHANCE:
+            return "reach"
+        return "target"
+
+    @staticmethod
+    def optimize_portfolio(
+        probabilities: np.ndarray, utilities: np.ndarray, max_applications: int
+    ) -> Tuple[List[int], List[float], float]:
+        """
+        Choose up to max_applications schools maximizing the expected utility
+        of the best school that admits the applicant, with admissions treated
+        as independent. probabilities are chances in percent.
+
+        Returns the chosen indexes in the order picked, the expected utility
+        each one added, and the portfolio's expected utility. With equal
+        utilities this is P(at least one admit) and greedy is exact; otherwise
+        the objective is monotone submodular and greedy is within 1 - 1/e of
+        the best portfolio. Each step is O(n log k) vectorized.
+        """
+        chances = probabilities / 100.0
+        available = np.ones(len(chances), dtype=bool)
+        # Chosen schools, best utility first
+        chosen_utilities = np.empty(0)
+        chosen_chances = np.empty(0)
+
+        picks: List[int] = []
+        gains: List[float] = []
+        value = 0.0
+        for _ in range(min(max_applications, len(chances))):
+            # none_before[j]: no admit among the j best chosen schools;
+            # value_before[j]: expected utility contributed by them
+            none_before = np.concatenate(([1.0], np.cumprod(1 - chosen_chances)))
+            value_before = np.concatenate(
+                ([0.0], np.cumsum(chosen_utilities * chosen_chances * none_before[:-1]))
+            )
+            # A candidate slots in after chosen schools of equal utility; it
+            # is used only if no better school admits, and when it admits it
+            # displaces every worse one
+            positions = np.searchsorted(-chosen_utilities, -utilities, side="right")
+            marginal = chances * (
+                utilities * none_before[positions]
+                - (value_before[-1] - value_before[positions])
+            )
+            marginal[~available] = -np.inf
+
+            best = int(np.argmax(marginal))
+            if marginal[best] <= 0:
+                break
+            available[best] = False
+            chosen_utilities = np.insert(
+                chosen_utilities, positions[best], utilities[best]
+            )
+            chosen_chances = np.insert(chosen_chances, positions[best], chances[best])
+            picks.append(best)
+            gains.append(float(marginal[best]))
+            value += float(marginal[best])
+
+        return picks, gains, value
+
+    @staticmethod
+    def inverse_score_match(
+        target_match: float, avg_score: float, std_dev: float, floor: float = 0.3
+    ) -> Optional[float]:
+        """
+        Smallest score whose calculate_score_match() reaches target_match.
+
+        Returns -inf when every score qualifies (the below-average floor) and
+        None when the target can never be reached (the match only approaches
+        1.0).
+        """
+        if std_dev == 0:
+            std_dev = avg_score * 0.15
+
+        if target_match <= floor:
+            return -math.inf
+        if target_match <= 0.5:
+            # Below average the match is the normal CDF itself
+            return avg_score + std_dev * NormalDist().inv_cdf(target_match)
+        if target_match <= 0.75:
+            # The match jumps from 0.5 to 0.75 at the average
+            return avg_score
+        if target_match < 1.0:
+            return avg_score + std_dev * NormalDist().inv_cdf(2 * target_match - 1)
+        return None
+
+    @staticmethod
+    def inverse_score_matches(
+        target_match: np.ndarray,
+        avg_score: np.ndarray,
+        std_dev: float,
+        floor: float = 0.3,
+    ) -> np.ndarray:
+        """Vectorized inverse_score_match, with NaN where it returns None"""
+        with np.errstate(invalid="ignore"):
+            below = avg_score + std_dev * _norm_ppf(target_match)
+            above = avg_score + std_dev * _norm_ppf(2 * target_match - 1)
+        return np.select(
+            [
+                target_match <= floor,
+                target_match <= 0.5,
+                target_match <= 0.75,
+                target_match < 1.0,
+            ],
+            [-np.inf, below, avg_score, above],
+            np.nan,
+        )
+
+    @staticmethod
+    def calculate_score_requirement(
+        target_probability: float,
+        solve_for: str,
+        user_gmat: Optional[int],
+        user_gpa: Optional[float],
+        user_work_exp: Optional[float],
+        model: "CompiledModel",
+        row: int,
+    ) -> Tuple[Optional[float], Optional[str]]:
+        """
+        Minimum value of `solve_for` that gives at least target_probability
+        at a catalog row under a compiled scoring model, with the other
+        profile fields held fixed.
+
+        Returns (required_value, None) or (None, reason) where reason is
+        "probability_cap" if the target is above the model's cap for the
+        school and "score_ceiling" if even the maximum input cannot reach it.
+        """
+        scoring = model.model
+        university = model.universities[row]
+        max_probability = min(
+            scoring.max_probability,
+            university.acceptance_rate + scoring.acceptance_rate_margin,
+        )
+        if target_probability > max_probability:
+            return None, "probability_cap"
+
+        low, high, step = CollegeMatcher.INPUT_BOUNDS[solve_for]
+        if target_probability <= scoring.min_probability:
+            return low, None
+
+        floor = scoring.below_average_floor
+        acceptance_factor = university.acceptance_rate / 100.0
+        components = {
+            "gmat_score": (
+                scoring.gmat_weight,
+                university.avg_gmat,
+                scoring.gmat_std_dev,
+                user_gmat,
+            ),
+            "gpa": (
+                scoring.gpa_weight,
+                university.avg_gpa,
+                scoring.gpa_std_dev,
+                user_gpa,
+            ),
+            "work_experience": (
+                scoring.work_exp_weight,
+                university.avg_work_experience,
+                scoring.work_exp_std_dev,
+                user_work_exp,
+            ),
+        }
+
+        fixed_score = scoring.acceptance_rate_weight * acceptance_factor
+        for field, (weight, avg_score, std_dev, value) in components.items():
+            if field != solve_for:
+                fixed_score += weight * CollegeMatcher.calculate_score_match(
+                    value, avg_score, std_dev, floor
+                )
+
+        def probability_at(value: float) -> float:
+            profile = {
+                "gmat_score": user_gmat,
+                "gpa": user_gpa,
+                "work_experience": user_work_exp,
+            }
+            profile[solve_for] = value
+            return model.probability(
+                profile["gmat_score"],
+                profile["gpa"],
+                profile["work_experience"],
+                row,
+            )
+
+        weight, avg_score, std_dev, _ = components[solve_for]
+        if weight == 0:
+            # The model ignores this field, so any value does or none does
+            if probability_at(low) >= target_probability:
+                return low, None
+            return None, "score_ceiling"
+
+        target_match = (target_probability / 100.0 - fixed_score) / weight
+        required = CollegeMatcher.inverse_score_match(
+            target_match, avg_score, std_dev, floor
+        )
+        if required is None or required > high:
+            return None, "score_ceiling"
+
+        # Snap to the input grid, then confirm against the forward model
+        required = max(low, required)
+        required = round(math.ceil(round(required / step, 6)) * step, 2)
+
+        while probability_at(required) < target_probability:
+            required = round(required + step, 2)
+            if required > high:
+                return None, "score_ceiling"
+
+        # Rounding to 0.1% can let a slightly lower value through
+        while (
+            required - step >= low
+            and probability_at(round(required - step, 2)) >= target_probability
+        ):
+            required = round(required - step, 2)
+
+        return required, None
+
+    @staticmethod
+    def calculate_score_requirements(
+        target_probability: float,
+        solve_for: str,
+        user_gmat: Optional[int],
+        user_gpa: Optional[float],
+        user_work_exp: Optional[float],
+        model: "CompiledModel",
+        rows: np.ndarray,
+    ) -> List[Tuple["UniversityRecord", Optional[float], Optional[str]]]:
+        """
+        calculate_score_requirement for every row, easiest schools first.
+
+        The closed form is solved for all rows at once and settled on the
+        input grid with the vectorized forward model; only rows within a step
+        of the input ceiling, where the estimate's error decides between an
+        answer and "score_ceiling", go through the scalar solver.
+        """
+        scoring = model.model
+        low, high, step = CollegeMatcher.INPUT_BOUNDS[solve_for]
+        solved = ("gmat_score", "gpa", "work_experience").index(solve_for)
+        profile = [user_gmat, user_gpa, user_work_exp]
+
+        def probabilities_at(values: np.ndarray, at_rows: np.ndarray) -> np.ndarray:
+            inputs = list(profile)
+            inputs[solved] = values
+            return model.probabilities(*inputs, at_rows)
+
+        capped = target_probability > model.max_probability[rows]
+        required = np.full(len(rows), float(low))
+        reachable = np.ones(len(rows), dtype=bool)
+        rescore = np.zeros(len(rows), dtype=bool)
+
+        factor = model.factors[solved]
+        if target_probability <= scoring.min_probability:
+            # Every value reaches the minimum chance, so required stays low
+            pass
+        elif factor.weight == 0:
+            # The model ignores this field, so any value does or none does
+            reachable = probabilities_at(required, rows) >= target_probability
+        else:
+            floor = scoring.below_average_floor
+            fixed_score = model.acceptance_term[rows].copy()
+            for index, other in enumerate(model.factors):
+                if index != solved:
+                    fixed_score += other.weight * other.match(
+                        profile[index], rows, floor
+                    )
+            std_dev = (
+                scoring.gmat_std_dev,
+                scoring.gpa_std_dev,
+                scoring.work_exp_std_dev,
+            )[solved]
+            estimate = CollegeMatcher.inverse_score_matches(
+                (target_probability / 100.0 - fixed_score) / factor.weight,
+                factor.average[rows],
+                std_dev,
+                floor,
+            )
+
+            with np.errstate(invalid="ignore"):
+                reachable = estimate <= high
+                # The estimate's small error matters within a step of the ceiling
+                rescore = np.abs(estimate - high) <= step
+                snapped = np.round(
+                    np.ceil(np.round(np.maximum(low, estimate) / step, 6)) * step, 2
+                )
+            required = np.where(reachable, snapped, float(low))
+
+            # Settle on the lowest grid value reaching the target, which is
+            # what the scalar solver's stepping finds: the probability only
+            # grows with each field. Rounding to 0.1% can let values far below
+            # the estimate through, so rows not settled next to it bisect
+            # their grid index instead of stepping.
+            def reaches(indexes: np.ndarray, at: np.ndarray) -> np.ndarray:
+                values = np.round(low + indexes * step, 2)
+                return probabilities_at(values, rows[at]) >= target_probability
+
+            last = round((high - low) / step)
+            active = np.flatnonzero(reachable & ~rescore & ~capped)
+            guess = np.round((required[active] - low) / step).astype(np.int64)
+            guess = np.minimum(guess, last)
+            hit = reaches(guess, active)
+            # Grid indexes known to miss (lower, -1 for below low) and to
+            # reach the target (upper, last + 1 for none)
+            lower = np.where(hit, -1, guess)
+            upper = np.where(hit, guess, last + 1)
+
+            # One step beside the guess settles most rows
+            neighbor = np.where(hit, guess - 1, guess + 1)
+            probe = np.flatnonzero((neighbor >= 0) & (neighbor <= last))
+            neighbor_hit = reaches(neighbor[probe], active[probe])
+            upper[probe] = np.where(neighbor_hit, neighbor[probe], upper[probe])
+            lower[probe] = np.where(neighbor_hit, lower[probe], neighbor[probe])
+            while True:
+                open_ = np.flatnonzero(upper - lower > 1)
+                if not len(open_):
+                    break
+                middle = (lower[open_] + upper[open_]) // 2
+                middle_hit = reaches(middle, active[open_])
+                upper[open_] = np.where(middle_hit, middle, upper[open_])
+                lower[open_] = np.where(middle_hit, lower[open_], middle)
+
+            reachable[active] = upper <= last
+            required[active] = np.round(low + np.minimum(upper, last) * step, 2)
+
+        reasons = {}
+        for index in np.flatnonzero(rescore & ~capped).tolist():
+            value, reason = CollegeMatcher.calculate_score_requirement(
+                target_probability,
+                solve_for,
+                user_gmat,
+                user_gpa,
+                user_work_exp,
+                model,
+                int(rows[index]),
+            )
+            reachable[index] = value is not None
+            if value is None:
+                reasons[index] = reason
+            else:
+                required[index] = value
+
+        # Easiest schools first, unreachable ones last; ties keep row order
+        unreachable = capped | ~reachable
+        order = np.lexsort((np.where(unreachable, 0.0, required), unreachable))
+
+        rows, values = rows.tolist(), required.tolist()
+        capped, unreachable = capped.tolist(), unreachable.tolist()
+        requirements = []
+        for index in order.tolist():
+            university = model.universities[rows[index]]
+            if capped[index]:
+                requirements.append((university, None, "probability_cap"))
+            elif unreachable[index]:
+                reason = reasons.get(index, "score_ceiling")
+                requirements.append((university, None, reason))
+            else:
+                requirements.append((university, values[index], None))
+
+        return requirements
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional, List
-from datetime import datetime
+from typing import Dict, Optional, List, Literal
+from datetime import date, datetime
 
 
 class UserProfileRequest(BaseModel):
@@ -26,6 +26,86 @@ class UserProfileRequest(BaseModel):
         return v
 
 
+class SimilarApplicantsRequest(UserProfileRequest):
+    k: int = Field(default=50, ge=1, le=500, description="Past applicants to compare")
+    top_n: int = Field(
+        default=5, ge=1, le=25, description="Top matches counted per past applicant"
+    )
+
+
+class LocationFilter(BaseModel):
+    near: Optional[str] = None
+    radius_miles: float = 100
+    region: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self.near or self.region)
+
+
+class ProfileUncertainty(BaseModel):
+    """Standard deviations of projected profile values, for chance bands"""
+
+    gmat_score: float = 0
+    gpa: float = 0
+    work_experience: float = 0
+    samples: int = 2000
+
+    @property
+    def active(self) -> bool:
+        return bool(self.gmat_score or self.gpa or self.work_experience)
+
+
+class MatchView(BaseModel):
+    """Which match fields to return, and whether as rows or parallel columns"""
+
+    fields: Optional[List[str]] = None
+    format: Literal["rows", "columnar"] = "rows"
+
+    @property
+    def active(self) -> bool:
+        return self.fields is not None or self.format != "rows"
+
+
+class ReweightRequest(BaseModel):
+    gmat_weight: float = Field(default=0.40, ge=0)
+    gpa_weight: float = Field(default=0.30, ge=0)
+    work_exp_weight: float = Field(default=0.15, ge=0)
+    acceptance_rate_weight: float = Field(default=0.15, ge=0)
+    limit: Optional[int] = Field(
+        default=None, ge=1, description="Return only the best N matches"
+    )
+
+
+class ScoreRequirementRequest(BaseModel):
+    target_chance: float = Field(
+        ..., gt=0, le=95, description="Target admission chance in percent"
+    )
+    solve_for: Literal["gmat_score", "gpa", "work_experience"] = Field(
+        default="gmat_score", description="Profile field to solve for"
+    )
+    gmat_score: Optional[int] = Field(default=None, ge=200, le=800)
+    gpa: Optional[float] = Field(default=None, ge=0.0, le=4.0)
+    work_experience: float = Field(default=0.0, ge=0, le=30)
+    target_program: str = Field(
+        default="MBA", description="Target program type (MBA, MS, etc.)"
+    )
+
+
+class PortfolioRequest(UserProfileRequest):
+    max_applications: int = Field(
+        default=8, ge=1, le=50, description="Most schools to apply to"
+    )
+    max_tuition: Optional[float] = Field(
+        default=None, gt=0, description="Leave out schools with higher tuition"
+    )
+    objective: Literal["admit", "ranking"] = Field(
+        default="admit",
+        description="Maximize P(at least one admit), or the expected "
+        "ranking-weighted utility of the best admit",
+    )
+
+
 class UserCreateRequest(BaseModel):
     email: str = Field(..., description="User email")
     name: str = Field(..., description="User name")
@@ -38,13 +118,34 @@ class ProgramStats(BaseModel):
     avg_work_experience: Optional[float] = None
 
 
+class MatchComponents(BaseModel):
+    """Unweighted factors behind an admission chance, each in 0-1"""
+
+    gmat_match: float
+    gpa_match: float
+    work_exp_match: float
+    acceptance_factor: float
+
+
+class ChanceBand(BaseModel):
+    """Admission chance percentiles over an uncertain profile"""
+
+    p10: float
+    p50: float
+    p90: float
+
+
 class UniversityMatch(BaseModel):
+    university_id: Optional[int] = None
     university: str
     admission_chance: str
     program_stats: ProgramStats
     location: Optional[str] = None
     ranking: Optional[int] = None
     tuition_cost: Optional[float] = None
+    components: Optional[MatchComponents] = None
+    distance_miles: Optional[float] = None
+    chance_band: Optional[ChanceBand] = None
 
     class Config:
         from_attributes = True
@@ -61,11 +162,22 @@ class UniversityResponse(BaseModel):
     ranking: Optional[int]
     avg_work_experience: float
     tuition_cost: Optional[float]
+    distance_miles: Optional[float] = None
 
     class Config:
         from_attributes = True
 
 
+class UniversitySearchResponse(BaseModel):
+    universities: List[UniversityResponse]
+    total_matches: int
+    next_cursor: Optional[str] = None
+
+
+class SimilarUniversity(UniversityResponse):
+    distance: float
+
+
 class UserResponse(BaseModel):
     id: int
     email: str
@@ -84,12 +196,151 @@ class SearchResponse(BaseModel):
     target_program: str
     created_at: datetime
     results_count: int = 0
+    model_version: Optional[str] = None
 
     class Config:
         from_attributes = True
+        protected_namespaces = ()
 
 
 class MatchResponse(BaseModel):
     matches: List[UniversityMatch]
     search_id: Optional[int] = None
     total_universities: int
+    model_version: Optional[str] = None
+    next_cursor: Optional[str] = None
+
+    class Config:
+        protected_namespaces = ()
+
+
+class ColumnarMatchResponse(BaseModel):
+    """
+    Matches as parallel arrays, one per field; school details come from
+    /api/universities/metadata for catalog_version
+    """
+
+    columns: Dict[str, list]
+    search_id: Optional[int] = None
+    total_universities: int
+    model_version: Optional[str] = None
+    catalog_version: Optional[str] = None
+    next_cursor: Optional[str] = None
+
+    class Config:
+        protected_namespaces = ()
+
+
+class UniversityMetadataResponse(BaseModel):
+    """Static catalog fields as parallel arrays, aligned on university_id"""
+
+    catalog_version: Optional[str] = None
+    columns: Dict[str, list]
+
+
+class ScoreRequirement(BaseModel):
+    university_id: int
+    university: str
+    required_value: Optional[float] = None
+    reachable: bool
+    unreachable_reason: Optional[str] = None
+    max_chance: float
+
+
+class ScoreRequirementResponse(BaseModel):
+    solve_for: str
+    target_chance: float
+    requirements: List[ScoreRequirement]
+
+
+class PortfolioSchool(BaseModel):
+    university_id: int
+    university: str
+    admission_chance: float
+    tier: str
+    ranking: Optional[int] = None
+    tuition_cost: Optional[float] = None
+    marginal_gain: float
+
+
+class PortfolioResponse(BaseModel):
+    objective: str
+    schools: List[PortfolioSchool]
+    at_least_one_admit: float
+    expected_utility: float
+    candidates_considered: int
+    model_version: str
+
+    class Config:
+        protected_namespaces = ()
+
+
+class ApplicantTopMatch(BaseModel):
+    university_id: int
+    university: str
+    count: int
+    share: float
+    avg_admission_chance: float
+
+
+class SimilarApplicantsResponse(BaseModel):
+    neighbors_found: int
+    mean_distance: Optional[float] = None
+    index_ready: bool
+    top_matches: List[ApplicantTopMatch]
+
+
+class HistogramBucket(BaseModel):
+    bucket: float
+    count: int
+
+
+class SchoolChanceDistribution(BaseModel):
+    university_id: int
+    university: str
+    results_count: int
+    avg_admission_chance: float
+    chance_histogram: List[int]
+
+
+class TierMix(BaseModel):
+    day: date
+    safety: int
+    target: int
+    reach: int
+
+
+class AnalyticsResponse(BaseModel):
+    searches_count: int
+    gmat_histogram: List[HistogramBucket]
+    gpa_histogram: List[HistogramBucket]
+    school_chances: List[SchoolChanceDistribution]
+    tier_mix: List[TierMix]
+
+
+class ScoringModel(BaseModel):
+    """A versioned scoring configuration (see scoring.py)"""
+
+    version: str = Field(..., pattern=r"^[A-Za-z0-9._-]+$")
+    description: str = ""
+
+    gmat_weight: float = Field(..., ge=0)
+    gpa_weight: float = Field(..., ge=0)
+    work_exp_weight: float = Field(..., ge=0)
+    acceptance_rate_weight: float = Field(..., ge=0)
+
+    gmat_std_dev: float = Field(..., gt=0)
+    gpa_std_dev: float = Field(..., gt=0)
+    work_exp_std_dev: float = Field(..., gt=0)
+
+    below_average_floor: float = Field(default=0.3, ge=0, le=1)
+    min_probability: float = Field(default=5, ge=0, le=100)
+    max_probability: float = Field(default=95, ge=0, le=100)
+    acceptance_rate_margin: float = Field(
+        default=10, description="Cap is min(max_probability, acceptance_rate + margin)"
+    )
+
+
+class ScoringModelsResponse(BaseModel):
+    active_version: str
+    models: List[ScoringModel]
@@ -0,0 +1,47 @@
+"""
+Opaque cursors for keyset pagination
+
+A cursor is the sort key of the last row on a page, JSON encoded and
+base64url wrapped so clients treat it as an opaque token.
+"""
+
+import base64
+import binascii
+import json
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException
+
+
+def encode_cursor(*values) -> str:
+    payload = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List]:
+    """Decode a cursor holding `size` sort-key values; None if no cursor was given"""
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return values
+
+
+def decode_keyset(cursor: Optional[str], *types: Callable) -> Optional[List]:
+    """decode_cursor, with each value converted by the matching type"""
+    values = decode_cursor(cursor, len(types))
+    if values is None:
+        return None
+
+    try:
+        return [convert(value) for convert, value in zip(types, values)]
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,291 @@
+"""
+Recompute stored search results after catalog stats change
+
+Stored SearchResult.admission_chance values are derived from each school's
+avg_gmat, avg_gpa, avg_work_experience and acceptance_rate. The stats they
+currently reflect are kept in scored_university_stats; whenever the catalog
+version changes, schools whose stats differ from it are recomputed.
+
+A RecomputeJob walks the affected searches in id order, RECOMPUTE_BATCH_SIZE
+searches per transaction. Within a batch each school is scored across all of
+its searches with one vectorized call, and changed chances are written with
+chunked bulk updates. A batch commits the new chances, the analytics rollup
+deltas and the job's cursor together, so a search never shows a mix of old
+and new chances and an interrupted job resumes after its last batch.
+
+Usage:
+    python recompute.py run
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+import analytics
+from catalog import SCORING_COLUMNS, UniversityRecord, catalog_version
+from database import (
+    RecomputeJob,
+    ScoredUniversityStats,
+    SessionLocal,
+    Search,
+    SearchResult,
+    University,
+    init_db,
+)
+from scoring import BUILTIN_MODEL, CompiledModel, read_models
+
+RECOMPUTE_BATCH_SIZE = int(os.getenv("RECOMPUTE_BATCH_SIZE", "1000"))
+RECOMPUTE_UPDATE_CHUNK = int(os.getenv("RECOMPUTE_UPDATE_CHUNK", "5000"))
+RECOMPUTE_BATCH_PAUSE_SECONDS = float(
+    os.getenv("RECOMPUTE_BATCH_PAUSE_SECONDS", "0.05")
+)
+RECOMPUTE_INTERVAL_SECONDS = float(os.getenv("RECOMPUTE_INTERVAL_SECONDS", "60"))
+
+
+def _stats(row) -> tuple:
+    return tuple(getattr(row, column) for column in SCORING_COLUMNS)
+
+
+def _save_stats(db: Session, universities: List[University]) -> None:
+    for university in universities:
+        db.merge(
+            ScoredUniversityStats(
+                university_id=university.id,
+                **{column: getattr(university, column) for column in SCORING_COLUMNS},
+            )
+        )
+
+
+def changed_universities(db: Session) -> List[University]:
+    """Universities whose stats differ from those the stored results reflect"""
+    scored = {row.university_id: row for row in db.query(ScoredUniversityStats)}
+    universities = db.query(University).order_by(University.id).all()
+
+    # Schools seen for the first time (or a first run) are the baseline
+    new = [university for university in universities if university.id not in scored]
+    if new:
+        _save_stats(db, new)
+        db.commit()
+
+    return [
+        university
+        for university in universities
+        if university.id in scored
+        and _stats(scored[university.id]) != _stats(university)
+    ]
+
+
+class _Scorer:
+    """Scoring models compiled over just the changed universities"""
+
+    def __init__(self, universities: List[University]):
+        self.rows = {university.id: row for row, university in enumerate(universities)}
+        self.columns = {
+            column: np.array(
+                [getattr(university, column) for university in universities],
+                dtype=float,
+            )
+            for column in SCORING_COLUMNS
+        }
+        self.universities = [UniversityRecord.from_row(u) for u in universities]
+        self.models, active_version = read_models()
+        self.active_version = active_version or BUILTIN_MODEL.version
+        self._compiled: Dict[str, CompiledModel] = {}
+
+    def compiled(self, version: Optional[str]) -> CompiledModel:
+        # Searches from before the registry were scored with the built-in model;
+        # models that are no longer installed fall back to the active one
+        version = version or BUILTIN_MODEL.version
+        if version not in self.models:
+            version = self.active_version
+        if version not in self._compiled:
+            self._compiled[version] = CompiledModel(
+                self.models[version], "recompute", self.columns, self.universities
+            )
+        return self._compiled[version]
+
+
+def recompute_batch(
+    db: Session, job: RecomputeJob, scorer: _Scorer, batch_size: int
+) -> int:
+    """Recompute the next batch of searches for a job; returns searches done"""
+    university_ids = list(scorer.rows)
+    search_ids = [
+        search_id
+        for (search_id,) in db.query(SearchResult.search_id)
+        .filter(
+            SearchResult.university_id.in_(university_ids),
+            SearchResult.search_id > job.last_search_id,
+        )
+        .distinct()
+        .order_by(SearchResult.search_id)
+        .limit(batch_size)
+    ]
+    if not search_ids:
+        return 0
+
+    searches = {
+        search.id: search
+        for search in db.query(
+            Search.id,
+            Search.gmat_score,
+            Search.gpa,
+            Search.work_experience,
+            Search.model_version,
+            Search.created_at,
+        ).filter(Search.id.in_(search_ids))
+    }
+    results = db.query(
+        SearchResult.id,
+        SearchResult.search_id,
+        SearchResult.university_id,
+        SearchResult.admission_chance,
+    ).filter(
+        SearchResult.search_id.in_(search_ids),
+        SearchResult.university_id.in_(university_ids),
+    )
+
+    groups: Dict[tuple, list] = {}
+    for result in results:
+        search = searches[result.search_id]
+        groups.setdefault((result.university_id, search.model_version), []).append(
+            (result, search)
+        )
+
+    updates = []
+    rescored = []
+    for (university_id, model_version), pairs in groups.items():
+        # One school across many searches in a single vectorized call
+        chances = scorer.compiled(model_version).probabilities(
+            np.array([search.gmat_score for _, search in pairs], dtype=float),
+            np.array([search.gpa for _, search in pairs], dtype=float),
+            np.array([search.work_experience or 0.0 for _, search in pairs]),
+            np.full(len(pairs), scorer.rows[university_id]),
+        )
+        for (result, search), chance in zip(pairs, chances.tolist()):
+            if chance != result.admission_chance:
+                updates.append({"id": result.id, "admission_chance": chance})
+                rescored.append(
+                    (
+                        university_id,
+                        result.admission_chance,
+                        chance,
+                        (search.created_at or datetime.utcnow()).date(),
+                    )
+                )
+
+    for start in range(0, len(updates), RECOMPUTE_UPDATE_CHUNK):
+        db.execute(
+            update(SearchResult), updates[start : start + RECOMPUTE_UPDATE_CHUNK]
+        )
+    analytics.record_rescored(db, rescored)
+
+    job.last_search_id = search_ids[-1]
+    job.updated_results += len(updates)
+    # The whole batch becomes visible at once
+    db.commit()
+
+    return len(search_ids)
+
+
+def run_recompute(batch_size: int = RECOMPUTE_BATCH_SIZE) -> int:
+    """
+    Bring stored results up to date with the catalog, resuming an unfinished
+    job if there is one. Returns the number of results updated.
+    """
+    db = SessionLocal()
+    try:
+        changed = changed_universities(db)
+        job = (
+            db.query(RecomputeJob)
+            .filter(RecomputeJob.status == "running")
+            .order_by(RecomputeJob.id.desc())
+            .first()
+        )
+
+        stats_hash = hashlib.sha1(
+            json.dumps(
+                [[university.id, *_stats(university)] for university in changed]
+            ).encode()
+        ).hexdigest()[:12]
+        if job is not None and job.stats_hash != stats_hash:
+            # Stats changed again mid-job; start over with the combined changes
+            job.status = "superseded"
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            job = None
+        if not changed:
+            return 0
+
+        if job is None:
+            job = RecomputeJob(
+                catalog_version=catalog_version(db),
+                university_ids=json.dumps([university.id for university in changed]),
+                stats_hash=stats_hash,
+                last_search_id=0,
+                updated_results=0,
+            )
+            db.add(job)
+            db.commit()
+
+        scorer = _Scorer(changed)
+        while recompute_batch(db, job, scorer, batch_size) == batch_size:
+            # Let /api/match writers take the lock between batches
+            time.sleep(RECOMPUTE_BATCH_PAUSE_SECONDS)
+
+        _save_stats(db, changed)
+        job.status = "done"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+
+        return job.updated_results
+    finally:
+        db.close()
+
+
+def start_recompute_job() -> Optional[threading.Thread]:
+    """Check the catalog version every RECOMPUTE_INTERVAL_SECONDS in a thread"""
+    if RECOMPUTE_INTERVAL_SECONDS <= 0:
+        return None
+
+    def loop():
+        checked_version = None
+        while True:
+            try:
+                db = SessionLocal()
+                try:
+                    version = catalog_version(db)
+                finally:
+                    db.close()
+                # The first pass also resumes a job interrupted by a restart
+                if version != checked_version:
+                    updated = run_recompute()
+                    if updated:
+                        print(f"✓ Recomputed {updated} stored results")
+                    checked_version = version
+            except Exception as e:
+                print(f"Recompute job error: {e}")
+            time.sleep(RECOMPUTE_INTERVAL_SECONDS)
+
+    thread = threading.Thread(target=loop, name="result-recompute", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute stale stored results")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("run", help="Recompute results for changed universities")
+
+    args = parser.parse_args()
+    init_db()
+    print(f"Recomputed {run_recompute()} stored results")
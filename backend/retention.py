@@ -0,0 +1,275 @@
+"""
+Search history retention
+
+Searches older than SEARCH_RETENTION_DAYS are exported to gzip JSON-lines
+files partitioned by day (ARCHIVE_DIR/date=YYYY-MM-DD/...) and then deleted
+together with their results. Work is done in small batches, each in its own
+short transaction with a pause in between, so /api/match writes are never
+blocked for long. On SQLite, freed pages are returned to the filesystem with
+incremental VACUUM after each pass. Databases created before incremental
+auto_vacuum was enabled need a one-time full VACUUM first, which rewrites the
+whole file under an exclusive lock, so it is only run by hand.
+
+Usage:
+    python retention.py run                      # one retention pass
+    python retention.py query --from 2025-01-01 --to 2025-01-31
+    python retention.py convert                  # offline, once per database
+"""
+
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from database import (
+    IdempotencyKey,
+    SessionLocal,
+    Search,
+    SearchResult,
+    engine,
+    init_db,
+)
+
+SEARCH_RETENTION_DAYS = int(os.getenv("SEARCH_RETENTION_DAYS", "0"))
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", Path(__file__).parent / "archive"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+RETENTION_BATCH_PAUSE_SECONDS = float(
+    os.getenv("RETENTION_BATCH_PAUSE_SECONDS", "0.05")
+)
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+VACUUM_PAGES = int(os.getenv("VACUUM_PAGES", "2000"))
+
+
+def _search_record(search: Search, results: List[SearchResult]) -> dict:
+    return {
+        "id": search.id,
+        "user_id": search.user_id,
+        "gmat_score": search.gmat_score,
+        "gpa": search.gpa,
+        "work_experience": search.work_experience,
+        "target_program": search.target_program,
+        "model_version": search.model_version,
+        "created_at": search.created_at.isoformat() if search.created_at else None,
+        "results": [
+            {
+                "university_id": result.university_id,
+                "admission_chance": result.admission_chance,
+                "match_score": result.match_score,
+            }
+            for result in results
+        ],
+    }
+
+
+def write_archive(records: List[dict], archive_dir: Path = ARCHIVE_DIR) -> List[Path]:
+    """Write records into per-day gzip JSON-lines partitions, one file per day"""
+    by_day: Dict[str, List[dict]] = {}
+    for record in records:
+        day = (record["created_at"] or "unknown")[:10]
+        by_day.setdefault(day, []).append(record)
+
+    paths = []
+    for day, day_records in by_day.items():
+        partition = archive_dir / f"date={day}"
+        partition.mkdir(parents=True, exist_ok=True)
+        path = partition / (
+            f"searches-{day_records[0]['id']}-{day_records[-1]['id']}.jsonl.gz"
+        )
+        # Write then rename, so a partial file is never mistaken for an archive
+        temporary = path.with_suffix(".tmp")
+        with gzip.open(temporary, "wt", encoding="utf-8") as archive:
+            for record in day_records:
+                archive.write(json.dumps(record) + "\n")
+        os.replace(temporary, path)
+        paths.append(path)
+
+    return paths
+
+
+def iter_archive(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    archive_dir: Path = ARCHIVE_DIR,
+) -> Iterator[dict]:
+    """Stream archived searches with start <= created day <= end"""
+    for partition in sorted(archive_dir.glob("date=*")):
+        day = partition.name[len("date=") :]
+        try:
+            partition_date = date.fromisoformat(day)
+        except ValueError:
+            partition_date = None
+        if partition_date and start and partition_date < start:
+            continue
+        if partition_date and end and partition_date > end:
+            continue
+
+        for path in sorted(partition.glob("*.jsonl.gz")):
+            with gzip.open(path, "rt", encoding="utf-8") as archive:
+                for line in archive:
+                    yield json.loads(line)
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """Archive and delete up to batch_size searches older than cutoff"""
+    searches = (
+        db.query(Search)
+        .filter(Search.created_at < cutoff)
+        .order_by(Search.id)
+        .limit(batch_size)
+        .all()
+    )
+    if not searches:
+        return 0
+
+    search_ids = [search.id for search in searches]
+    results: Dict[int, List[SearchResult]] = {}
+    for result in (
+        db.query(SearchResult)
+        .filter(SearchResult.search_id.in_(search_ids))
+        .order_by(SearchResult.search_id, SearchResult.id)
+    ):
+        results.setdefault(result.search_id, []).append(result)
+
+    write_archive(
+        [_search_record(search, results.get(search.id, [])) for search in searches]
+    )
+
+    db.query(IdempotencyKey).filter(IdempotencyKey.search_id.in_(search_ids)).delete(
+        synchronize_session=False
+    )
+    db.query(SearchResult).filter(SearchResult.search_id.in_(search_ids)).delete(
+        synchronize_session=False
+    )
+    db.query(Search).filter(Search.id.in_(search_ids)).delete(synchronize_session=False)
+    db.commit()
+    db.expunge_all()
+
+    return len(searches)
+
+
+def incremental_vacuum(pages: int = VACUUM_PAGES) -> None:
+    """
+    Return up to `pages` free pages to the filesystem (SQLite only). Does
+    nothing until the database is in incremental auto_vacuum mode.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    # Driver-level cursor: PRAGMA results are stepped through explicitly
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            print("Skipping incremental VACUUM: run `python retention.py convert`")
+            return
+        # Pages are freed as the pragma's rows are stepped through
+        cursor.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def convert_to_incremental() -> bool:
+    """
+    Switch the database to incremental auto_vacuum with a full VACUUM. Holds
+    an exclusive lock for the whole rewrite, so run it with the API stopped.
+    Returns False if it was already converted (or is not SQLite).
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+        return True
+    finally:
+        connection.close()
+
+
+def run_retention(
+    retention_days: int = SEARCH_RETENTION_DAYS,
+    batch_size: int = RETENTION_BATCH_SIZE,
+) -> int:
+    """One retention pass; returns the number of searches archived"""
+    if retention_days <= 0:
+        return 0
+
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    archived = 0
+    db = SessionLocal()
+    try:
+        while True:
+            count = archive_batch(db, cutoff, batch_size)
+            archived += count
+            if count < batch_size:
+                break
+            # Let queued writers take the lock between batches
+            time.sleep(RETENTION_BATCH_PAUSE_SECONDS)
+    finally:
+        db.close()
+
+    if archived:
+        incremental_vacuum()
+
+    return archived
+
+
+def start_retention_job() -> Optional[threading.Thread]:
+    """Run retention every RETENTION_INTERVAL_SECONDS in a daemon thread"""
+    if SEARCH_RETENTION_DAYS <= 0:
+        return None
+
+    def loop():
+        while True:
+            try:
+                archived = run_retention()
+                if archived:
+                    print(f"✓ Archived {archived} searches to {ARCHIVE_DIR}")
+            except Exception as e:
+                print(f"Retention job error: {e}")
+            time.sleep(RETENTION_INTERVAL_SECONDS)
+
+    thread = threading.Thread(target=loop, name="search-retention", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search history retention")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Archive and delete old searches")
+    run_parser.add_argument("--days", type=int, default=SEARCH_RETENTION_DAYS or 365)
+
+    query_parser = commands.add_parser("query", help="Print archived searches")
+    query_parser.add_argument("--from", dest="start", type=date.fromisoformat)
+    query_parser.add_argument("--to", dest="end", type=date.fromisoformat)
+
+    commands.add_parser(
+        "convert",
+        help="Enable incremental VACUUM with one full VACUUM (stop the API first)",
+    )
+
+    args = parser.parse_args()
+    if args.command == "run":
+        init_db()
+        print(f"Archived {run_retention(retention_days=args.days)} searches")
+    elif args.command == "convert":
+        if convert_to_incremental():
+            print("Converted the database to incremental auto_vacuum")
+        else:
+            print("Nothing to do: incremental auto_vacuum is already enabled")
+    else:
+        for record in iter_archive(args.start, args.end):
+            print(json.dumps(record))
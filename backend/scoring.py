@@ -0,0 +1,553 @@
+"""
+Versioned scoring models
+
+A scoring model is a JSON artifact SCORING_MODELS_DIR/<version>.json holding
+the weights, standard deviations and probability caps used by /api/match
+(see ScoringModel in models.py). The file ACTIVE in the same directory names
+the version used for new searches; without it the built-in v1 model, which
+matches CollegeMatcher's constants, is used.
+
+Each model is compiled against the current catalog into a CompiledModel with
+its per-university constants (scaled averages, 1/std_dev, probability caps,
+the acceptance-rate term) precomputed, so scoring a profile is a handful of
+array operations. The registry rereads the directory at most every
+SCORING_MODEL_REFRESH_SECONDS and swaps the active model with one reference
+assignment; requests already scoring keep the model they started with.
+
+CompiledModel.chance_bands() scores thousands of randomly perturbed copies of
+a profile at once, turning projected scores into p10/p50/p90 bands.
+
+ComponentCache keeps each search's unweighted factor matrix so
+/api/searches/{id}/reweight can re-rank it with user weights as a dot
+product, without evaluating erf again.
+
+Usage:
+    python scoring.py list
+    python scoring.py activate v2
+"""
+
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+from pydantic import ValidationError
+
+from catalog import UniversityRecord
+from database import Search
+from matcher import CollegeMatcher, _erf
+from models import ScoringModel
+
+SCORING_MODELS_DIR = Path(
+    os.getenv("SCORING_MODELS_DIR", Path(__file__).parent / "scoring_models")
+)
+SCORING_MODEL_REFRESH_SECONDS = float(os.getenv("SCORING_MODEL_REFRESH_SECONDS", "10"))
+ACTIVE_FILE = "ACTIVE"
+COMPONENT_CACHE_SIZE = int(os.getenv("COMPONENT_CACHE_SIZE", "4096"))
+# Perturbed profiles per chance band, and the percentiles each band reports
+MONTE_CARLO_SAMPLES = int(os.getenv("MONTE_CARLO_SAMPLES", "2000"))
+BAND_PERCENTILES = (10, 50, 90)
+# Rows x samples cells per block in chance_bands, small enough to stay in cache
+BAND_BLOCK_CELLS = 65_536
+# The factor match curve is tabulated over |z| < MATCH_TABLE_RANGE, where
+# erf has saturated to within 2e-17 of +-1, in MATCH_TABLE_STEPS per unit
+MATCH_TABLE_RANGE = 6
+MATCH_TABLE_STEPS = 1024
+
+BUILTIN_MODEL = ScoringModel(
+    version="v1",
+    description="Built-in model",
+    gmat_weight=CollegeMatcher.GMAT_WEIGHT,
+    gpa_weight=CollegeMatcher.GPA_WEIGHT,
+    work_exp_weight=CollegeMatcher.WORK_EXP_WEIGHT,
+    acceptance_rate_weight=CollegeMatcher.ACCEPTANCE_RATE_WEIGHT,
+    gmat_std_dev=CollegeMatcher.GMAT_STD_DEV,
+    gpa_std_dev=CollegeMatcher.GPA_STD_DEV,
+    work_exp_std_dev=CollegeMatcher.WORK_EXP_STD_DEV,
+)
+
+
+def admission_probability(
+    model: ScoringModel,
+    user_gmat: int,
+    user_gpa: float,
+    user_work_exp: float,
+    university: UniversityRecord,
+) -> float:
+    """
+    Scalar reference implementation of a model, identical to
+    CollegeMatcher.calculate_admission_probability for the built-in model
+    """
+    floor = model.below_average_floor
+    composite_score = (
+        model.gmat_weight
+        * CollegeMatcher.calculate_score_match(
+            user_gmat, university.avg_gmat, model.gmat_std_dev, floor
+        )
+        + model.gpa_weight
+        * CollegeMatcher.calculate_score_match(
+            user_gpa, university.avg_gpa, model.gpa_std_dev, floor
+        )
+        + model.work_exp_weight
+        * CollegeMatcher.calculate_score_match(
+            user_work_exp, university.avg_work_experience, model.work_exp_std_dev, floor
+        )
+        + model.acceptance_rate_weight * (university.acceptance_rate / 100.0)
+    )
+
+    max_probability = min(
+        model.max_probability, university.acceptance_rate + model.acceptance_rate_margin
+    )
+    admission_probability = min(composite_score * 100, max_probability)
+    admission_probability = max(model.min_probability, admission_probability)
+
+    return round(admission_probability, 1)
+
+
+def _match_table(floor: float) -> np.ndarray:
+    """
+    calculate_score_match as a function of z = (user - average) / (std_dev *
+    sqrt(2)), sampled at the middle of each 1/MATCH_TABLE_STEPS bucket of z
+    """
+    half = MATCH_TABLE_RANGE * MATCH_TABLE_STEPS
+    z = (np.arange(-half, half) + 0.5) / MATCH_TABLE_STEPS
+    probabilities = 0.5 * (1 + _erf(z))
+    return np.where(
+        z < 0,
+        np.maximum(floor, probabilities),
+        np.minimum(1.0, 0.5 + probabilities * 0.5),
+    )
+
+
+class _Component:
+    """One profile factor with its per-university constants precomputed"""
+
+    __slots__ = ("weight", "average", "scaled_average", "scale")
+
+    def __init__(self, weight: float, average: np.ndarray, std_dev: float):
+        self.weight = weight
+        self.average = average
+        # erf argument is (user - average) / (std_dev * sqrt(2))
+        self.scale = 1.0 / (std_dev * math.sqrt(2))
+        self.scaled_average = average * self.scale
+
+    def match(self, user_value: float, rows: np.ndarray, floor: float) -> np.ndarray:
+        """Vectorized CollegeMatcher.calculate_score_match for catalog rows"""
+        average = self.average[rows]
+        probabilities = 0.5 * (
+            1 + _erf(user_value * self.scale - self.scaled_average[rows])
+        )
+        return np.where(
+            user_value < average,
+            np.maximum(floor, probabilities),
+            np.minimum(1.0, 0.5 + probabilities * 0.5),
+        )
+
+    def lookup(self, user_value, rows: np.ndarray, table: np.ndarray) -> np.ndarray:
+        """match() read from _match_table; within about 3e-4 of the exact value"""
+        half = MATCH_TABLE_RANGE * MATCH_TABLE_STEPS
+        z = user_value * self.scale - self.scaled_average[rows]
+        buckets = np.clip(np.floor(z * MATCH_TABLE_STEPS), -half, half - 1)
+        return table[buckets.astype(np.intp) + half]
+
+
+class CompiledModel:
+    """A scoring model bound to one catalog snapshot"""
+
+    def __init__(
+        self,
+        model: ScoringModel,
+        catalog_version: str,
+        columns: Dict[str, np.ndarray],
+        universities: List[UniversityRecord],
+    ):
+        self.model = model
+        self.version = model.version
+        self.catalog_version = catalog_version
+        self.columns = columns
+        # Rows returned by probabilities() index into this list
+        self.universities = universities
+
+        acceptance_rate = columns["acceptance_rate"]
+        self.factors = (
+            _Component(model.gmat_weight, columns["avg_gmat"], model.gmat_std_dev),
+            _Component(model.gpa_weight, columns["avg_gpa"], model.gpa_std_dev),
+            _Component(
+                model.work_exp_weight,
+                columns["avg_work_experience"],
+                model.work_exp_std_dev,
+            ),
+        )
+        self.acceptance_term = model.acceptance_rate_weight * (acceptance_rate / 100.0)
+        self.max_probability = np.minimum(
+            model.max_probability, acceptance_rate + model.acceptance_rate_margin
+        )
+        self.match_table = _match_table(model.below_average_floor)
+
+        # Candidate rows are looked up here rather than on the live catalog,
+        # so they always index this snapshot's universities and columns
+        program_types = np.array(
+            [(university.program_type or "").upper() for university in universities]
+        )
+        self._program_rows = {
+            program: np.flatnonzero(program_types == program)
+            for program in np.unique(program_types)
+        }
+        self._rows_by_id = {
+            university.id: row for row, university in enumerate(universities)
+        }
+
+    def rows_for_program(self, program_type: str) -> np.ndarray:
+        """Row indexes for a program type (any case)"""
+        return self._program_rows.get(
+            (program_type or "").upper(), np.empty(0, dtype=np.int64)
+        )
+
+    def rows_for_ids(self, university_ids) -> np.ndarray:
+        """Row indexes for university ids, in ascending order"""
+        return np.array(
+            sorted(
+                self._rows_by_id[i] for i in university_ids if i in self._rows_by_id
+            ),
+            dtype=np.int64,
+        )
+
+    def probabilities(
+        self,
+        user_gmat: Union[int, np.ndarray],
+        user_gpa: Union[float, np.ndarray],
+        user_work_exp: Union[float, np.ndarray],
+        rows: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Admission probabilities (rounded to 0.1) for the given catalog rows.
+        Profile values may also be arrays aligned with rows, to score many
+        profiles at once.
+        """
+        floor = self.model.below_average_floor
+        gmat, gpa, work_exp = self.factors
+        composite_score = (
+            gmat.weight * gmat.match(user_gmat, rows, floor)
+            + gpa.weight * gpa.match(user_gpa, rows, floor)
+            + work_exp.weight * work_exp.match(user_work_exp, rows, floor)
+            + self.acceptance_term[rows]
+        )
+
+        probabilities = np.minimum(composite_score * 100, self.max_probability[rows])
+        probabilities = np.maximum(self.model.min_probability, probabilities)
+        rounded = np.round(probabilities, 1)
+
+        # The erf approximation and half-even rounding can only disagree with
+        # the scalar path next to a rounding boundary; recompute those exactly
+        tenths = probabilities * 10
+        profiles = np.broadcast_arrays(user_gmat, user_gpa, user_work_exp, rows)
+        for i in np.flatnonzero(np.abs(tenths - np.floor(tenths) - 0.5) < 1e-3):
+            rounded[i] = admission_probability(
+                self.model,
+                profiles[0][i].item(),
+                profiles[1][i].item(),
+                profiles[2][i].item(),
+                self.universities[rows[i]],
+            )
+
+        return rounded
+
+    def probability(
+        self, user_gmat: int, user_gpa: float, user_work_exp: float, row: int
+    ) -> float:
+        """The admission probability for one profile and catalog row"""
+        return admission_probability(
+            self.model, user_gmat, user_gpa, user_work_exp, self.universities[row]
+        )
+
+    def chance_bands(
+        self,
+        user_gmat: int,
+        user_gpa: float,
+        user_work_exp: float,
+        rows: np.ndarray,
+        std_devs: Tuple[float, float, float],
+        samples: int = MONTE_CARLO_SAMPLES,
+        seed: int = 0,
+    ) -> np.ndarray:
+        """
+        p10/p50/p90 admission probabilities for the given rows as a
+        (3, len(rows)) matrix, when GMAT, GPA and work experience are normally
+        distributed around the profile with std_devs. Each block of rows is
+        scored against every perturbed profile in one broadcast evaluation,
+        with factor matches read from the tabulated curve.
+        """
+        rng = np.random.default_rng(seed)
+        draws = []
+        for value, std_dev, field in zip(
+            (user_gmat, user_gpa, user_work_exp),
+            std_devs,
+            ("gmat_score", "gpa", "work_experience"),
+        ):
+            low, high, _ = CollegeMatcher.INPUT_BOUNDS[field]
+            draws.append(np.clip(rng.normal(value, std_dev, samples), low, high))
+
+        # Linear interpolation between order statistics, as np.percentile does
+        positions = np.array(BAND_PERCENTILES) / 100 * (samples - 1)
+        lower = np.floor(positions).astype(np.intp)
+        upper = np.minimum(lower + 1, samples - 1)
+        fraction = positions - lower
+
+        bands = np.empty((len(BAND_PERCENTILES), len(rows)))
+        step = max(1, BAND_BLOCK_CELLS // samples)
+        for start in range(0, len(rows), step):
+            # Rows down, samples across: each school's samples are contiguous
+            block = rows[start : start + step, np.newaxis]
+            composite_score = self.acceptance_term[block] + sum(
+                factor.weight * factor.lookup(values, block, self.match_table)
+                for factor, values in zip(self.factors, draws)
+            )
+            probabilities = np.minimum(
+                composite_score * 100, self.max_probability[block]
+            )
+            probabilities = np.maximum(self.model.min_probability, probabilities)
+            probabilities.sort(axis=1)
+            bands[:, start : start + step] = (
+                probabilities[:, lower] * (1 - fraction)
+                + probabilities[:, upper] * fraction
+            ).T
+        return np.round(bands, 1)
+
+    def components(
+        self,
+        user_gmat: int,
+        user_gpa: float,
+        user_work_exp: float,
+        rows: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Unweighted factors for the given rows as a (4, len(rows)) matrix:
+        gmat_match, gpa_match, work_exp_match and acceptance_factor
+        """
+        floor = self.model.below_average_floor
+        gmat, gpa, work_exp = self.factors
+        return np.vstack(
+            (
+                gmat.match(user_gmat, rows, floor),
+                gpa.match(user_gpa, rows, floor),
+                work_exp.match(user_work_exp, rows, floor),
+                self.columns["acceptance_rate"][rows] / 100.0,
+            )
+        )
+
+    def combine(
+        self, components: np.ndarray, rows: np.ndarray, weights: np.ndarray
+    ) -> np.ndarray:
+        """Probabilities from cached components and four weights, with caps"""
+        probabilities = np.minimum(
+            (weights @ components) * 100, self.max_probability[rows]
+        )
+        probabilities = np.maximum(self.model.min_probability, probabilities)
+        return np.round(probabilities, 1)
+
+
+def read_models(
+    models_dir: Path = SCORING_MODELS_DIR,
+) -> Tuple[Dict[str, ScoringModel], Optional[str]]:
+    """Valid model artifacts in models_dir, and the version named by ACTIVE"""
+    models = {BUILTIN_MODEL.version: BUILTIN_MODEL}
+    for path in sorted(models_dir.glob("*.json")):
+        try:
+            model = ScoringModel(**json.loads(path.read_text()))
+        except (OSError, ValueError, ValidationError) as e:
+            print(f"Skipping scoring model {path.name}: {e}")
+            continue
+        if model.version != path.stem:
+            print(f"Skipping scoring model {path.name}: version is {model.version}")
+            continue
+        models[model.version] = model
+
+    try:
+        active_version = (models_dir / ACTIVE_FILE).read_text().strip() or None
+    except OSError:
+        active_version = None
+
+    return models, active_version
+
+
+class ModelRegistry:
+    def __init__(self, models_dir: Path = SCORING_MODELS_DIR):
+        self.models_dir = models_dir
+        self.models: Dict[str, ScoringModel] = {BUILTIN_MODEL.version: BUILTIN_MODEL}
+        self.active_version = BUILTIN_MODEL.version
+        self.checked_at = 0.0
+        self._fingerprint: Optional[tuple] = None
+        self._snapshot: Optional[Tuple[str, Dict[str, np.ndarray], list]] = None
+        self._compiled: Optional[CompiledModel] = None
+        self._compiled_versions: Dict[str, CompiledModel] = {}
+        self._lock = threading.Lock()
+
+    def _directory_fingerprint(self) -> tuple:
+        fingerprint = []
+        for path in sorted(self.models_dir.glob("*")):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            fingerprint.append((path.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(fingerprint)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload artifacts if the directory changed, at most once per
+        SCORING_MODEL_REFRESH_SECONDS unless force is set. Returns True when
+        the active model was swapped.
+        """
+        now = time.monotonic()
+        if not force and now - self.checked_at < SCORING_MODEL_REFRESH_SECONDS:
+            return False
+
+        with self._lock:
+            self.checked_at = time.monotonic()
+            fingerprint = self._directory_fingerprint()
+            if fingerprint == self._fingerprint:
+                return False
+            self._fingerprint = fingerprint
+
+            models, active_version = read_models(self.models_dir)
+            active_version = active_version or BUILTIN_MODEL.version
+            if active_version not in models:
+                # Keep serving the current model rather than failing requests
+                print(f"Unknown active scoring model {active_version}, ignoring")
+                active_version = self.active_version
+                models.setdefault(active_version, self.models[active_version])
+
+            self.models = models
+            swapped = (
+                self._compiled is None or self._compiled.model != models[active_version]
+            )
+            self.active_version = active_version
+            if swapped and self._snapshot is not None:
+                self._compiled = CompiledModel(models[active_version], *self._snapshot)
+                print(f"✓ Activated scoring model {active_version}")
+
+        return swapped
+
+    def update(self, catalog, changed_ids: Set[int], removed_ids: Set[int]) -> None:
+        """Catalog listener: recompile the active model for the new snapshot"""
+        with self._lock:
+            self._snapshot = (catalog.version, catalog.columns, catalog.universities)
+            self._compiled = CompiledModel(
+                self.models[self.active_version], *self._snapshot
+            )
+            self._compiled_versions = {}
+
+    def active(self) -> CompiledModel:
+        """The compiled active model; hold on to it for the whole request"""
+        self.refresh()
+        compiled = self._compiled
+        if compiled is None:
+            raise RuntimeError("Scoring model requested before the catalog loaded")
+        return compiled
+
+    def compiled(self, version: Optional[str]) -> CompiledModel:
+        """Compiled model for version, or the active one if it is not loaded"""
+        active = self.active()
+        model = self.models.get(version)
+        if model is None or model == active.model:
+            return active
+
+        compiled = self._compiled_versions.get(version)
+        if compiled is None or compiled.model != model:
+            with self._lock:
+                compiled = CompiledModel(model, *self._snapshot)
+                self._compiled_versions[version] = compiled
+        return compiled
+
+
+model_registry = ModelRegistry()
+
+
+class ComponentCache:
+    """
+    Per-search component matrices (see CompiledModel.components), so a search
+    can be re-ranked with new weights by a dot product instead of rescoring.
+    The least recently used searches are evicted beyond max_searches.
+    """
+
+    def __init__(self, max_searches: int = COMPONENT_CACHE_SIZE):
+        self.max_searches = max_searches
+        self.hits = 0
+        self.misses = 0
+        self._entries: (
+            "OrderedDict[int, Tuple[CompiledModel, np.ndarray, np.ndarray]]"
+        ) = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self, search: Search, compiled: Optional[CompiledModel] = None
+    ) -> Tuple[CompiledModel, np.ndarray, np.ndarray]:
+        """
+        (compiled model, rows, components) for a stored search, over every
+        row of its program. compiled defaults to the search's model version.
+        """
+        if compiled is None:
+            compiled = model_registry.compiled(search.model_version)
+        with self._lock:
+            entry = self._entries.get(search.id)
+            if entry is not None and entry[0] is compiled:
+                self._entries.move_to_end(search.id)
+                self.hits += 1
+                return entry
+
+        # Computed outside the lock; a concurrent miss just does the work twice
+        self.misses += 1
+        rows = compiled.rows_for_program(search.target_program)
+        entry = (
+            compiled,
+            rows,
+            compiled.components(
+                search.gmat_score, search.gpa, search.work_experience or 0.0, rows
+            ),
+        )
+        with self._lock:
+            self._entries[search.id] = entry
+            self._entries.move_to_end(search.id)
+            while len(self._entries) > self.max_searches:
+                self._entries.popitem(last=False)
+        return entry
+
+
+component_cache = ComponentCache()
+
+
+def activate(version: str, models_dir: Path = SCORING_MODELS_DIR) -> None:
+    """Point ACTIVE at version; every worker switches on its next refresh"""
+    models, _ = read_models(models_dir)
+    if version not in models:
+        raise ValueError(f"Unknown scoring model: {version}")
+
+    models_dir.mkdir(parents=True, exist_ok=True)
+    temporary = models_dir / f".{ACTIVE_FILE}.tmp"
+    temporary.write_text(version + "\n")
+    os.replace(temporary, models_dir / ACTIVE_FILE)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scoring model registry")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Show available scoring models")
+    activate_parser = commands.add_parser("activate", help="Switch the active model")
+    activate_parser.add_argument("version")
+
+    args = parser.parse_args()
+    if args.command == "activate":
+        activate(args.version)
+        print(f"Activated scoring model {args.version}")
+    else:
+        models, active_version = read_models()
+        active_version = active_version or BUILTIN_MODEL.version
+        for version, model in models.items():
+            marker = "*" if version == active_version else " "
+            print(f"{marker} {version}  {model.description}")
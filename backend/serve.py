@@ -0,0 +1,114 @@
+"""
+Multi-process production launcher
+
+Loads the catalog once, publishes it to shared memory (see shared_catalog.py)
+and starts uvicorn with several worker processes that all map the same
+segment. The launcher keeps polling the database for catalog changes and
+republishes; workers pick up the new segment on their next catalog refresh.
+
+Usage:
+    python serve.py --workers 4 --port 8080
+"""
+
+import argparse
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import uvicorn
+
+import analytics
+import shared_catalog
+from catalog import CATALOG_COLUMNS, CATALOG_REFRESH_SECONDS, catalog_version
+from database import SessionLocal, University, init_db
+from recompute import start_recompute_job
+from retention import start_retention_job
+from tiles import start_tile_job
+
+
+def publish_catalog(control_path: Path, current_version: Optional[str] = None) -> str:
+    """Publish the catalog if its version changed; returns the published version"""
+    db = SessionLocal()
+    try:
+        version = catalog_version(db)
+        if version == current_version:
+            return version
+
+        rows = [
+            {
+                "id": university.id,
+                **{column: getattr(university, column) for column in CATALOG_COLUMNS},
+            }
+            for university in db.query(University).order_by(University.id)
+        ]
+    finally:
+        db.close()
+
+    previous = shared_catalog.read_control(str(control_path))
+    shared_catalog.publish(rows, version, control_path)
+    if previous:
+        # Workers keep their existing mapping valid after the file is unlinked
+        Path(previous[1]).unlink(missing_ok=True)
+
+    print(f"✓ Published catalog version {version} ({len(rows)} universities)")
+    return version
+
+
+def watch_catalog(control_path: Path, version: str) -> None:
+    while True:
+        time.sleep(CATALOG_REFRESH_SECONDS)
+        try:
+            version = publish_catalog(control_path, version)
+        except Exception as e:
+            print(f"Catalog publish error: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run OrbitAI with several workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+    )
+    args = parser.parse_args()
+
+    init_db()
+
+    # Jobs that must run once per deployment, not once per worker
+    db = SessionLocal()
+    try:
+        if analytics.backfill_if_empty(db):
+            print("✓ Built analytics rollups from search history")
+    finally:
+        db.close()
+    start_retention_job()
+    start_recompute_job()
+    start_tile_job()
+
+    control_path = shared_catalog.SHARED_DIR / f"orbitai-catalog-{os.getpid()}.json"
+    version = publish_catalog(control_path)
+    # Workers are spawned with this environment and map the published segment
+    os.environ["CATALOG_SHM_CONTROL"] = str(control_path)
+
+    threading.Thread(
+        target=watch_catalog,
+        args=(control_path, version),
+        name="catalog-publisher",
+        daemon=True,
+    ).start()
+
+    try:
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        control = shared_catalog.read_control(str(control_path))
+        if control:
+            Path(control[1]).unlink(missing_ok=True)
+        control_path.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
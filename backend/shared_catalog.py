@@ -0,0 +1,129 @@
+"""
+Catalog snapshots shared between worker processes
+
+serve.py loads the catalog once and publishes it as a memory-mapped
+segment file (in /dev/shm where available). Numeric columns are stored as
+contiguous float64 arrays that every worker maps read-only; text columns
+follow as a JSON blob. A small control file names the current segment, and
+is swapped atomically on reload so all workers move to the same version.
+
+Segment layout:
+    b"ORBC" | uint32 header length | JSON header | padding | columns | text
+"""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"ORBC"
+
+NUMERIC_COLUMNS = (
+    "id",
+    "avg_gmat",
+    "avg_gpa",
+    "acceptance_rate",
+    "avg_work_experience",
+    "tuition_cost",
+    "ranking",
+)
+TEXT_COLUMNS = ("name", "program_type", "location")
+
+SHARED_DIR = Path(
+    os.getenv(
+        "CATALOG_SHM_DIR",
+        "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+    )
+)
+# Set by serve.py for its workers; unset means load the catalog from the database
+CONTROL_PATH = os.getenv("CATALOG_SHM_CONTROL")
+
+
+def publish(rows: List[dict], version: str, control_path: Path) -> Path:
+    """Write a segment for rows and point control_path at it"""
+    count = len(rows)
+    text = json.dumps(
+        [[row[column] for column in TEXT_COLUMNS] for row in rows]
+    ).encode()
+
+    header = {"version": version, "count": count, "columns": {}, "text": None}
+    header_size = 4096  # reserved so offsets can be computed before encoding
+    offset = 8 + header_size
+    for column in NUMERIC_COLUMNS:
+        header["columns"][column] = offset
+        offset += 8 * count
+    header["text"] = [offset, len(text)]
+    encoded = json.dumps(header).encode()
+    if len(encoded) > header_size:
+        raise ValueError("Catalog segment header too large")
+
+    path = SHARED_DIR / f"orbitai-catalog-{os.getpid()}-{version}.bin"
+    temporary = path.with_suffix(".tmp")
+    with open(temporary, "wb") as segment:
+        segment.write(MAGIC + struct.pack("<I", len(encoded)))
+        segment.write(encoded.ljust(header_size, b" "))
+        for column in NUMERIC_COLUMNS:
+            values = np.array(
+                [np.nan if row[column] is None else row[column] for row in rows],
+                dtype="<f8",
+            )
+            segment.write(values.tobytes())
+        segment.write(text)
+    os.replace(temporary, path)
+
+    control_temporary = Path(f"{control_path}.tmp")
+    control_temporary.write_text(json.dumps({"version": version, "path": str(path)}))
+    os.replace(control_temporary, control_path)
+
+    return path
+
+
+def read_control(control_path: str) -> Optional[Tuple[str, str]]:
+    """(version, segment path) currently published, or None if not published yet"""
+    try:
+        control = json.loads(Path(control_path).read_text())
+    except (OSError, ValueError):
+        return None
+    return control["version"], control["path"]
+
+
+class Segment:
+    """A mapped catalog segment; columns are zero-copy read-only views"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as segment:
+            self._map = mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._map[:4] != MAGIC:
+            raise ValueError(f"Not a catalog segment: {path}")
+        (header_length,) = struct.unpack("<I", self._map[4:8])
+        header = json.loads(self._map[8 : 8 + header_length])
+
+        self.version: str = header["version"]
+        self.count: int = header["count"]
+        self.columns: Dict[str, np.ndarray] = {
+            column: np.frombuffer(
+                self._map, dtype="<f8", count=self.count, offset=offset
+            )
+            for column, offset in header["columns"].items()
+        }
+        text_offset, text_length = header["text"]
+        self._text = json.loads(self._map[text_offset : text_offset + text_length])
+
+    def rows(self) -> List[dict]:
+        rows = []
+        for index, text in enumerate(self._text):
+            row = dict(zip(TEXT_COLUMNS, text))
+            for column, values in self.columns.items():
+                value = float(values[index])
+                row[column] = None if np.isnan(value) else value
+            row["id"] = int(row["id"])
+            if row["ranking"] is not None:
+                row["ranking"] = int(row["ranking"])
+            rows.append(row)
+        return rows
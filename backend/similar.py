@@ -0,0 +1,234 @@
+"""
+Similar-schools index
+
+Universities are embedded in a standardized feature space (avg_gmat, avg_gpa,
+avg_work_experience, acceptance_rate, tuition_cost, ranking) and indexed with
+a KD-tree. Catalog changes are applied incrementally: changed and added rows
+go to a small brute-force delta and their stale tree entries are masked out,
+until the delta grows large enough to justify a full rebuild.
+"""
+
+import heapq
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from catalog import Catalog
+
+FEATURE_COLUMNS = (
+    "avg_gmat",
+    "avg_gpa",
+    "avg_work_experience",
+    "acceptance_rate",
+    "tuition_cost",
+    "ranking",
+)
+
+
+class KDTree:
+    """Static KD-tree with contiguous leaf buckets scanned with NumPy"""
+
+    LEAF_SIZE = 64
+
+    def __init__(self, points: np.ndarray):
+        order = np.arange(len(points))
+        # node: (start, end, split_dim, split_value, left, right); leaves have left == -1
+        self.nodes: List[Tuple[int, int, int, float, int, int]] = []
+        if len(points):
+            self._build(points, order)
+        self.order = order
+        self.points = points[order]
+        self.positions = np.empty_like(order)
+        self.positions[order] = np.arange(len(order))
+
+    def _build(self, points: np.ndarray, order: np.ndarray) -> None:
+        self.nodes.append((0, len(order), -1, 0.0, -1, -1))
+        stack = [0]
+        while stack:
+            node_id = stack.pop()
+            start, end = self.nodes[node_id][:2]
+            if end - start <= self.LEAF_SIZE:
+                continue
+
+            subset = points[order[start:end]]
+            dim = int(np.argmax(subset.max(axis=0) - subset.min(axis=0)))
+            mid = (end - start) // 2
+            partition = np.argpartition(subset[:, dim], mid)
+            order[start:end] = order[start:end][partition]
+            split_value = float(points[order[start + mid], dim])
+
+            left = len(self.nodes)
+            self.nodes.append((start, start + mid, -1, 0.0, -1, -1))
+            self.nodes.append((start + mid, end, -1, 0.0, -1, -1))
+            self.nodes[node_id] = (start, end, dim, split_value, left, left + 1)
+            stack.extend((left, left + 1))
+
+    def query(
+        self, point: np.ndarray, k: int, skip: Optional[Set[int]] = None
+    ) -> List[Tuple[float, int]]:
+        """k nearest (squared distance, row) pairs, ignoring rows in skip"""
+        if not self.nodes or k <= 0:
+            return []
+
+        skipped = np.sort(self.positions[list(skip)]) if skip else None
+        best_distances = np.empty(0)
+        best_positions = np.empty(0, dtype=np.int64)
+        worst = np.inf
+        frontier = [(0.0, 0)]
+        while frontier:
+            bound, node_id = heapq.heappop(frontier)
+            if bound >= worst:
+                break
+
+            start, end, dim, split_value, left, right = self.nodes[node_id]
+            if left == -1:
+                distances = ((self.points[start:end] - point) ** 2).sum(axis=1)
+                if skipped is not None:
+                    lo, hi = np.searchsorted(skipped, (start, end))
+                    distances[skipped[lo:hi] - start] = np.inf
+
+                best_distances = np.concatenate((best_distances, distances))
+                best_positions = np.concatenate((best_positions, np.arange(start, end)))
+                if len(best_distances) > k:
+                    keep = np.argpartition(best_distances, k - 1)[:k]
+                    best_distances = best_distances[keep]
+                    best_positions = best_positions[keep]
+                if len(best_distances) == k:
+                    worst = best_distances.max()
+                continue
+
+            gap = point[dim] - split_value
+            near, far = (left, right) if gap < 0 else (right, left)
+            heapq.heappush(frontier, (bound, near))
+            heapq.heappush(frontier, (max(bound, gap * gap), far))
+
+        ranked = np.argsort(best_distances)
+        return [
+            (float(best_distances[i]), int(self.order[best_positions[i]]))
+            for i in ranked
+            if np.isfinite(best_distances[i])
+        ]
+
+
+class SimilarityIndex:
+    # Rebuild the tree once the delta exceeds this share of the catalog
+    REBUILD_FRACTION = 0.1
+    MIN_REBUILD_DELTA = 64
+
+    def __init__(self):
+        self.version: Optional[str] = None
+        self._tree = KDTree(np.empty((0, len(FEATURE_COLUMNS))))
+        self._ids = np.empty(0, dtype=np.int64)
+        self._rows: Dict[int, int] = {}
+        self._mean = np.zeros(len(FEATURE_COLUMNS))
+        self._scale = np.ones(len(FEATURE_COLUMNS))
+        self._stale: Set[int] = set()
+        self._delta: Dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _raw_features(universities) -> np.ndarray:
+        return np.array(
+            [
+                [
+                    (
+                        np.nan
+                        if getattr(university, column) is None
+                        else float(getattr(university, column))
+                    )
+                    for column in FEATURE_COLUMNS
+                ]
+                for university in universities
+            ],
+            dtype=float,
+        ).reshape(-1, len(FEATURE_COLUMNS))
+
+    def _standardize(self, raw: np.ndarray) -> np.ndarray:
+        # Missing tuition or ranking is imputed with the column mean (0 after scaling)
+        return np.nan_to_num((raw - self._mean) / self._scale, nan=0.0)
+
+    def rebuild(self, catalog: Catalog) -> None:
+        raw = self._raw_features(catalog.universities)
+        if len(raw):
+            mean = np.nanmean(raw, axis=0)
+            scale = np.nanstd(raw, axis=0)
+            self._mean = np.nan_to_num(mean, nan=0.0)
+            self._scale = np.where(np.nan_to_num(scale) > 0, scale, 1.0)
+
+        self._ids = np.array(
+            [university.id for university in catalog.universities], dtype=np.int64
+        )
+        self._rows = {
+            int(university_id): row for row, university_id in enumerate(self._ids)
+        }
+        self._tree = KDTree(self._standardize(raw))
+        self._stale = set()
+        self._delta = {}
+        self.version = catalog.version
+
+    def update(self, catalog: Catalog, changed: Set[int], removed: Set[int]) -> None:
+        """Catalog listener: apply changed/removed rows to the delta, or rebuild"""
+        with self._lock:
+            pending = len(self._stale) + len(changed) + len(removed)
+            limit = max(
+                self.MIN_REBUILD_DELTA,
+                self.REBUILD_FRACTION * len(catalog.universities),
+            )
+            if self.version is None or pending > limit:
+                self.rebuild(catalog)
+                return
+
+            for university_id in changed | removed:
+                self._delta.pop(university_id, None)
+                if university_id in self._rows:
+                    self._stale.add(self._rows[university_id])
+
+            if changed:
+                universities = [
+                    catalog.by_id[university_id] for university_id in changed
+                ]
+                vectors = self._standardize(self._raw_features(universities))
+                for university, vector in zip(universities, vectors):
+                    self._delta[university.id] = vector
+
+            self.version = catalog.version
+
+    def _vector(self, university_id: int) -> Optional[np.ndarray]:
+        if university_id in self._delta:
+            return self._delta[university_id]
+        row = self._rows.get(university_id)
+        if row is None or row in self._stale:
+            return None
+        return self._tree.points[self._tree.positions[row]]
+
+    def similar(self, university_id: int, k: int) -> Optional[List[Tuple[int, float]]]:
+        """
+        k most similar universities as (university_id, distance) pairs, or
+        None if university_id is not in the index.
+        """
+        with self._lock:
+            point = self._vector(university_id)
+            if point is None:
+                return None
+
+            skip = set(self._stale)
+            if university_id in self._rows:
+                skip.add(self._rows[university_id])
+
+            candidates = [
+                (distance, int(self._ids[row]))
+                for distance, row in self._tree.query(point, k, skip)
+            ]
+            for other_id, vector in self._delta.items():
+                if other_id != university_id:
+                    candidates.append((float(((vector - point) ** 2).sum()), other_id))
+
+        candidates.sort()
+        return [
+            (other_id, round(float(np.sqrt(distance)), 4))
+            for distance, other_id in candidates[:k]
+        ]
+
+
+similarity_index = SimilarityIndex()
@@ -0,0 +1,37 @@
+"""
+Shared test setup: the app runs against a copy of the seeded orbitai.db in a
+temporary directory, with the background recompute job and rate limits out of
+the way. The environment is set before any backend module is imported.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+_db_dir = tempfile.mkdtemp(prefix="orbitai-tests-")
+shutil.copy(BACKEND_DIR / "orbitai.db", Path(_db_dir) / "orbitai.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/orbitai.db"
+os.environ["RECOMPUTE_INTERVAL_SECONDS"] = "0"
+os.environ["RATE_LIMIT_PER_SECOND"] = "100000"
+os.environ["RATE_LIMIT_BURST"] = "100000"
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_db_dir, ignore_errors=True)
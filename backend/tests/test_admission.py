@@ -0,0 +1,47 @@
+"""Shed responses from admission control stay readable by browsers"""
+
+import admission
+
+ORIGIN = "https://app.example.com"
+PROFILE = {"gmat_score": 700, "gpa": 3.5, "work_experience": 4, "target_program": "MBA"}
+
+
+def test_rate_limited_responses_carry_cors_headers(client, monkeypatch):
+    limiter = admission.TokenBucketLimiter(rate=0.001, burst=1)
+    monkeypatch.setattr(admission, "rate_limiter", limiter)
+
+    assert client.get("/api/searches", headers={"Origin": ORIGIN}).status_code == 200
+    response = client.get("/api/searches", headers={"Origin": ORIGIN})
+    assert response.status_code == 429
+    assert "Access-Control-Allow-Origin" in response.headers
+    assert "Retry-After" in response.headers
+
+
+def test_shed_responses_carry_cors_headers(client, monkeypatch):
+    limiter = admission.ConcurrencyLimiter(max_concurrent=0, max_queued=0)
+    monkeypatch.setattr(admission, "limiter", limiter)
+
+    response = client.post("/api/match", json=PROFILE, headers={"Origin": ORIGIN})
+    assert response.status_code == 503
+    assert "Access-Control-Allow-Origin" in response.headers
+
+
+def test_preflights_skip_admission_control(client, monkeypatch):
+    rate_limiter = admission.TokenBucketLimiter(rate=0.001, burst=1)
+    monkeypatch.setattr(admission, "rate_limiter", rate_limiter)
+    monkeypatch.setattr(
+        admission, "limiter", admission.ConcurrencyLimiter(max_concurrent=0)
+    )
+
+    for _ in range(3):
+        response = client.options(
+            "/api/match",
+            headers={
+                "Origin": ORIGIN,
+                "Access-Control-Request-Method": "POST",
+                "Access-Control-Request-Headers": "content-type",
+            },
+        )
+        assert response.status_code == 200
+        assert response.headers["Access-Control-Allow-Origin"] == ORIGIN
+    assert rate_limiter.limited == 0
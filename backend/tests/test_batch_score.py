@@ -0,0 +1,57 @@
+"""Offline batch scoring reports every applicant it cannot score"""
+
+import sys
+
+import numpy as np
+import pytest
+
+import batch_score
+from catalog import SCORING_COLUMNS, UniversityRecord
+from scoring import BUILTIN_MODEL, CompiledModel
+
+UNIVERSITIES = [
+    UniversityRecord(
+        id=i + 1,
+        name=f"School {i + 1}",
+        program_type="MBA",
+        avg_gmat=680 + i,
+        avg_gpa=3.5,
+        avg_work_experience=4.0,
+        acceptance_rate=20.0,
+    )
+    for i in range(5)
+]
+
+
+def _model() -> CompiledModel:
+    columns = {
+        column: np.array([getattr(u, column) for u in UNIVERSITIES], dtype=float)
+        for column in SCORING_COLUMNS
+    }
+    return CompiledModel(BUILTIN_MODEL, "test", columns, UNIVERSITIES)
+
+
+def test_applicants_without_catalog_rows_are_reported_invalid():
+    rows = [
+        {"id": "a", "gmat_score": "700", "gpa": "3.5", "target_program": "MBA"},
+        {"id": "b", "gmat_score": "700", "gpa": "3.5", "target_program": "PHD"},
+        batch_score.InvalidRow("not a JSON object"),
+        {"id": "d", "gmat_score": "650", "gpa": "3.2", "target_program": "mba"},
+    ]
+
+    results, errors = batch_score.score_chunk(_model(), rows, 1, 3)
+
+    assert [applicant_id for applicant_id, _ in results] == ["a", "d"]
+    assert all(len(matches) == 3 for _, matches in results)
+    assert errors == [
+        "row 2: no universities found for program type PHD",
+        "row 3: not a JSON object",
+    ]
+
+
+@pytest.mark.parametrize("top", ["0", "-1"])
+def test_top_must_be_positive(monkeypatch, top):
+    monkeypatch.setattr(sys, "argv", ["batch_score.py", "-", "--top", top])
+    with pytest.raises(SystemExit) as exited:
+        batch_score.main()
+    assert exited.value.code == 2
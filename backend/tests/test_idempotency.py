@@ -0,0 +1,73 @@
+"""Idempotency-Key replay and conflict handling on /api/match"""
+
+import uuid
+
+PROFILE = {"gmat_score": 720, "gpa": 3.6, "work_experience": 5, "target_program": "MBA"}
+
+
+def _latest_search_id(client) -> int:
+    return client.get("/api/searches", params={"limit": 1}).json()[0]["id"]
+
+
+def _match(client, key: str, profile: dict = PROFILE, **params):
+    return client.post(
+        "/api/match", json=profile, params=params, headers={"Idempotency-Key": key}
+    )
+
+
+def test_replay_returns_the_original_search(client):
+    key = str(uuid.uuid4())
+    first = _match(client, key)
+    assert first.status_code == 200
+    latest = _latest_search_id(client)
+
+    replay = _match(client, key)
+    assert replay.status_code == 200
+    assert replay.json() == first.json()
+    # The replay is served from the stored search, not scored again
+    assert _latest_search_id(client) == latest
+
+
+def test_replay_keeps_components_bands_and_distances(client):
+    key = str(uuid.uuid4())
+    params = {
+        "include_components": True,
+        "gmat_uncertainty": 30,
+        "band_samples": 200,
+        "near": "Boston, MA",
+        "radius_miles": 500,
+    }
+    first = _match(client, key, **params)
+    assert first.status_code == 200
+    match = first.json()["matches"][0]
+    assert match["components"] is not None
+    assert match["chance_band"] is not None
+    assert match["distance_miles"] is not None
+
+    replay = _match(client, key, **params)
+    assert replay.status_code == 200
+    assert replay.json() == first.json()
+
+
+def test_replay_with_reordered_body_is_the_same_request(client):
+    key = str(uuid.uuid4())
+    first = _match(client, key)
+    replay = _match(client, key, dict(reversed(list(PROFILE.items()))))
+    assert replay.status_code == 200
+    assert replay.json()["search_id"] == first.json()["search_id"]
+
+
+def test_reusing_a_key_for_a_different_request_conflicts(client):
+    key = str(uuid.uuid4())
+    assert _match(client, key).status_code == 200
+
+    assert _match(client, key, {**PROFILE, "gmat_score": 640}).status_code == 409
+    assert _match(client, key, limit=5).status_code == 409
+    # The original request still replays after a conflict
+    assert _match(client, key).status_code == 200
+
+
+def test_different_keys_make_separate_searches(client):
+    first = _match(client, str(uuid.uuid4()))
+    second = _match(client, str(uuid.uuid4()))
+    assert first.json()["search_id"] != second.json()["search_id"]
@@ -0,0 +1,108 @@
+"""Keyset paging on /api/universities, /api/searches and stored results"""
+
+import pytest
+
+from pagination import encode_cursor
+
+PROFILE = {"gmat_score": 690, "gpa": 3.4, "work_experience": 3, "target_program": "MBA"}
+
+
+def _walk(client, path: str, limit: int, **params):
+    """Every page of a header-cursor listing, as (items, page count)"""
+    items, pages, cursor = [], 0, None
+    while True:
+        if cursor is not None:
+            params["cursor"] = cursor
+        response = client.get(path, params={"limit": limit, **params})
+        assert response.status_code == 200
+        items += response.json()
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return items, pages
+
+
+def _match(client, gmat_score: int) -> int:
+    response = client.post("/api/match", json={**PROFILE, "gmat_score": gmat_score})
+    assert response.status_code == 200
+    return response.json()["search_id"]
+
+
+def test_university_pages_concatenate_to_the_full_listing(client):
+    response = client.get("/api/universities", params={"limit": 100})
+    assert "X-Next-Cursor" not in response.headers
+    everything = response.json()
+
+    paged, pages = _walk(client, "/api/universities", 7)
+    assert pages == -(-len(everything) // 7)
+    assert [u["id"] for u in paged] == [u["id"] for u in everything]
+
+
+def test_university_search_pages_concatenate_to_the_full_result(client):
+    everything = client.get("/api/universities/search", params={"limit": 100}).json()
+    assert everything["next_cursor"] is None
+
+    paged, cursor = [], None
+    while True:
+        params = {"limit": 7} if cursor is None else {"limit": 7, "cursor": cursor}
+        body = client.get("/api/universities/search", params=params).json()
+        paged += body["universities"]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [u["id"] for u in paged] == [u["id"] for u in everything["universities"]]
+
+
+def test_search_pages_do_not_shift_when_searches_are_added(client):
+    for gmat_score in range(600, 700, 10):
+        _match(client, gmat_score)
+    before = [s["id"] for s in client.get("/api/searches", params={"limit": 9}).json()]
+
+    first = client.get("/api/searches", params={"limit": 3})
+    cursor = first.headers["X-Next-Cursor"]
+    # Newer searches land before the first page, not in the middle of the walk
+    _match(client, 710)
+    second = client.get("/api/searches", params={"limit": 3, "cursor": cursor})
+    third = client.get(
+        "/api/searches",
+        params={"limit": 3, "cursor": second.headers["X-Next-Cursor"]},
+    )
+
+    ids = [s["id"] for page in (first, second, third) for s in page.json()]
+    assert ids == before
+
+
+def test_stored_result_pages_concatenate_to_the_full_search(client):
+    search_id = _match(client, 705)
+    everything = client.get(f"/api/searches/{search_id}").json()["matches"]
+
+    paged, cursor = [], None
+    while True:
+        params = {"limit": 10} if cursor is None else {"limit": 10, "cursor": cursor}
+        body = client.get(f"/api/searches/{search_id}", params=params).json()
+        paged += body["matches"]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert paged == everything
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor!",
+        "e30",  # {}
+        encode_cursor(1),  # too few values
+        encode_cursor("yesterday", 5),  # values of the wrong type
+        encode_cursor("a", "b"),
+        encode_cursor(1.5, None),
+        encode_cursor([1], [2]),
+    ],
+)
+@pytest.mark.parametrize(
+    "path", ["/api/searches", "/api/universities", "/api/universities/search"]
+)
+def test_invalid_cursors_are_rejected(client, path, cursor):
+    assert client.get(path, params={"cursor": cursor}).status_code == 400
@@ -0,0 +1,50 @@
+"""Incremental VACUUM never falls back to a full VACUUM on its own"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+from database import engine
+from retention import convert_to_incremental, incremental_vacuum
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _auto_vacuum_mode() -> int:
+    # A new connection: pooled ones keep the mode they read when opened
+    connection = sqlite3.connect(engine.url.database)
+    try:
+        return connection.execute("PRAGMA auto_vacuum").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_new_databases_are_created_with_incremental_auto_vacuum(tmp_path):
+    script = (
+        "from database import engine, init_db\n"
+        "init_db()\n"
+        "with engine.connect() as connection:\n"
+        "    print(connection.exec_driver_sql('PRAGMA auto_vacuum').scalar())\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path}/new.db"},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert output.strip().splitlines()[-1] == "2"
+
+
+def test_vacuum_job_leaves_conversion_to_the_offline_command():
+    assert _auto_vacuum_mode() == 0
+    incremental_vacuum()
+    assert _auto_vacuum_mode() == 0
+
+    assert convert_to_incremental()
+    assert _auto_vacuum_mode() == 2
+    incremental_vacuum()
+    assert not convert_to_incremental()
@@ -0,0 +1,220 @@
+"""The vectorized CompiledModel kernel against the scalar reference"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+import matcher
+from catalog import SCORING_COLUMNS, UniversityRecord
+from matcher import CollegeMatcher
+from models import ScoringModel
+from scoring import BUILTIN_MODEL, CompiledModel, admission_probability
+
+CUSTOM_MODEL = ScoringModel(
+    version="test-v2",
+    gmat_weight=0.4,
+    gpa_weight=0.2,
+    work_exp_weight=0.3,
+    acceptance_rate_weight=0.1,
+    gmat_std_dev=40,
+    gpa_std_dev=0.3,
+    work_exp_std_dev=1.5,
+    below_average_floor=0.2,
+    min_probability=2,
+    max_probability=90,
+    acceptance_rate_margin=15,
+)
+
+
+def _universities(count: int = 60, seed: int = 7):
+    random = np.random.default_rng(seed)
+    return [
+        UniversityRecord(
+            id=i + 1,
+            name=f"School {i + 1}",
+            program_type="MBA",
+            avg_gmat=int(random.integers(560, 740)),
+            avg_gpa=round(float(random.uniform(3.0, 3.9)), 2),
+            avg_work_experience=round(float(random.uniform(1.0, 7.0)), 1),
+            acceptance_rate=round(float(random.uniform(5.0, 70.0)), 1),
+        )
+        for i in range(count)
+    ]
+
+
+def _compile(model: ScoringModel, universities) -> CompiledModel:
+    columns = {
+        column: np.array([getattr(u, column) for u in universities], dtype=float)
+        for column in SCORING_COLUMNS
+    }
+    return CompiledModel(model, "test", columns, universities)
+
+
+PROFILES = list(
+    itertools.product(
+        range(500, 801, 25), (2.7, 3.1, 3.45, 3.8, 4.0), (0.0, 2.5, 4.0, 8.0)
+    )
+)
+
+
+@pytest.mark.parametrize(
+    "model", [BUILTIN_MODEL, CUSTOM_MODEL], ids=lambda m: m.version
+)
+def test_probabilities_match_scalar_reference(model):
+    universities = _universities()
+    compiled = _compile(model, universities)
+    rows = np.arange(len(universities))
+
+    for gmat, gpa, work_exp in PROFILES:
+        vectorized = compiled.probabilities(gmat, gpa, work_exp, rows)
+        scalar = [
+            admission_probability(model, gmat, gpa, work_exp, university)
+            for university in universities
+        ]
+        assert vectorized.tolist() == scalar, (gmat, gpa, work_exp)
+
+
+def test_builtin_model_matches_college_matcher():
+    universities = _universities()
+    compiled = _compile(BUILTIN_MODEL, universities)
+    rows = np.arange(len(universities))
+
+    for gmat, gpa, work_exp in PROFILES:
+        vectorized = compiled.probabilities(gmat, gpa, work_exp, rows)
+        expected = [
+            CollegeMatcher.calculate_admission_probability(
+                gmat, gpa, work_exp, university
+            )
+            for university in universities
+        ]
+        assert vectorized.tolist() == expected, (gmat, gpa, work_exp)
+
+
+def test_profile_arrays_match_one_profile_at_a_time():
+    universities = _universities()
+    compiled = _compile(CUSTOM_MODEL, universities)
+    random = np.random.default_rng(11)
+    rows = random.integers(0, len(universities), size=500)
+    gmat = random.integers(450, 800, size=500)
+    gpa = random.uniform(2.5, 4.0, size=500)
+    work_exp = random.uniform(0.0, 10.0, size=500)
+
+    vectorized = compiled.probabilities(gmat, gpa, work_exp, rows)
+    scalar = [
+        compiled.probability(int(g), float(p), float(w), int(row))
+        for g, p, w, row in zip(gmat, gpa, work_exp, rows)
+    ]
+    assert vectorized.tolist() == scalar
+
+
+def test_subset_rows_line_up_with_universities():
+    universities = _universities()
+    compiled = _compile(BUILTIN_MODEL, universities)
+    rows = np.array([5, 0, 42, 17])
+
+    vectorized = compiled.probabilities(700, 3.5, 4.0, rows)
+    assert vectorized.tolist() == [
+        admission_probability(BUILTIN_MODEL, 700, 3.5, 4.0, universities[row])
+        for row in rows
+    ]
+
+
+def test_candidate_rows_index_the_compiled_snapshot():
+    universities = _universities(10)
+    for university in universities[::3]:
+        object.__setattr__(university, "program_type", "MS")
+    compiled = _compile(BUILTIN_MODEL, universities)
+    # A later snapshot without the first school shifts every row
+    shifted = _compile(BUILTIN_MODEL, universities[1:])
+
+    for model in (compiled, shifted):
+        programs = {
+            model.universities[row].program_type for row in model.rows_for_program("ms")
+        }
+        assert programs == {"MS"}
+        ids = [model.universities[row].id for row in model.rows_for_ids({4, 7})]
+        assert ids == [4, 7]
+    assert compiled.rows_for_program("PHD").tolist() == []
+    assert shifted.rows_for_ids({1}).tolist() == []
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        BUILTIN_MODEL,
+        CUSTOM_MODEL,
+        # A field the model ignores is reachable at any value or at none
+        CUSTOM_MODEL.model_copy(update={"version": "test-v3", "work_exp_weight": 0}),
+    ],
+    ids=lambda m: m.version,
+)
+@pytest.mark.parametrize("solve_for", ["gmat_score", "gpa", "work_experience"])
+def test_score_requirements_match_the_scalar_solver(model, solve_for):
+    universities = _universities(80)
+    compiled = _compile(model, universities)
+    rows = np.arange(len(universities))
+    solved = ("gmat_score", "gpa", "work_experience").index(solve_for)
+
+    for target in (1, 5, 20, 33.33, 50, 61.7, 85, 95):
+        for profile in itertools.product((560, 700, 800), (2.9, 3.6), (1.0, 6.0)):
+            profile = list(profile)
+            profile[solved] = None
+            vectorized = CollegeMatcher.calculate_score_requirements(
+                target, solve_for, *profile, compiled, rows
+            )
+            scalar = sorted(
+                (
+                    (universities[row].id,)
+                    + CollegeMatcher.calculate_score_requirement(
+                        target, solve_for, *profile, compiled, int(row)
+                    )
+                    for row in rows
+                ),
+                key=lambda requirement: (requirement[1] is None, requirement[1] or 0),
+            )
+            assert [
+                (university.id, value, reason)
+                for university, value, reason in vectorized
+            ] == scalar, (target, profile)
+
+
+@pytest.mark.parametrize("limit", [None, 1, 10, 45, 200])
+def test_sharded_matches_equal_inline_matches(monkeypatch, limit):
+    # Four distinct schools repeated, so every probability is a many-way tie
+    # that spans shards
+    distinct = _universities(4)
+    universities = [
+        UniversityRecord(
+            id=i + 1,
+            **{column: getattr(distinct[i % 4], column) for column in SCORING_COLUMNS},
+        )
+        for i in range(150)
+    ]
+    compiled = _compile(BUILTIN_MODEL, universities)
+    rows = np.arange(len(universities))
+    shards = []
+    top_matches = CollegeMatcher._top_matches
+
+    def counting_top_matches(*args):
+        shards.append(len(args[4]))
+        return top_matches(*args)
+
+    monkeypatch.setattr(
+        CollegeMatcher, "_top_matches", staticmethod(counting_top_matches)
+    )
+    monkeypatch.setattr(matcher, "MATCH_THREADS", 4)
+    for candidates in (rows, rows[::-1].copy(), rows[10:140:3]):
+        for gmat, gpa, work_exp in PROFILES[::7]:
+            monkeypatch.setattr(CollegeMatcher, "PARALLEL_MIN_CATALOG", 10**9)
+            inline = CollegeMatcher.match_catalog(
+                gmat, gpa, work_exp, compiled, candidates, limit
+            )
+            monkeypatch.setattr(CollegeMatcher, "PARALLEL_MIN_CATALOG", 1)
+            monkeypatch.setattr(CollegeMatcher, "MIN_SHARD_SIZE", 5)
+            del shards[:]
+            sharded = CollegeMatcher.match_catalog(
+                gmat, gpa, work_exp, compiled, candidates, limit
+            )
+            assert len(shards) == 4
+            assert sharded == inline, (gmat, gpa, work_exp, limit)
@@ -0,0 +1,13 @@
+"""Tile sets are kept per (catalog version, scoring model)"""
+
+from tiles import prune_tiles
+
+
+def test_prune_keeps_only_the_current_catalog_and_model(tmp_path):
+    for name in ("c1-v1", "c1-v2", "c2-v2", "c1-v2-beta"):
+        (tmp_path / name).mkdir()
+
+    removed = prune_tiles("c1", "v2", tmp_path)
+
+    assert [path.name for path in tmp_path.iterdir()] == ["c1-v2"]
+    assert sorted(path.name for path in removed) == ["c1-v1", "c1-v2-beta", "c2-v2"]
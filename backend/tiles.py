@@ -0,0 +1,395 @@
+"""
+Precomputed ranking tiles for the quantized profile grid
+
+Practical /api/match inputs form a finite grid: GMAT 200-800 in steps of 10,
+GPA in steps of 0.01 and work experience in half-years. The optional build
+stage ranks the catalog for every grid cell once per (catalog version,
+scoring model) and stores the result in TILES_DIR/<catalog>-<model>/, one
+.npy file per program type. Each cell is a contiguous run of (row, chance)
+records, the chance in tenths of a percent, so a lookup is one read from a
+memory-mapped file. Off-grid profiles, and requests a truncated tile cannot
+answer, fall back to live scoring.
+
+Each cell costs 3 bytes per school kept (more for catalogs over 256 rows):
+about 340 MB for the full ranking of 76 MBA programs. TILE_TOP_K keeps only the best K schools per cell.
+
+Usage:
+    python tiles.py build
+    python tiles.py info
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from catalog import Catalog, catalog_version
+from database import SessionLocal, init_db
+from models import ScoringModel
+from scoring import BUILTIN_MODEL, CompiledModel, read_models
+
+TILES_DIR = Path(os.getenv("TILES_DIR", Path(__file__).parent / "tiles"))
+# Schools kept per cell; 0 keeps each program's full ranking
+TILE_TOP_K = int(os.getenv("TILE_TOP_K", "0"))
+TILE_CHECK_SECONDS = float(os.getenv("TILE_CHECK_SECONDS", "30"))
+# How often the build job looks for a new catalog version; 0 disables it
+TILE_INTERVAL_SECONDS = float(os.getenv("TILE_INTERVAL_SECONDS", "0"))
+
+# (low, high, step) of each grid axis, within UserProfileRequest's bounds
+GMAT_GRID = (200, 800, 10)
+GPA_GRID = (0.0, 4.0, 0.01)
+WORK_EXP_GRID = (0.0, 30.0, 0.5)
+
+MANIFEST_FILE = "manifest.json"
+
+
+def _axis(grid: Tuple[float, float, float]) -> np.ndarray:
+    low, high, step = grid
+    count = int(round((high - low) / step)) + 1
+    # Divide integers rather than multiply by step, so 3.45 is the same float
+    # a client sends
+    scale = round(1 / step) if step < 1 else 1
+    return (round(low * scale) + np.arange(count) * round(step * scale)) / scale
+
+
+GMAT_AXIS = _axis(GMAT_GRID)
+GPA_AXIS = _axis(GPA_GRID)
+WORK_EXP_AXIS = _axis(WORK_EXP_GRID)
+GRID_SHAPE = (len(GMAT_AXIS), len(GPA_AXIS), len(WORK_EXP_AXIS))
+
+
+def _index(value: float, grid: Tuple[float, float, float]) -> Optional[int]:
+    low, high, step = grid
+    if not low <= value <= high:
+        return None
+    position = (value - low) / step
+    index = int(round(position))
+    return index if abs(position - index) < 1e-6 else None
+
+
+def grid_cell(gmat: float, gpa: float, work_exp: float) -> Optional[Tuple[int, ...]]:
+    """Tile indexes of an on-grid profile, or None if any value is off-grid"""
+    cell = (
+        _index(gmat, GMAT_GRID),
+        _index(gpa, GPA_GRID),
+        _index(work_exp, WORK_EXP_GRID),
+    )
+    return None if None in cell else cell
+
+
+def _tile_name(catalog_version: str, model_version: str) -> str:
+    return f"{catalog_version}-{model_version}"
+
+
+def build_tiles(
+    model: CompiledModel,
+    program_rows: Dict[str, np.ndarray],
+    tiles_dir: Path = TILES_DIR,
+    top_k: int = TILE_TOP_K,
+) -> Path:
+    """Rank every grid cell for each program and write the tile set"""
+    name = _tile_name(model.catalog_version, model.version)
+    target = tiles_dir / name
+    if target.exists():
+        return target
+
+    staging = tiles_dir / f".{name}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    row_type = np.min_scalar_type(max(len(model.universities) - 1, 0))
+    programs = {}
+    for index, (program, candidates) in enumerate(sorted(program_rows.items())):
+        count = len(candidates)
+        width = count if top_k <= 0 else min(top_k, count)
+        cells = np.lib.format.open_memmap(
+            staging / f"program-{index}.npy",
+            mode="w+",
+            dtype=np.dtype([("row", row_type), ("chance", np.uint16)]),
+            shape=GRID_SHAPE + (width,),
+        )
+
+        # One GMAT plane (every GPA x work experience pair) per vectorized call
+        gpas = np.repeat(GPA_AXIS, len(WORK_EXP_AXIS))
+        work_exps = np.tile(WORK_EXP_AXIS, len(GPA_AXIS))
+        profiles = len(gpas)
+        for gmat_index, gmat in enumerate(GMAT_AXIS):
+            probabilities = model.probabilities(
+                np.full(profiles * count, gmat),
+                np.repeat(gpas, count),
+                np.repeat(work_exps, count),
+                np.tile(candidates, profiles),
+            ).reshape(profiles, count)
+            tenths = np.rint(probabilities * 10).astype(np.uint16)
+
+            # Stable sort: ties keep catalog order, as in match_catalog
+            order = np.argsort(-tenths.astype(np.int32), axis=1, kind="stable")
+            order = order[:, :width]
+            plane = cells[gmat_index].reshape(profiles, width)
+            plane["row"] = candidates[order]
+            plane["chance"] = np.take_along_axis(tenths, order, axis=1)
+
+        cells.flush()
+        del cells
+        programs[program] = {
+            "file": f"program-{index}.npy",
+            "count": count,
+            "width": width,
+        }
+
+    manifest = {
+        "catalog_version": model.catalog_version,
+        "model": model.model.model_dump(),
+        "grid": {
+            "gmat_score": GMAT_GRID,
+            "gpa": GPA_GRID,
+            "work_experience": WORK_EXP_GRID,
+        },
+        "programs": programs,
+    }
+    (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+
+    try:
+        os.replace(staging, target)
+    except OSError:
+        # Another builder finished the same tile set first
+        shutil.rmtree(staging, ignore_errors=True)
+    return target
+
+
+def prune_tiles(
+    catalog_version: str, model_version: str, tiles_dir: Path = TILES_DIR
+) -> List[Path]:
+    """
+    Delete tile sets for other catalog versions or scoring models; mapped
+    files stay readable
+    """
+    keep = _tile_name(catalog_version, model_version)
+    removed = []
+    for path in tiles_dir.glob("*"):
+        if path.is_dir() and path.name != keep:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+    return removed
+
+
+class TileSet:
+    """Memory-mapped tiles for one catalog version and scoring model"""
+
+    def __init__(self, path: Path):
+        manifest = json.loads((path / MANIFEST_FILE).read_text())
+        self.path = path
+        self.catalog_version = manifest["catalog_version"]
+        self.model = ScoringModel(**manifest["model"])
+        grid = manifest["grid"]
+        if (
+            tuple(grid["gmat_score"]) != GMAT_GRID
+            or tuple(grid["gpa"]) != GPA_GRID
+            or tuple(grid["work_experience"]) != WORK_EXP_GRID
+        ):
+            raise ValueError(f"Tile grid in {path.name} does not match this build")
+
+        self.programs: Dict[str, Tuple[np.ndarray, int]] = {}
+        for program, entry in manifest["programs"].items():
+            cells = np.load(path / entry["file"], mmap_mode="r")
+            self.programs[program] = (cells, entry["count"])
+
+    def match(
+        self,
+        program: str,
+        candidates: np.ndarray,
+        user_gmat: float,
+        user_gpa: float,
+        user_work_exp: float,
+        limit: Optional[int] = None,
+    ) -> Optional[List[Tuple[int, float]]]:
+        """
+        Ranked (row, probability) pairs like CollegeMatcher.match_catalog, or
+        None when the profile is off-grid or the tile cannot answer
+        """
+        entry = self.programs.get((program or "").upper())
+        cell = grid_cell(user_gmat, user_gpa, user_work_exp)
+        if entry is None or cell is None:
+            return None
+
+        cells, count = entry
+        width = cells.shape[-1]
+        records = np.asarray(cells[cell])
+        rows = records["row"].astype(np.int64)
+        if len(candidates) != count:
+            # A location filter narrowed the program; only a full ranking
+            # still holds every candidate
+            if width < count:
+                return None
+            kept = np.isin(rows, candidates)
+            records, rows = records[kept], rows[kept]
+        elif width < count and (limit is None or limit > width):
+            return None
+
+        if limit is not None:
+            records, rows = records[:limit], rows[:limit]
+        return list(zip(rows.tolist(), (records["chance"] / 10).tolist()))
+
+
+class TileStore:
+    """
+    The tile set matching the active compiled model, if one has been built.
+    Missing tiles are looked for again at most every TILE_CHECK_SECONDS.
+    """
+
+    def __init__(self, tiles_dir: Path = TILES_DIR):
+        self.tiles_dir = tiles_dir
+        self.hits = 0
+        self.misses = 0
+        # (catalog version, model version), tile set or None, checked_at
+        self._entry: Tuple[Optional[tuple], Optional[TileSet], float] = (None, None, 0)
+        self._lock = threading.Lock()
+
+    def _stale(self, entry: tuple, key: tuple) -> bool:
+        return entry[0] != key or (
+            entry[1] is None and time.monotonic() - entry[2] >= TILE_CHECK_SECONDS
+        )
+
+    def get(self, model: CompiledModel) -> Optional[TileSet]:
+        key = (model.catalog_version, model.version)
+        entry = self._entry
+        if self._stale(entry, key):
+            with self._lock:
+                entry = self._entry
+                if self._stale(entry, key):
+                    entry = (key, self._load(key, model), time.monotonic())
+                    self._entry = entry
+        # Another request may have moved to a newer model in between
+        return entry[1] if entry[0] == key else None
+
+    def _load(self, key: Tuple[str, str], model: CompiledModel) -> Optional[TileSet]:
+        path = self.tiles_dir / _tile_name(*key)
+        if not (path / MANIFEST_FILE).exists():
+            return None
+        try:
+            tiles = TileSet(path)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring tiles {path.name}: {e}")
+            return None
+        if tiles.model != model.model:
+            print(f"Ignoring tiles {path.name}: scoring model differs")
+            return None
+        return tiles
+
+    def match(
+        self,
+        model: CompiledModel,
+        program: str,
+        candidates: np.ndarray,
+        user_gmat: float,
+        user_gpa: float,
+        user_work_exp: float,
+        limit: Optional[int] = None,
+    ) -> Optional[List[Tuple[int, float]]]:
+        """TileSet.match for the model's tiles; None means score live"""
+        tiles = self.get(model)
+        ranked = None
+        if tiles is not None:
+            ranked = tiles.match(
+                program, candidates, user_gmat, user_gpa, user_work_exp, limit
+            )
+        if ranked is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return ranked
+
+
+tile_store = TileStore()
+
+
+def active_model() -> ScoringModel:
+    """The scoring model ACTIVE names, or the built-in one"""
+    models, active_version = read_models()
+    return models.get(active_version or BUILTIN_MODEL.version, BUILTIN_MODEL)
+
+
+def build_current(tiles_dir: Path = TILES_DIR) -> Path:
+    """Build tiles for the database's catalog and the active scoring model"""
+    snapshot = Catalog()
+    snapshot.refresh(force=True)
+    model = active_model()
+    compiled = CompiledModel(
+        model, snapshot.version, snapshot.columns, snapshot.universities
+    )
+
+    program_rows = {
+        program: snapshot.rows_for_program(program)
+        for program in {
+            (university.program_type or "").upper()
+            for university in snapshot.universities
+        }
+    }
+    path = build_tiles(compiled, program_rows, tiles_dir)
+    prune_tiles(snapshot.version, model.version, tiles_dir)
+    return path
+
+
+def start_tile_job() -> Optional[threading.Thread]:
+    """
+    Build tiles for each new catalog version or activated scoring model in a
+    daemon thread
+    """
+    if TILE_INTERVAL_SECONDS <= 0:
+        return None
+
+    def loop():
+        built_key = None
+        while True:
+            try:
+                db = SessionLocal()
+                try:
+                    key = (catalog_version(db), active_model().version)
+                finally:
+                    db.close()
+                if key != built_key:
+                    started = time.perf_counter()
+                    path = build_current()
+                    print(
+                        f"✓ Ranking tiles {path.name} ready "
+                        f"({time.perf_counter() - started:.0f}s)"
+                    )
+                    built_key = key
+            except Exception as e:
+                print(f"Tile build error: {e}")
+            time.sleep(TILE_INTERVAL_SECONDS)
+
+    thread = threading.Thread(target=loop, name="ranking-tiles", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precomputed ranking tiles")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("build", help="Build tiles for the current catalog")
+    commands.add_parser("info", help="Show built tile sets")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        init_db()
+        started = time.perf_counter()
+        path = build_current()
+        print(f"Built {path} in {time.perf_counter() - started:.1f}s")
+    else:
+        for path in sorted(TILES_DIR.glob("*")):
+            if not (path / MANIFEST_FILE).exists():
+                continue
+            tiles = TileSet(path)
+            size = sum(file.stat().st_size for file in path.iterdir())
+            programs = ", ".join(
+                f"{program} ({cells.shape[-1]}/{count})"
+                for program, (cells, count) in tiles.programs.items()
+            )
+            print(f"{path.name}  {size / 2**20:.0f} MiB  {programs}")
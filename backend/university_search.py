@@ -0,0 +1,180 @@
+"""
+Server-side university search
+
+A trigram index over lower-cased name and location narrows text queries to
+a handful of candidates; range filters are evaluated as NumPy masks over
+catalog columns kept in (ranking, id) order so results page with a keyset
+cursor. The index follows catalog changes incrementally.
+"""
+
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from catalog import Catalog
+from database import UNRANKED
+
+RANGE_COLUMNS = ("tuition_cost", "ranking", "acceptance_rate", "avg_gmat")
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _search_text(university) -> Tuple[str, str]:
+    return (university.name or "").lower(), (university.location or "").lower()
+
+
+class UniversitySearchIndex:
+    def __init__(self):
+        self.version: Optional[str] = None
+        self._postings: Dict[str, Set[int]] = {}
+        self._texts: Dict[int, Tuple[str, str]] = {}
+        self._ids = np.empty(0, dtype=np.int64)
+        self._rank_keys = np.empty(0, dtype=np.int64)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._program_types = np.empty(0, dtype=object)
+        self._lock = threading.Lock()
+
+    def _index_text(self, university_id: int, texts: Tuple[str, str]) -> None:
+        self._texts[university_id] = texts
+        for gram in trigrams(texts[0]) | trigrams(texts[1]):
+            self._postings.setdefault(gram, set()).add(university_id)
+
+    def _unindex_text(self, university_id: int) -> None:
+        texts = self._texts.pop(university_id, None)
+        if texts is None:
+            return
+        for gram in trigrams(texts[0]) | trigrams(texts[1]):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(university_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def update(self, catalog: Catalog, changed: Set[int], removed: Set[int]) -> None:
+        """Catalog listener: re-index changed rows and rebuild the column arrays"""
+        with self._lock:
+            for university_id in changed | removed:
+                self._unindex_text(university_id)
+            for university_id in changed:
+                self._index_text(
+                    university_id, _search_text(catalog.by_id[university_id])
+                )
+
+            universities = sorted(
+                catalog.universities,
+                key=lambda u: (u.ranking if u.ranking is not None else UNRANKED, u.id),
+            )
+            self._ids = np.array([u.id for u in universities], dtype=np.int64)
+            self._rank_keys = np.array(
+                [
+                    u.ranking if u.ranking is not None else UNRANKED
+                    for u in universities
+                ],
+                dtype=np.int64,
+            )
+            self._columns = {
+                column: np.array(
+                    [
+                        np.nan if getattr(u, column) is None else getattr(u, column)
+                        for u in universities
+                    ],
+                    dtype=float,
+                )
+                for column in RANGE_COLUMNS
+            }
+            self._program_types = np.array(
+                [(u.program_type or "").upper() for u in universities], dtype=object
+            )
+            self.version = catalog.version
+
+    def _text_matches(self, query: str) -> Optional[Set[int]]:
+        """University ids whose name or location contains every query term"""
+        terms = query.lower().split()
+        if not terms:
+            return None
+
+        matches: Optional[Set[int]] = None
+        for term in terms:
+            grams = trigrams(term)
+            if grams:
+                postings = sorted(
+                    (self._postings.get(gram, set()) for gram in grams), key=len
+                )
+                candidates = set(postings[0]).intersection(*postings[1:])
+            else:
+                candidates = set(self._texts)
+
+            if matches is not None:
+                candidates &= matches
+            # Trigrams can co-occur without forming the term, so confirm
+            matches = {
+                university_id
+                for university_id in candidates
+                if term in self._texts[university_id][0]
+                or term in self._texts[university_id][1]
+            }
+            if not matches:
+                break
+
+        return matches
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        program_type: Optional[str] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+        ids: Optional[Set[int]] = None,
+        after: Optional[Tuple[int, int]] = None,
+        limit: int = 20,
+    ) -> Tuple[List[int], int, Optional[Tuple[int, int]]]:
+        """
+        Matching university ids in (ranking, id) order.
+
+        Returns (page_ids, total_matches, next_key); next_key is the
+        (rank_key, id) to pass as `after` for the following page, or None on
+        the last page.
+        """
+        with self._lock:
+            mask = np.ones(len(self._ids), dtype=bool)
+
+            if program_type:
+                mask &= self._program_types == program_type.upper()
+
+            for column, (low, high) in (ranges or {}).items():
+                values = self._columns[column]
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values <= high
+
+            if query:
+                matches = self._text_matches(query)
+                if matches is not None:
+                    mask &= np.isin(self._ids, np.fromiter(matches, dtype=np.int64))
+
+            if ids is not None:
+                mask &= np.isin(self._ids, np.fromiter(ids, dtype=np.int64))
+
+            total = int(mask.sum())
+
+            start = 0
+            if after is not None:
+                rank_key, university_id = after
+                lo = np.searchsorted(self._rank_keys, rank_key, side="left")
+                hi = np.searchsorted(self._rank_keys, rank_key, side="right")
+                start = lo + np.searchsorted(self._ids[lo:hi], university_id, "right")
+
+            positions = start + np.flatnonzero(mask[start:])[: limit + 1]
+            page = [int(self._ids[p]) for p in positions[:limit]]
+            next_key = None
+            if len(positions) > limit:
+                last = positions[limit - 1]
+                next_key = (int(self._rank_keys[last]), int(self._ids[last]))
+
+        return page, total, next_key
+
+
+university_search_index = UniversitySearchIndex()
@@ -122,6 +122,11 @@ function App() {
             universities={universities} 
             onReset={handleReset}
             userProfile={userProfile || undefined}
+            csvExportUrl={
+              searchId
+                ? `${API_URL}/api/searches/${searchId}/export?format=csv`
+                : undefined
+            }
           />
         )}
       </main>
@@ -10,11 +10,14 @@ import {
 interface ExportButtonsProps {
   universities: University[];
   userProfile?: UserProfile;
+  // Server-side export of the stored search; streamed, so it scales with the catalog
+  csvExportUrl?: string;
 }
 
 export const ExportButtons = ({
   universities,
   userProfile,
+  csvExportUrl,
 }: ExportButtonsProps) => {
   const [isExporting, setIsExporting] = useState(false);
   const [showMenu, setShowMenu] = useState(false);
@@ -35,7 +38,13 @@ export const ExportButtons = ({
   const handleExportCSV = () => {
     setIsExporting(true);
     try {
-      exportToCSV(universities);
+      if (csvExportUrl) {
+        const link = document.createElement("a");
+        link.href = csvExportUrl;
+        link.click();
+      } else {
+        exportToCSV(universities);
+      }
     } catch (error) {
       console.error("CSV export failed:", error);
       alert("Failed to export CSV. Please try again.");
@@ -14,6 +14,7 @@ interface ResultsDisplayProps {
   universities: University[];
   onReset: () => void;
   userProfile?: UserProfile;
+  csvExportUrl?: string;
 }
 
 type SortOption = "chance" | "ranking" | "tuition" | "acceptance";
@@ -23,6 +24,7 @@ export const ResultsDisplay = ({
   universities,
   onReset,
   userProfile,
+  csvExportUrl,
 }: ResultsDisplayProps) => {
   const [searchTerm, setSearchTerm] = useState("");
   const [sortBy, setSortBy] = useState<SortOption>("chance");
@@ -113,7 +115,11 @@ export const ResultsDisplay = ({
             >
               {showAnalytics ? "📋 View List" : "📊 View Analytics"}
             </Button>
-            <ExportButtons universities={universities} userProfile={userProfile} />
+            <ExportButtons
+              universities={universities}
+              userProfile={userProfile}
+              csvExportUrl={csvExportUrl}
+            />
             <Button variant="outline" onClick={onReset}>
               🔄 New Search
             </Button>